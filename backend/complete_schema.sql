@@ -72,7 +72,10 @@ CREATE TABLE hospitals (
   smtp_password VARCHAR(255),
   smtp_from_email VARCHAR(255),
   smtp_enabled BOOLEAN DEFAULT FALSE,
-  smtp_use_ssl BOOLEAN DEFAULT FALSE
+  smtp_use_ssl BOOLEAN DEFAULT FALSE,
+
+  -- Appointment hours (NULL = default hours, see database/schedules.sql)
+  schedule JSONB
 );
 
 -- ============================================
@@ -132,6 +135,7 @@ CREATE TABLE doctors (
   -- Status
   is_active BOOLEAN DEFAULT true,
   source TEXT DEFAULT 'registered', -- 'registered', 'crowdsourced'
+  schedule JSONB, -- overrides the hospital schedule (see database/schedules.sql)
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -423,6 +427,8 @@ CREATE INDEX idx_appointments_followup_date ON appointments(followup_date);
 CREATE INDEX idx_appointments_visit_date ON appointments(visit_date);
 CREATE INDEX idx_appointments_status_date ON appointments(status, date);
 CREATE INDEX idx_appointments_doctor_date ON appointments(doctor_id, date);
+-- One live booking per doctor/date/slot (see database/booking_rpc.sql)
+CREATE UNIQUE INDEX idx_appointments_doctor_slot_active ON appointments(doctor_id, date, time_slot) WHERE status <> 'cancelled';
 
 -- Operations indexes
 CREATE INDEX idx_operations_hospital_id ON operations(hospital_id);
@@ -23,12 +23,129 @@ class Settings(BaseSettings):
     # Supabase
     SUPABASE_URL: str = ""
     SUPABASE_KEY: str = ""
+    # Max concurrent blocking Supabase calls offloaded from async handlers
+    DB_EXECUTOR_WORKERS: int = 32
     
     # JWT Auth
     JWT_SECRET: str = "anagha-hospital-solutions-secret-key-2024"
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_HOURS: int = 24
-    
+
+    # Authenticated-principal cache (get_current_user)
+    AUTH_CACHE_TTL_SECONDS: int = 30
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+
+    # Token revocation (Bloom filter + Redis, rebuilt from token_blacklist)
+    TOKEN_REVOCATION_BLOOM_CAPACITY: int = 100000
+    TOKEN_REVOCATION_REFRESH_SECONDS: int = 60
+
+    # Slot availability index (per doctor/date booked-slot bitmaps)
+    SLOT_INDEX_MAX_ENTRIES: int = 20000
+    SLOT_INDEX_LOCAL_TTL_SECONDS: int = 30
+    # Counted from a bitmap's creation (not extended by writes); requires Redis >= 7
+    SLOT_INDEX_REDIS_TTL_SECONDS: int = 3600
+
+    # Compiled per-doctor schedules (slot grids)
+    SCHEDULE_CACHE_MAX_ENTRIES: int = 5000
+    SCHEDULE_CACHE_TTL_SECONDS: int = 300
+    # Default hours after a failed read (e.g. schedules.sql not applied yet) are kept this long
+    SCHEDULE_CACHE_ERROR_TTL_SECONDS: int = 30
+
+    # In-memory city search index (full reload picks up cities added by other workers)
+    CITY_INDEX_REFRESH_SECONDS: int = 3600
+    # Bounded cache for city search/popular responses
+    CITY_CACHE_MAX_ENTRIES: int = 2000
+    CITY_CACHE_TTL_SECONDS: int = 3600
+
+    # Hospital listing ETags: without Redis, each worker's version is only
+    # trusted for this long before clients are sent a fresh copy
+    HOSPITAL_LIST_LOCAL_VERSION_TTL_SECONDS: int = 30
+
+    # Read-through cache for doctor/hospital rows (process-local + Redis)
+    ENTITY_CACHE_MAX_ENTRIES: int = 5000
+    ENTITY_CACHE_LOCAL_TTL_SECONDS: int = 15
+    ENTITY_CACHE_REDIS_TTL_SECONDS: int = 600
+
+    # Report PostgREST round-trips per request in X-DB-Roundtrips (always on outside production)
+    DB_DEBUG_HEADERS: bool = False
+
+    # Background scheduler. Job store: sqlite:///file (single host), postgresql://...
+    # or redis://... (shared by all hosts), or "memory" (jobs lost on restart).
+    # Off by default: enabling it starts automated patient WhatsApp reminders
+    SCHEDULER_ENABLED: bool = False
+    SCHEDULER_JOBSTORE_URL: str = "sqlite:///scheduler_jobs.sqlite"
+    # Leader election: "redis", "file" or "auto" (redis for shared job stores, file for sqlite/memory)
+    SCHEDULER_LEADER_BACKEND: str = "auto"
+    SCHEDULER_LOCK_FILE: str = "scheduler.lock"
+    SCHEDULER_LEADER_TTL_SECONDS: int = 30
+    # How often the leader re-reads the job store for jobs other workers added;
+    # keep well below the 300s misfire grace time
+    SCHEDULER_POLL_SECONDS: int = 30
+
+    # Daily reminder pipeline
+    REMINDER_PAGE_SIZE: int = 500
+    REMINDER_MAX_PARALLEL_HOSPITALS: int = 8
+    # Per-appointment reminders: sent this many hours before the slot (0 = daily 9 AM batch instead)
+    REMINDER_LEAD_HOURS: int = 3
+    REMINDER_JITTER_SECONDS: int = 300
+    # Per-hospital send cap; reminders over the cap move to later minutes
+    REMINDER_HOSPITAL_MAX_PER_MINUTE: int = 6
+    REMINDER_MAX_SHIFT_MINUTES: int = 120
+
+    # Notification outbox (database/notification_outbox.sql); drained by every worker
+    OUTBOX_ENABLED: bool = True
+    OUTBOX_POLL_SECONDS: float = 2.0
+    OUTBOX_BATCH_SIZE: int = 8
+    OUTBOX_WORKERS: int = 4
+    # A lease must outlast the slowest send, or the row is delivered twice
+    OUTBOX_LEASE_SECONDS: int = 300
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_BACKOFF_BASE_SECONDS: int = 30
+    OUTBOX_BACKOFF_MAX_SECONDS: int = 3600
+
+    # Per-hospital WhatsApp send queues (one worker per session)
+    WHATSAPP_QUEUE_MAX_DEPTH: int = 200
+    WHATSAPP_QUEUE_IDLE_SECONDS: int = 300
+    # Must stay below OUTBOX_LEASE_SECONDS
+    WHATSAPP_QUEUE_SEND_TIMEOUT_SECONDS: int = 240
+
+    # WhatsApp Web send: condition waits and retry backoff
+    WHATSAPP_CHAT_TIMEOUT_SECONDS: float = 30
+    WHATSAPP_SEND_CONFIRM_TIMEOUT_SECONDS: float = 10
+    WHATSAPP_MAX_RETRIES: int = 3
+    WHATSAPP_RETRY_BACKOFF_SECONDS: float = 2
+    WHATSAPP_RETRY_BACKOFF_MAX_SECONDS: float = 30
+
+    # WhatsApp Web browsers: at most this many live, least recently used closed first
+    WHATSAPP_MAX_SESSIONS: int = 10
+    WHATSAPP_SESSION_DIR: str = "./whatsapp_sessions"
+    WHATSAPP_HEADLESS: bool = True
+    WHATSAPP_USER_AGENT: str = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    # Empty: resolved once per process with webdriver-manager
+    WHATSAPP_CHROMEDRIVER_PATH: str = ""
+
+    # WhatsApp transport: "selenium", "cloud_api" or "stub" (per hospital via hospitals.whatsapp_transport)
+    WHATSAPP_TRANSPORT: str = "selenium"
+    WHATSAPP_CLOUD_API_URL: str = "https://graph.facebook.com/v19.0"
+    # Defaults for hospitals without their own Cloud API number/token
+    WHATSAPP_CLOUD_API_TOKEN: str = ""
+    WHATSAPP_CLOUD_API_PHONE_NUMBER_ID: str = ""
+    WHATSAPP_CLOUD_API_CONCURRENCY: int = 8
+    WHATSAPP_CLOUD_API_TIMEOUT_SECONDS: float = 10
+    WHATSAPP_STUB_URL: str = "http://127.0.0.1:8088"
+
+    # WhatsApp message log files (background writer)
+    MESSAGE_LOG_FLUSH_SECONDS: float = 1.0
+    MESSAGE_LOG_BATCH_SIZE: int = 500
+    # Entries beyond this many waiting to be written are dropped, never blocking the sender
+    MESSAGE_LOG_QUEUE_MAX: int = 10000
+    MESSAGE_LOG_MAX_OPEN_FILES: int = 256
+    # Daily files this old are gzipped (0 = never)
+    MESSAGE_LOG_COMPRESS_AFTER_DAYS: int = 7
+    # Log queries: widest date range and largest page one request may ask for
+    MESSAGE_LOG_QUERY_MAX_DAYS: int = 93
+    MESSAGE_LOG_PAGE_MAX: int = 5000
+
     # SMTP
     SMTP_HOST: str = "mail.anaghasafar.com"
     SMTP_PORT: int = 587
@@ -1,12 +1,25 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from supabase import create_client, Client
-from typing import Optional
+from typing import Any, Callable, Optional, TypeVar
 from core.config import settings
+from core.request_context import count_db_roundtrip
 import logging
 
 logger = logging.getLogger(__name__)
 
 supabase: Optional[Client] = None
 
+T = TypeVar("T")
+
+# Dedicated, bounded pool for blocking Supabase/PostgREST calls made from async handlers
+_db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_EXECUTOR_WORKERS,
+    thread_name_prefix="supabase-db"
+)
+
 def init_db():
     global supabase
     if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
@@ -22,11 +35,33 @@ def init_db():
     except Exception as e:
         logger.error(f"❌ Could not initialize Supabase client: {e}")
 
+def _install_roundtrip_counter(client: Client):
+    # The PostgREST client can be rebuilt (e.g. on auth changes), so check on every access
+    session = getattr(client.postgrest, "session", None)
+    if session is None:
+        return
+    hooks = session.event_hooks["request"]
+    if count_db_roundtrip not in hooks:
+        hooks.append(count_db_roundtrip)
+
 def get_supabase() -> Optional[Client]:
     if not supabase:
         init_db()
+    if supabase:
+        _install_roundtrip_counter(supabase)
     return supabase
 
 def get_db():
     yield get_supabase()
 
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking database call (usually a whole *Service method) off the event loop.
+
+    The caller's context variables are carried into the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_db_executor, functools.partial(ctx.run, func, *args, **kwargs))
+
+def shutdown_db_executor():
+    _db_executor.shutdown(wait=False, cancel_futures=True)
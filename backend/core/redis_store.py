@@ -0,0 +1,49 @@
+"""
+Shared synchronous Redis connection for caches and other fast-path lookups.
+Rate limiting keeps its own asyncio connection (see core/limiter.py).
+"""
+import time
+import logging
+from typing import Optional
+import redis
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[redis.Redis] = None
+_last_failure: float = 0.0
+_RETRY_AFTER_SECONDS = 30
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """Return a connected Redis client, or None if Redis is unavailable.
+
+    A failed connection is not retried for a short while so callers on the
+    request path do not pay a connect timeout every time.
+    """
+    global _client, _last_failure
+    if _client is not None:
+        return _client
+    if _last_failure and time.monotonic() - _last_failure < _RETRY_AFTER_SECONDS:
+        return None
+    try:
+        client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=0.5,
+            socket_timeout=0.5
+        )
+        client.ping()
+        _client = client
+        logger.info("✅ Redis store connected")
+    except Exception as e:
+        _last_failure = time.monotonic()
+        logger.warning(f"⚠️ Redis store not available at {settings.REDIS_URL}: {e}")
+    return _client
+
+
+def reset_redis():
+    """Forget the current connection (e.g. after a connection error)."""
+    global _client, _last_failure
+    _client = None
+    _last_failure = time.monotonic()
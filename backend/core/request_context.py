@@ -0,0 +1,75 @@
+"""
+Per-request state carried in a context variable.
+
+- identity map: rows already read by primary key during this request, so
+  get_current_user / get_current_doctor and the services they feed do not
+  fetch the same row twice;
+- a count of PostgREST round-trips, reported in the X-DB-Roundtrips header
+  (outside production, or when DB_DEBUG_HEADERS is set).
+
+run_db and Starlette's threadpool copy the context into worker threads, and
+the scope object itself is shared, so reads made there land in the same map.
+Outside a request (scheduler jobs, scripts) there is no scope and every
+helper is a no-op.
+"""
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Hashable, Optional
+
+DB_ROUNDTRIPS_HEADER = "X-DB-Roundtrips"
+
+
+class RequestScope:
+    __slots__ = ("identity_map", "db_roundtrips", "_lock")
+
+    def __init__(self):
+        self.identity_map: Dict[Hashable, Dict[str, Any]] = {}
+        self.db_roundtrips = 0
+        self._lock = threading.Lock()
+
+    def count_roundtrip(self):
+        with self._lock:
+            self.db_roundtrips += 1
+
+
+_scope: ContextVar[Optional[RequestScope]] = ContextVar("request_scope", default=None)
+
+
+def begin_request():
+    """Start a scope for the current request; pass the token to end_request."""
+    return _scope.set(RequestScope())
+
+
+def end_request(token):
+    _scope.reset(token)
+
+
+def current_scope() -> Optional[RequestScope]:
+    return _scope.get()
+
+
+def identity_get(kind: str, key: Any) -> Optional[Dict[str, Any]]:
+    scope = _scope.get()
+    if scope is None:
+        return None
+    row = scope.identity_map.get((kind, key))
+    return dict(row) if row is not None else None
+
+
+def identity_put(kind: str, key: Any, row: Dict[str, Any]):
+    scope = _scope.get()
+    if scope is not None:
+        scope.identity_map[(kind, key)] = dict(row)
+
+
+def identity_discard(kind: str, key: Any):
+    scope = _scope.get()
+    if scope is not None:
+        scope.identity_map.pop((kind, key), None)
+
+
+def count_db_roundtrip(_request=None):
+    """httpx request hook installed on the Supabase PostgREST session."""
+    scope = _scope.get()
+    if scope is not None:
+        scope.count_roundtrip()
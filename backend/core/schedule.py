@@ -0,0 +1,135 @@
+"""
+Appointment schedule model.
+
+A schedule is a small JSON document stored on hospitals.schedule and
+doctors.schedule (doctor settings override the hospital's):
+
+    {
+      "sessions": [{"start": "09:30", "end": "16:00"}, {"start": "18:00", "end": "21:00"}],
+      "slot_minutes": 30,
+      "breaks": [{"start": "13:00", "end": "13:30"}],
+      "weekdays": [0, 1, 2, 3, 4, 5],
+      "holidays": ["2030-01-26"]
+    }
+
+compile_schedule() turns it into an immutable SlotGrid once; lookups on the
+grid are O(1) set/dict operations.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, Optional, Tuple
+
+# Morning slots: 9:30 AM to 3:30 PM, evening slots: 6:00 PM to 8:30 PM
+DEFAULT_SCHEDULE: Dict[str, Any] = {
+    "sessions": [{"start": "09:30", "end": "16:00"}, {"start": "18:00", "end": "21:00"}],
+    "slot_minutes": 30,
+    "breaks": [],
+    "weekdays": [0, 1, 2, 3, 4, 5, 6],
+    "holidays": [],
+}
+
+
+def parse_hhmm(value: str) -> int:
+    """'HH:MM' -> minutes after midnight. Raises ValueError on bad input."""
+    hours, minutes = value.split(":")
+    if len(hours) != 2 or len(minutes) != 2:
+        raise ValueError(f"Invalid time: {value}")
+    h, m = int(hours), int(minutes)
+    if not (0 <= h <= 24 and 0 <= m < 60) or (h == 24 and m):
+        raise ValueError(f"Invalid time: {value}")
+    return h * 60 + m
+
+
+def format_hhmm(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def normalize_time_slot(value: str) -> str:
+    """Accept 'HH:MM' or 'HH:MM:SS' and return 'HH:MM'."""
+    v = value.strip()[:5]
+    parse_hhmm(v)
+    return v
+
+
+@dataclass(frozen=True)
+class SlotGrid:
+    slots: Tuple[str, ...]
+    slot_set: FrozenSet[str]
+    index: Mapping[str, int]
+    # (start, end) minute intervals during which appointments may start
+    intervals: Tuple[Tuple[int, int], ...]
+    weekdays: FrozenSet[int]
+    holidays: FrozenSet[str]
+    slot_minutes: int
+    fingerprint: str
+
+    def is_valid_slot(self, time_slot: str) -> bool:
+        return time_slot in self.slot_set
+
+    def is_open(self, day: date) -> bool:
+        return day.weekday() in self.weekdays and day.isoformat() not in self.holidays
+
+    @property
+    def full_mask(self) -> int:
+        return (1 << len(self.slots)) - 1
+
+
+def _subtract(intervals, cut):
+    out = []
+    for start, end in intervals:
+        c_start, c_end = cut
+        if c_end <= start or c_start >= end:
+            out.append((start, end))
+            continue
+        if c_start > start:
+            out.append((start, c_start))
+        if c_end < end:
+            out.append((c_end, end))
+    return out
+
+
+@lru_cache(maxsize=256)
+def _compile(canonical: str) -> SlotGrid:
+    config = json.loads(canonical)
+    slot_minutes = int(config.get("slot_minutes") or 30)
+    if slot_minutes <= 0:
+        raise ValueError("slot_minutes must be positive")
+
+    intervals = sorted((parse_hhmm(s["start"]), parse_hhmm(s["end"])) for s in config.get("sessions") or [])
+    for b in config.get("breaks") or []:
+        intervals = _subtract(intervals, (parse_hhmm(b["start"]), parse_hhmm(b["end"])))
+
+    slots = []
+    for start, end in intervals:
+        t = start
+        while t + slot_minutes <= end:
+            slots.append(format_hhmm(t))
+            t += slot_minutes
+    slots = tuple(dict.fromkeys(slots))
+
+    return SlotGrid(
+        slots=slots,
+        slot_set=frozenset(slots),
+        index=MappingProxyType({s: i for i, s in enumerate(slots)}),
+        intervals=tuple(intervals),
+        weekdays=frozenset(int(d) for d in config.get("weekdays", range(7))),
+        holidays=frozenset(str(d) for d in config.get("holidays") or []),
+        slot_minutes=slot_minutes,
+        fingerprint=hashlib.sha1(",".join(slots).encode("utf-8")).hexdigest()[:10],
+    )
+
+
+def compile_schedule(*configs: Optional[Dict[str, Any]]) -> SlotGrid:
+    """Compile the default schedule overlaid with each given config, in order."""
+    merged = dict(DEFAULT_SCHEDULE)
+    for config in configs:
+        if config:
+            merged.update({k: v for k, v in config.items() if v is not None})
+    return _compile(json.dumps(merged, sort_keys=True))
+
+
+DEFAULT_GRID = compile_schedule()
@@ -0,0 +1,83 @@
+-- booking_rpc.sql
+-- Atomic appointment booking in a single round-trip.
+-- Run in the Supabase SQL editor after complete_schema.sql / schema_v2.sql.
+
+-- 1. At most one live (non-cancelled) appointment per doctor, date and slot.
+--    This is what actually prevents double-booking under concurrency.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_appointments_doctor_slot_active
+  ON public.appointments (doctor_id, date, time_slot)
+  WHERE status <> 'cancelled';
+
+-- 2. Validate doctor/hospital, resolve or create the guest patient and insert
+--    the appointment in one transaction. Business-rule failures are raised
+--    with a stable message code that AppointmentService maps to HTTP errors:
+--      DOCTOR_NOT_FOUND, DOCTOR_WITHOUT_HOSPITAL, HOSPITAL_MISMATCH,
+--      HOSPITAL_NOT_APPROVED, SLOT_TAKEN
+CREATE OR REPLACE FUNCTION public.book_appointment(
+  p_doctor_id INTEGER,
+  p_date DATE,
+  p_time_slot TEXT,
+  p_user_id INTEGER DEFAULT NULL,
+  p_user_hospital_id INTEGER DEFAULT NULL,
+  p_reason TEXT DEFAULT '',
+  p_guest_name TEXT DEFAULT NULL,
+  p_guest_mobile TEXT DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_doctor doctors%ROWTYPE;
+  v_hospital hospitals%ROWTYPE;
+  v_appointment appointments%ROWTYPE;
+  v_user_id INTEGER := p_user_id;
+  v_is_guest BOOLEAN := p_guest_mobile IS NOT NULL;
+BEGIN
+  SELECT * INTO v_doctor FROM doctors WHERE id = p_doctor_id AND is_active = true;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'DOCTOR_NOT_FOUND';
+  END IF;
+
+  IF v_doctor.hospital_id IS NULL THEN
+    RAISE EXCEPTION 'DOCTOR_WITHOUT_HOSPITAL';
+  END IF;
+
+  IF NOT v_is_guest AND p_user_hospital_id IS NOT NULL AND p_user_hospital_id <> v_doctor.hospital_id THEN
+    RAISE EXCEPTION 'HOSPITAL_MISMATCH';
+  END IF;
+
+  SELECT * INTO v_hospital FROM hospitals WHERE id = v_doctor.hospital_id;
+  IF NOT FOUND OR v_hospital.status NOT IN ('approved', 'ACTIVE') THEN
+    RAISE EXCEPTION 'HOSPITAL_NOT_APPROVED';
+  END IF;
+
+  IF v_is_guest THEN
+    SELECT id INTO v_user_id FROM users WHERE mobile = p_guest_mobile AND role = 'patient';
+    IF NOT FOUND THEN
+      -- Guest accounts are inactive and get an unusable password marker
+      INSERT INTO users (name, mobile, role, is_active, password_hash)
+      VALUES (p_guest_name, p_guest_mobile, 'patient', false, '!guest:' || md5(random()::text || clock_timestamp()::text))
+      RETURNING id INTO v_user_id;
+    END IF;
+  END IF;
+
+  BEGIN
+    INSERT INTO appointments (user_id, doctor_id, hospital_id, date, time_slot, status, reason)
+    VALUES (v_user_id, p_doctor_id, v_doctor.hospital_id, p_date, p_time_slot, 'pending', COALESCE(p_reason, ''))
+    RETURNING * INTO v_appointment;
+  EXCEPTION WHEN unique_violation THEN
+    RAISE EXCEPTION 'SLOT_TAKEN';
+  END;
+
+  RETURN jsonb_build_object(
+    'appointment', to_jsonb(v_appointment),
+    'doctor', to_jsonb(v_doctor),
+    'hospital', to_jsonb(v_hospital),
+    'user_id', v_user_id
+  );
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.book_appointment(INTEGER, DATE, TEXT, INTEGER, INTEGER, TEXT, TEXT, TEXT) TO service_role;
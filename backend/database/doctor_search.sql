@@ -0,0 +1,84 @@
+-- doctor_search.sql
+-- Ranked, keyset-paginated doctor search backed by pg_trgm.
+-- Run in the Supabase SQL editor after complete_schema.sql / schema_v2.sql.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 1. Trigram indexes so similarity / ILIKE '%q%' lookups do not scan the tables.
+CREATE INDEX IF NOT EXISTS idx_doctors_name_trgm
+  ON public.doctors USING gin (lower(name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_doctors_specialization_trgm
+  ON public.doctors USING gin (lower(specialization) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_hospitals_name_trgm
+  ON public.hospitals USING gin (lower(name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_hospitals_city_trgm
+  ON public.hospitals USING gin (lower(city) gin_trgm_ops);
+
+-- 2. Search active doctors by name, specialization, hospital name and city.
+--    Results are ordered by (rank DESC, id ASC); pass the rank and id of the
+--    last row of a page as p_after_rank / p_after_id to fetch the next one.
+CREATE OR REPLACE FUNCTION public.search_doctors(
+  p_query TEXT,
+  p_hospital_id INTEGER DEFAULT NULL,
+  p_limit INTEGER DEFAULT 20,
+  p_after_rank NUMERIC DEFAULT NULL,
+  p_after_id INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+  id INTEGER,
+  name TEXT,
+  degree TEXT,
+  specialization TEXT,
+  institute_name TEXT,
+  experience1 TEXT,
+  experience2 TEXT,
+  experience3 TEXT,
+  experience4 TEXT,
+  hospital_id INTEGER,
+  hospital_name TEXT,
+  city TEXT,
+  state TEXT,
+  rank NUMERIC
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH q AS (
+    SELECT lower(trim(p_query)) AS term
+  ), scored AS (
+    SELECT
+      d.id, d.name, d.degree, d.specialization, d.institute_name,
+      d.experience1, d.experience2, d.experience3, d.experience4,
+      d.hospital_id, h.name AS hospital_name, h.city, h.state,
+      ROUND(GREATEST(
+        CASE WHEN lower(d.name) LIKE q.term || '%' THEN 1.0 ELSE 0 END,
+        word_similarity(q.term, lower(d.name)),
+        0.8 * word_similarity(q.term, lower(coalesce(d.specialization, ''))),
+        0.6 * word_similarity(q.term, lower(coalesce(h.name, ''))),
+        0.6 * word_similarity(q.term, lower(coalesce(h.city, '')))
+      )::NUMERIC, 4) AS rank
+    FROM doctors d
+    JOIN q ON true
+    LEFT JOIN hospitals h ON h.id = d.hospital_id
+    WHERE d.is_active = true
+      AND (p_hospital_id IS NULL OR d.hospital_id = p_hospital_id)
+      AND (
+        lower(d.name) LIKE '%' || q.term || '%'
+        OR lower(d.specialization) LIKE '%' || q.term || '%'
+        OR lower(h.name) LIKE '%' || q.term || '%'
+        OR lower(h.city) LIKE '%' || q.term || '%'
+        OR q.term <% lower(d.name)
+        OR q.term <% lower(d.specialization)
+      )
+  )
+  SELECT * FROM scored
+  WHERE p_after_rank IS NULL
+     OR rank < p_after_rank
+     OR (rank = p_after_rank AND id > p_after_id)
+  ORDER BY rank DESC, id ASC
+  LIMIT LEAST(GREATEST(p_limit, 1), 100);
+$$;
+
+GRANT EXECUTE ON FUNCTION public.search_doctors(TEXT, INTEGER, INTEGER, NUMERIC, INTEGER) TO service_role;
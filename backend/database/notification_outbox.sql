@@ -0,0 +1,100 @@
+-- notification_outbox.sql
+-- Transactional outbox for WhatsApp / email notifications.
+-- Run in the Supabase SQL editor after schema_v2.sql / booking_rpc.sql.
+
+-- 1. Outbox rows are written in the same transaction as the change they
+--    announce and delivered later by services/notification_outbox.py.
+--    status: pending -> processing (leased) -> sent | dead
+CREATE TABLE IF NOT EXISTS public.notification_outbox (
+  id BIGSERIAL PRIMARY KEY,
+  channel TEXT NOT NULL CHECK (channel IN ('whatsapp', 'email')),
+  hospital_id INTEGER REFERENCES public.hospitals(id) ON DELETE CASCADE,
+  recipient TEXT NOT NULL,
+  subject TEXT,
+  message TEXT NOT NULL,
+  message_html TEXT,
+  purpose TEXT,
+  resource_type TEXT,
+  resource_id INTEGER,
+  status TEXT NOT NULL DEFAULT 'pending',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 5,
+  next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  locked_by TEXT,
+  locked_until TIMESTAMPTZ,
+  last_error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  sent_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_due
+  ON public.notification_outbox (next_attempt_at)
+  WHERE status IN ('pending', 'processing');
+
+-- 2. Lease up to p_limit due rows to one worker. SKIP LOCKED lets any number
+--    of workers claim concurrently without ever handing out the same row;
+--    rows whose lease expired (worker died mid-send) are claimed again.
+CREATE OR REPLACE FUNCTION public.claim_notifications(
+  p_worker TEXT,
+  p_limit INTEGER DEFAULT 20,
+  p_lease_seconds INTEGER DEFAULT 120
+)
+RETURNS SETOF public.notification_outbox
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  UPDATE notification_outbox o
+     SET status = 'processing',
+         locked_by = p_worker,
+         locked_until = now() + make_interval(secs => p_lease_seconds),
+         attempts = o.attempts + 1
+   WHERE o.id IN (
+     SELECT id FROM notification_outbox
+      WHERE (status = 'pending' AND next_attempt_at <= now())
+         OR (status = 'processing' AND locked_until < now())
+      ORDER BY next_attempt_at
+      LIMIT p_limit
+      FOR UPDATE SKIP LOCKED
+   )
+  RETURNING o.*;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.claim_notifications(TEXT, INTEGER, INTEGER) TO service_role;
+
+-- 3. Book an operation and enqueue its notifications in one transaction.
+--    p_notifications is a JSON array of outbox rows (channel, recipient,
+--    message, ...); resource_type/resource_id are filled in here.
+CREATE OR REPLACE FUNCTION public.book_operation(
+  p_patient_id INTEGER,
+  p_doctor_id INTEGER,
+  p_hospital_id INTEGER,
+  p_specialty TEXT,
+  p_operation_date DATE,
+  p_notes TEXT DEFAULT NULL,
+  p_notifications JSONB DEFAULT '[]'::jsonb
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_operation operations%ROWTYPE;
+BEGIN
+  INSERT INTO operations (patient_id, doctor_id, hospital_id, specialty, operation_date, status, notes)
+  VALUES (p_patient_id, p_doctor_id, p_hospital_id, p_specialty, p_operation_date, 'pending', p_notes)
+  RETURNING * INTO v_operation;
+
+  INSERT INTO notification_outbox (channel, hospital_id, recipient, subject, message, message_html, purpose, resource_type, resource_id)
+  SELECT n.channel, COALESCE(n.hospital_id, p_hospital_id), n.recipient, n.subject, n.message, n.message_html,
+         n.purpose, 'operation', v_operation.id
+    FROM jsonb_to_recordset(p_notifications) AS n(
+      channel TEXT, hospital_id INTEGER, recipient TEXT, subject TEXT, message TEXT, message_html TEXT, purpose TEXT
+    );
+
+  RETURN to_jsonb(v_operation);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.book_operation(INTEGER, INTEGER, INTEGER, TEXT, DATE, TEXT, JSONB) TO service_role;
@@ -0,0 +1,9 @@
+-- schedules.sql
+-- Per-hospital / per-doctor appointment hours (see core/schedule.py).
+-- NULL means "use the default hours"; a doctor's schedule overrides the
+-- hospital's key by key. Example:
+--   {"sessions": [{"start": "10:00", "end": "14:00"}], "slot_minutes": 20,
+--    "breaks": [], "weekdays": [0,1,2,3,4], "holidays": ["2030-01-26"]}
+
+ALTER TABLE public.hospitals ADD COLUMN IF NOT EXISTS schedule JSONB;
+ALTER TABLE public.doctors ADD COLUMN IF NOT EXISTS schedule JSONB;
@@ -0,0 +1,14 @@
+-- whatsapp_transport.sql
+-- Per-hospital WhatsApp transport selection (services/whatsapp_transports).
+-- Run in the Supabase SQL editor after complete_schema.sql.
+
+-- NULL transport = the server default (WHATSAPP_TRANSPORT).
+-- Cloud API number/token fall back to WHATSAPP_CLOUD_API_* when NULL.
+ALTER TABLE public.hospitals
+  ADD COLUMN IF NOT EXISTS whatsapp_transport VARCHAR(20)
+    CHECK (whatsapp_transport IN ('selenium', 'cloud_api', 'stub')),
+  ADD COLUMN IF NOT EXISTS whatsapp_phone_number_id VARCHAR(64),
+  ADD COLUMN IF NOT EXISTS whatsapp_access_token TEXT;
+
+COMMENT ON COLUMN public.hospitals.whatsapp_transport IS 'WhatsApp transport: selenium (WhatsApp Web), cloud_api or stub';
+COMMENT ON COLUMN public.hospitals.whatsapp_access_token IS 'WhatsApp Cloud API access token (should be encrypted in production)';
@@ -1,7 +1,10 @@
 from fastapi import Depends, HTTPException, status, Request
 from jose import JWTError, jwt
 from core.config import settings
-from core.database import get_supabase
+from core.database import get_supabase, run_db
+from services.auth_cache import get_cached_principal, cache_principal
+from services import entity_cache, token_revocation
+from core.request_context import identity_get, identity_put
 from typing import Optional
 
 async def get_current_user(request: Request):
@@ -35,17 +38,19 @@ async def get_current_user(request: Request):
     if not supabase:
         raise HTTPException(status_code=500, detail="Database error")
     
-    # 1. Check if token is blacklisted
-    is_blacklisted = supabase.table("token_blacklist").select("id").eq("token", token).execute()
-    if is_blacklisted.data:
+    # 1. Check if token is blacklisted (Bloom filter first, Redis/DB only on a possible hit)
+    if await run_db(token_revocation.is_revoked, token):
         raise HTTPException(status_code=401, detail="Token has been revoked")
 
-    # 2. Fetch user
-    result = supabase.table("users").select("*").eq("id", int(user_id)).execute()
-    if not result.data:
-        raise credentials_exception
-        
-    user = result.data[0]
+    # 2. Fetch user (served from the request identity map or principal cache when possible)
+    user = identity_get("user", int(user_id)) or get_cached_principal(user_id, token_version)
+    if user is None:
+        result = await run_db(supabase.table("users").select("*").eq("id", int(user_id)).execute)
+        if not result.data:
+            raise credentials_exception
+        user = result.data[0]
+        cache_principal(user_id, token_version, user)
+    identity_put("user", int(user_id), user)
     
     # 3. Check is_active flag
     if not user.get("is_active", True):
@@ -65,17 +70,15 @@ async def get_current_active_user(current_user: dict = Depends(get_current_user)
 
 async def get_current_doctor(current_user: dict = Depends(get_current_user)):
     """Ensure current user is a doctor and return doctor profile"""
-    supabase = get_supabase()
-    
     try:
-        doctor_result = supabase.table("doctors").select("*").eq("user_id", current_user["id"]).eq("is_active", True).execute()
-        if not doctor_result.data:
+        # is_active is checked on the current row, so a deactivation applies to the next request
+        doctor = await run_db(entity_cache.get_doctor_by_user, current_user["id"], fresh=True)
+        if not doctor or not doctor.get("is_active"):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Doctor access required. No active doctor profile found."
             )
             
-        doctor = doctor_result.data[0]
         # Merge info for compatibility mapping
         doctor["user_id"] = current_user["id"]
         doctor["role"] = "doctor"
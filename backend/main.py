@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
@@ -5,9 +6,13 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from core.config import settings
-from core.database import init_db
+from core.database import init_db, run_db, shutdown_db_executor
+from core.request_context import DB_ROUNDTRIPS_HEADER, begin_request, current_scope, end_request
 from core.limiter import init_redis
 from fastapi_limiter import FastAPILimiter
+from services import token_revocation
+from services import notification_outbox, scheduler_service
+from services.city_index import city_index, hospital_city_index, run_city_index_refresh
 
 # Configure logging
 logging.basicConfig(
@@ -31,9 +36,40 @@ async def lifespan(app: FastAPI):
         logger.info("✅ Rate limiter initialized.")
     else:
         logger.warning("⚠️ Rate limiting will be disabled (Redis unavailable).")
+    # Load revoked tokens before serving, then keep the filter fresh in the background
+    try:
+        revoked = await run_db(token_revocation.refresh_from_database)
+        logger.info(f"✅ Token revocation filter loaded ({revoked} revoked tokens)")
+    except Exception as e:
+        logger.warning(f"⚠️ Could not load token revocations, falling back to per-request checks: {e}")
+    revocation_task = asyncio.create_task(token_revocation.run_revocation_maintenance())
+    # City search is served from memory; until the index loads it falls back to the database
+    for index in (city_index, hospital_city_index):
+        try:
+            await run_db(index.load_from_db)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load {index.name.lower()}, it will be built on first use: {e}")
+    city_index_task = asyncio.create_task(run_city_index_refresh())
+    # Every worker can enqueue jobs; only the elected leader executes them
+    leader_task = None
+    if settings.SCHEDULER_ENABLED:
+        scheduler_service.start_scheduler()
+        leader_task = asyncio.create_task(scheduler_service.run_leader_election())
+    # Every worker drains the notification outbox; SKIP LOCKED leases keep them apart
+    outbox_task = None
+    if settings.OUTBOX_ENABLED:
+        outbox_task = asyncio.create_task(notification_outbox.run_outbox_worker())
     yield
     # Shutdown
     logger.info("🛑 Shutting down Server...")
+    revocation_task.cancel()
+    city_index_task.cancel()
+    if leader_task:
+        leader_task.cancel()
+        scheduler_service.shutdown_scheduler()
+    if outbox_task:
+        outbox_task.cancel()
+    shutdown_db_executor()
 
 app = FastAPI(
     title="Hospital Booking System API",
@@ -55,8 +91,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursors travel in headers so list bodies stay unchanged
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Request-scoped identity map and DB round-trip counter
+@app.middleware("http")
+async def request_scope_middleware(request: Request, call_next):
+    token = begin_request()
+    try:
+        scope = current_scope()
+        response = await call_next(request)
+        if settings.DB_DEBUG_HEADERS or settings.ENVIRONMENT != "production":
+            response.headers[DB_ROUNDTRIPS_HEADER] = str(scope.db_roundtrips)
+        return response
+    finally:
+        end_request(token)
+
 # Include routers
 app.include_router(users.router)
 app.include_router(hospitals.router)
@@ -64,6 +115,7 @@ app.include_router(appointments.router)
 app.include_router(operations.router)
 app.include_router(payments.router)
 app.include_router(admin.router)
+app.include_router(cities.router)
 app.include_router(whatsapp_logs.router)
 
 # Validation exception handler
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, BackgroundTasks
+from fastapi import APIRouter, Depends, BackgroundTasks, Query
 from dependencies.auth import get_current_user, get_current_doctor
 from services.appointment_service import AppointmentService
+from core.database import run_db
 from schemas import AppointmentCreate, GuestAppointmentCreate
 from typing import List
 from datetime import date
@@ -12,7 +13,7 @@ router = APIRouter(prefix="/api/appointments", tags=["appointments"])
 
 @router.post("/book", response_model=dict, dependencies=[Depends(RateLimiter(times=3, seconds=60))])
 async def book_appointment(appointment: AppointmentCreate, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
-    result = AppointmentService.process_booking(appointment.model_dump(), current_user, is_guest=False)
+    result = await run_db(AppointmentService.process_booking, appointment.model_dump(), current_user, is_guest=False)
     # Background tasks like whatsapp can be queued here from result returned values
     apt = result["appointment"]
     return {
@@ -30,7 +31,7 @@ async def book_appointment(appointment: AppointmentCreate, background_tasks: Bac
 
 @router.post("/book-guest", response_model=dict, dependencies=[Depends(RateLimiter(times=2, seconds=120))])
 async def book_appointment_guest(appointment: GuestAppointmentCreate, background_tasks: BackgroundTasks):
-    result = AppointmentService.process_booking(appointment.model_dump(), {}, is_guest=True)
+    result = await run_db(AppointmentService.process_booking, appointment.model_dump(), {}, is_guest=True)
     apt = result["appointment"]
     return {
         "id": apt["id"],
@@ -45,27 +46,37 @@ async def book_appointment_guest(appointment: GuestAppointmentCreate, background
 
 @router.get("/my-appointments")
 async def get_my_appointments(current_user: dict = Depends(get_current_user)):
-    return AppointmentService.get_user_appointments(current_user["id"])
+    return await run_db(AppointmentService.get_user_appointments, current_user["id"])
 
 @router.get("/doctor-appointments")
 async def get_doctor_appointments(current_doctor: dict = Depends(get_current_doctor)):
-    return AppointmentService.get_doctor_appointments(current_doctor["user_id"])
+    return await run_db(AppointmentService.get_doctor_appointments, current_doctor["user_id"])
 
 @router.put("/{appointment_id}/confirm")
 async def confirm_appointment(appointment_id: int, current_doctor: dict = Depends(get_current_doctor)):
-    AppointmentService.update_status(appointment_id, current_doctor["user_id"], current_doctor.get("role", "doctor"), "confirm")
+    await run_db(AppointmentService.update_status, appointment_id, current_doctor["user_id"], current_doctor.get("role", "doctor"), "confirm")
     return {"message": "Appointment confirmed"}
 
 @router.put("/{appointment_id}/cancel")
 async def cancel_appointment(appointment_id: int, current_user: dict = Depends(get_current_user)):
-    AppointmentService.update_status(appointment_id, current_user["id"], current_user.get("role", "patient"), "cancel")
+    await run_db(AppointmentService.update_status, appointment_id, current_user["id"], current_user.get("role", "patient"), "cancel")
     return {"message": "Appointment cancelled"}
 
 @router.put("/{appointment_id}/mark-visited")
 async def mark_appointment_visited(appointment_id: int, current_doctor: dict = Depends(get_current_doctor)):
-    AppointmentService.update_status(appointment_id, current_doctor["user_id"], current_doctor.get("role", "doctor"), "mark_visited")
+    await run_db(AppointmentService.update_status, appointment_id, current_doctor["user_id"], current_doctor.get("role", "doctor"), "mark_visited")
     return {"message": "Appointment marked as visited", "visit_date": date.today().isoformat()}
 
 @router.get("/available-slots")
 async def get_available_slots(doctor_id: int, date: str, current_user: dict = Depends(get_current_user)):
-    return AppointmentService.get_available_slots(doctor_id, date)
+    return await run_db(AppointmentService.get_available_slots, doctor_id, date)
+
+@router.get("/availability")
+async def get_availability_calendar(
+    doctor_id: int,
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Per-day booked-slot bitmasks (bit i = slots[i] taken) for up to 30 days."""
+    return await run_db(AppointmentService.get_availability_range, doctor_id, from_date, to_date)
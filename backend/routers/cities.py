@@ -1,34 +1,28 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from dependencies.auth import get_current_admin
 from services.city_service import CityService
+from services.city_index import city_index
+from core.database import run_db
+from core.cache import TTLCache
+from core.config import settings
 from typing import Optional, List
 import logging
-from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/cities", tags=["cities"])
 
-# In-memory cache for city searches
-city_search_cache = {}
-CACHE_TTL = 3600  # Cache for 1 hour
-cache_timestamps = {}
+# Bounded cache for city searches, keyed "search:<query>" / "popular"
+city_cache = TTLCache(
+    max_entries=settings.CITY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CITY_CACHE_TTL_SECONDS
+)
 
 def get_cached_cities(query: str) -> Optional[List[dict]]:
-    cache_key = query.lower()
-    if cache_key in city_search_cache:
-        if cache_key in cache_timestamps:
-            age = (datetime.now() - cache_timestamps[cache_key]).total_seconds()
-            if age < CACHE_TTL:
-                return city_search_cache[cache_key]
-            else:
-                del city_search_cache[cache_key]
-                del cache_timestamps[cache_key]
-    return None
+    return city_cache.get(query.lower())
 
 def set_cached_cities(query: str, cities: List[dict]):
-    cache_key = query.lower()
-    city_search_cache[cache_key] = cities
-    cache_timestamps[cache_key] = datetime.now()
+    city_cache.set(query.lower(), cities)
 
 @router.get("/search")
 async def search_cities(q: str = Query("", description="Search query for city name")):
@@ -36,14 +30,18 @@ async def search_cities(q: str = Query("", description="Search query for city na
         query = q.strip().lower()
         if len(query) < 2:
             return {"cities": [], "source": "empty_query"}
+
+        # The in-memory index answers without a database round-trip
+        if city_index.loaded:
+            return {"cities": city_index.search(query), "source": "index", "cached": False}
         
-        cached_results = get_cached_cities(query)
+        cached_results = get_cached_cities(f"search:{query}")
         if cached_results is not None:
             return {"cities": cached_results, "source": "cache", "cached": True}
         
-        matching_cities = CityService.query_city_database(query)
+        matching_cities = await run_db(CityService.query_city_database, query)
         if matching_cities:
-            set_cached_cities(query, matching_cities)
+            set_cached_cities(f"search:{query}", matching_cities)
             
         return {"cities": matching_cities, "source": "database", "cached": False}
     except Exception as e:
@@ -58,7 +56,7 @@ async def get_popular_cities():
         if cached:
             return {"cities": cached, "source": "cache", "cached": True}
         
-        popular = CityService.get_popular_cities_from_db()
+        popular = await run_db(CityService.get_popular_cities_from_db)
         set_cached_cities(cache_key, [{"city_name": city} for city in popular])
         return {"cities": popular, "source": "database", "cached": False}
     except Exception as e:
@@ -66,20 +64,21 @@ async def get_popular_cities():
         return {"cities": [], "source": "fallback"}
 
 @router.post("/add")
-async def add_new_city(city_data: dict):
+async def add_new_city(city_data: dict, admin: dict = Depends(get_current_admin)):
     try:
         city_name = city_data.get("city_name", "").strip()
         if not city_name:
             raise HTTPException(status_code=400, detail="City name is required")
             
-        result = CityService.add_new_city(city_data)
+        result = await run_db(CityService.add_new_city, city_data)
         
         if result["message"] == "City added successfully":
-            cache_key = city_name.lower()
-            if cache_key in city_search_cache:
-                del city_search_cache[cache_key]
-                if cache_key in cache_timestamps:
-                    del cache_timestamps[cache_key]
+            # Any cached search whose query occurs in the new name is now stale
+            name = city_name.lower()
+            city_cache.invalidate_where(
+                lambda key: key.startswith("search:") and key[len("search:"):] in name
+            )
+            city_cache.invalidate_prefix("popular")
                     
         return result
     except HTTPException:
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, BackgroundTasks
 from schemas import HospitalCreate
 from services.hospital_service import HospitalService
+from services.schedule_service import ScheduleService
 from dependencies.auth import get_current_user, get_current_admin
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Literal, Optional, List
 
 router = APIRouter(prefix="/api/hospitals", tags=["hospitals"])
 
@@ -22,21 +23,53 @@ def register_hospital(hospital: HospitalCreate, background_tasks: BackgroundTask
         "status": result["status"]
     }
 
+def _hospital_listing(request: Request, response: Response, status_filter: Optional[str], limit: Optional[int], cursor: Optional[int]):
+    etag = HospitalService.list_etag(status_filter, limit, cursor)
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    rows, next_cursor = HospitalService.get_public_hospitals(status_filter, limit, cursor)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return rows
+
 @router.get("/", response_model=List[dict])
-def get_hospitals(status_filter: Optional[str] = None):
-    return HospitalService.get_public_hospitals(status_filter)
+def get_hospitals(
+    request: Request,
+    response: Response,
+    status_filter: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=HospitalService.LIST_MAX_LIMIT),
+    cursor: Optional[int] = None
+):
+    return _hospital_listing(request, response, status_filter, limit, cursor)
 
 @router.get("/approved", response_model=List[dict])
-def get_approved_hospitals():
-    return HospitalService.get_public_hospitals("approved")
+def get_approved_hospitals(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=HospitalService.LIST_MAX_LIMIT),
+    cursor: Optional[int] = None
+):
+    return _hospital_listing(request, response, "approved", limit, cursor)
 
 @router.get("/pending", response_model=List[dict])
-def get_pending_hospitals(admin: dict = Depends(get_current_admin)):
-    return HospitalService.get_public_hospitals("pending")
+def get_pending_hospitals(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=HospitalService.LIST_MAX_LIMIT),
+    cursor: Optional[int] = None,
+    admin: dict = Depends(get_current_admin)
+):
+    return _hospital_listing(request, response, "pending", limit, cursor)
 
 @router.get("/{hospital_id}", response_model=dict)
 def get_hospital_by_id(hospital_id: int):
-    return HospitalService.get_hospital_by_id(hospital_id)
+    hospital = HospitalService.get_hospital_by_id(hospital_id)
+    hospital.pop("whatsapp_access_token", None)
+    return hospital
 
 @router.put("/{hospital_id}/approve")
 def approve_hospital(hospital_id: int, admin: dict = Depends(get_current_admin)):
@@ -52,6 +85,9 @@ class WhatsAppSettingsUpdate(BaseModel):
     whatsapp_enabled: Optional[str] = None
     whatsapp_confirmation_template: Optional[str] = None
     whatsapp_followup_template: Optional[str] = None
+    whatsapp_transport: Optional[Literal["selenium", "cloud_api", "stub"]] = None
+    whatsapp_phone_number_id: Optional[str] = None
+    whatsapp_access_token: Optional[str] = None
 
 @router.put("/{hospital_id}/whatsapp-settings")
 def update_whatsapp_settings(hospital_id: int, settings: WhatsAppSettingsUpdate, admin: dict = Depends(get_current_admin)):
@@ -71,3 +107,19 @@ class SMTPConfigUpdate(BaseModel):
 def update_smtp_settings(hospital_id: int, smtp_config: SMTPConfigUpdate, admin: dict = Depends(get_current_admin)):
     HospitalService.update_smtp_settings(hospital_id, smtp_config.model_dump(exclude_unset=True))
     return {"message": "SMTP settings updated"}
+
+class TimeRange(BaseModel):
+    start: str
+    end: str
+
+class ScheduleUpdate(BaseModel):
+    sessions: Optional[List[TimeRange]] = None
+    slot_minutes: Optional[int] = None
+    breaks: Optional[List[TimeRange]] = None
+    weekdays: Optional[List[int]] = None  # 0 = Monday
+    holidays: Optional[List[str]] = None  # YYYY-MM-DD
+
+@router.put("/{hospital_id}/schedule")
+def update_schedule(hospital_id: int, schedule: ScheduleUpdate, admin: dict = Depends(get_current_admin)):
+    result = ScheduleService.update_hospital_schedule(hospital_id, schedule.model_dump(exclude_none=True))
+    return {"message": "Schedule updated", **result}
@@ -5,36 +5,18 @@ from services.operation_service import OperationService
 from typing import List
 from datetime import datetime
 import logging
-from services.whatsapp_service import send_whatsapp_message_by_hospital_id
-from services.message_templates import get_confirmation_message
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/operations", tags=["operations"])
 
 @router.post("/book", response_model=dict)
 def book_operation(operation: OperationCreate, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
+    # The confirmation message is written to the notification outbox with the booking
     result = OperationService.process_booking(operation.model_dump(), current_user)
     
     op = result["operation"]
     hospital = result["hospital"]
     
-    if background_tasks and (hospital.get("whatsapp_enabled") == "true" or hospital.get("whatsapp_enabled") is True):
-        msg = get_confirmation_message(
-            patient_name=current_user.get("name", ""),
-            doctor_name=result["doctor"].get("name", ""),
-            date=str(operation.date),
-            time_slot=None,
-            hospital_name=hospital.get("name", ""),
-            specialty=str(operation.specialty),
-            custom_template=hospital.get("whatsapp_confirmation_template")
-        )
-        background_tasks.add_task(
-            send_whatsapp_message_by_hospital_id,
-            hospital_id=hospital["id"],
-            mobile=current_user.get("mobile", ""),
-            message=msg
-        )
-
     return {
         "id": op["id"],
         "patient_id": op["patient_id"],
@@ -6,6 +6,7 @@ Gateway-agnostic — works with Razorpay, Cashfree, or any future gateway.
 from fastapi import APIRouter, Depends, HTTPException, Request
 from dependencies.auth import get_current_user
 from services.payment_service import PaymentService
+from core.database import run_db
 from services.gateways import get_payment_gateway
 from pydantic import BaseModel
 from typing import Optional
@@ -120,7 +121,7 @@ async def payment_webhook_receiver(request: Request):
         event = data.get("type", "")
 
     try:
-        PaymentService.process_webhook(event, data)
+        await run_db(PaymentService.process_webhook, event, data)
         return {"status": "ok"}
     except Exception as e:
         logger.error(f"Webhook processing error: {e}")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request, Response
 from dependencies.auth import get_current_user, get_current_doctor, get_current_active_user
 from services.user_service import UserService
 from services.doctor_service import DoctorService
@@ -7,6 +7,7 @@ from core.security import create_access_token, create_refresh_token
 from services.audit_logger import log_login_attempt
 from fastapi_limiter.depends import RateLimiter
 from core.limiter import get_real_ip
+from core.database import run_db
 from typing import Optional
 
 router = APIRouter(prefix="/api/users", tags=["users"])
@@ -26,7 +27,7 @@ async def register_user(user: UserCreate, response: Response):
         user_data["address_line1"] = user.address
     user_data.pop("address", None)
         
-    db_user = UserService.register_user(user_data)
+    db_user = await run_db(UserService.register_user, user_data)
     
     access_token = create_access_token(data={"sub": str(db_user["id"]), "role": db_user["role"], "token_version": 1})
     refresh_token = create_refresh_token(data={"sub": str(db_user["id"]), "role": db_user["role"], "token_version": 1})
@@ -44,12 +45,12 @@ async def login_user(user_credentials: UserLogin, request: Request, response: Re
     """Login user with brute-force protection"""
     user_agent = request.headers.get("user-agent")
     
-    user = UserService.authenticate_user(user_credentials.mobile, user_credentials.password)
+    user = await run_db(UserService.authenticate_user, user_credentials.mobile, user_credentials.password)
     if not user:
-        log_login_attempt(mobile=user_credentials.mobile, success=False, ip_address=ip, user_agent=user_agent)
+        await run_db(log_login_attempt, mobile=user_credentials.mobile, success=False, ip_address=ip, user_agent=user_agent)
         raise HTTPException(status_code=401, detail="Incorrect credentials")
         
-    log_login_attempt(mobile=user_credentials.mobile, user_id=user["id"], success=True, ip_address=ip, user_agent=user_agent)
+    await run_db(log_login_attempt, mobile=user_credentials.mobile, user_id=user["id"], success=True, ip_address=ip, user_agent=user_agent)
     
     token_version = user.get("token_version", 1)
     
@@ -99,22 +100,55 @@ async def register_doctor(user: UserCreate):
     user_data["is_active"] = True
     user_data["token_version"] = 1
     
-    doc = DoctorService.register_doctor(doctor_data, user_data)
+    doc = await run_db(DoctorService.register_doctor, doctor_data, user_data)
     return doc
 
+def _doctor_page(response: Response, page):
+    rows, next_cursor = page
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
 @router.get("/doctors")
-async def get_all_doctors(current_user: dict = Depends(get_current_user)):
+async def get_all_doctors(
+    response: Response,
+    hospital_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=DoctorService.SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
     """Doctors list endpoint"""
-    return DoctorService.get_public_doctors()
+    return _doctor_page(response, await run_db(
+        DoctorService.get_public_doctors, None, hospital_id, limit, cursor, fields
+    ))
 
 @router.get("/doctors/public")
-async def get_all_doctors_public(q: Optional[str] = None):
-    return DoctorService.get_public_doctors(q)
+async def get_all_doctors_public(
+    response: Response,
+    q: Optional[str] = None,
+    hospital_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=DoctorService.SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    return _doctor_page(response, await run_db(
+        DoctorService.get_public_doctors, q, hospital_id, limit, cursor, fields
+    ))
 
 @router.get("/doctors/search")
-async def search_doctors(q: Optional[str] = None):
-    return DoctorService.get_public_doctors(q)
+async def search_doctors(
+    response: Response,
+    q: Optional[str] = None,
+    hospital_id: Optional[int] = None,
+    limit: int = Query(DoctorService.SEARCH_DEFAULT_LIMIT, ge=1, le=DoctorService.SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    return _doctor_page(response, await run_db(
+        DoctorService.get_public_doctors, q, hospital_id, limit, cursor, fields
+    ))
 
 @router.get("/cities/search")
-async def search_cities(q: Optional[str] = None):
-    return DoctorService.get_cities()
+async def search_cities(q: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    return await run_db(DoctorService.get_cities, q, limit)
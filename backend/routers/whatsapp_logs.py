@@ -3,30 +3,32 @@ WhatsApp Message Logs API
 Provides endpoints to view message logs and statistics
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from core.config import settings
 from core.database import get_supabase
 # Note: Hospital SQLAlchemy model removed - using Supabase now
-from services.message_logger import get_message_logs
+from services.message_logger import get_message_logs, get_message_stats, get_message_stats_series
+from services.message_log_query import parse_cursor, query_logs, stream_logs_json
+from services.message_log_stats import combine, summarize
+from services.whatsapp_queue import get_queue_stats
+from dependencies.auth import get_current_admin
 from typing import Optional, List
-from datetime import date
+from datetime import datetime, time, timedelta, timezone
 
 router = APIRouter(prefix="/api/whatsapp-logs", tags=["whatsapp-logs"])
 
 
-@router.get("/{hospital_id}")
-def get_hospital_message_logs(
-    hospital_id: int,
-    log_date: Optional[str] = Query(None, description="Date in YYYY-MM-DD format"),
-    status_filter: Optional[str] = Query(None, description="Filter by status: 'success' or 'failed'")
-):
+@router.get("/queues")
+def get_send_queue_stats(current_admin: dict = Depends(get_current_admin)):
     """
-    Get WhatsApp message logs for a hospital.
-    
-    Features:
-    - View all sent messages
-    - Filter by date
-    - Filter by status (success/failed)
-    - View retry attempts
+    Per-hospital send queue depth, wait time and send time on this worker,
+    where time goes inside each send, and the live browser sessions.
     """
+    from services.whatsapp_service import get_send_timing_stats, get_session_stats
+    return {"queues": get_queue_stats(), "send_steps": get_send_timing_stats(), "sessions": get_session_stats()}
+
+
+def _get_hospital(hospital_id: int, columns: str = "id") -> dict:
     supabase = get_supabase()
     if not supabase:
         raise HTTPException(
@@ -35,59 +37,166 @@ def get_hospital_message_logs(
         )
     
     # Verify hospital exists
-    hospital_result = supabase.table("hospitals").select("id, name").eq("id", hospital_id).execute()
+    hospital_result = supabase.table("hospitals").select(columns).eq("id", hospital_id).execute()
     if not hospital_result.data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Hospital not found"
         )
-    hospital = hospital_result.data[0]
-    
-    # Get logs
-    logs = get_message_logs(hospital_id, date=log_date, status=status_filter)
+    return hospital_result.data[0]
+
+
+def _parse_bound(value: str, end: bool = False) -> datetime:
+    """ISO date or datetime (UTC); a bare end date covers that whole day."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid date: {value}")
+    if end and len(value) == 10:
+        parsed = datetime.combine(parsed.date(), time.max)
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _check_cursor(cursor: Optional[str]):
+    try:
+        parse_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+@router.get("/{hospital_id}/range")
+def get_message_log_range(
+    hospital_id: int,
+    start: str = Query(..., alias="from", description="Start date or datetime (UTC), e.g. 2030-01-01"),
+    end: Optional[str] = Query(None, alias="to", description="End date or datetime (UTC), inclusive; defaults to now"),
+    status_filter: Optional[str] = Query(None, description="Filter by status: 'success' or 'failed'"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MESSAGE_LOG_PAGE_MAX, description="Page size; omit to stream the whole range"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    current_admin: dict = Depends(get_current_admin)
+):
+    """
+    WhatsApp message logs for a hospital across a date range.
+
+    The response is streamed as JSON, so long ranges are never held in
+    memory. With `limit`, pass the returned `next_cursor` back to get the
+    next page; it is null on the last page.
+    """
+    start_at = _parse_bound(start)
+    end_at = _parse_bound(end, end=True) if end else datetime.utcnow()
+    if end_at < start_at:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'to' must not be before 'from'")
+    if (end_at.date() - start_at.date()).days >= settings.MESSAGE_LOG_QUERY_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range is limited to {settings.MESSAGE_LOG_QUERY_MAX_DAYS} days"
+        )
+    _check_cursor(cursor)
+    _get_hospital(hospital_id)
+
+    return StreamingResponse(
+        stream_logs_json(hospital_id, start_at, end_at, status=status_filter, limit=limit, cursor=cursor),
+        media_type="application/json"
+    )
+
+
+@router.get("/{hospital_id}/stats")
+def get_message_log_stats(
+    hospital_id: int,
+    start: Optional[str] = Query(None, alias="from", description="First day, YYYY-MM-DD; defaults to 6 days before 'to'"),
+    end: Optional[str] = Query(None, alias="to", description="Last day, YYYY-MM-DD (inclusive); defaults to today (UTC)"),
+    current_admin: dict = Depends(get_current_admin)
+):
+    """
+    Daily WhatsApp delivery statistics for a hospital over a date range:
+    totals for the range plus one point per day, read from the running
+    counters (no log scanning).
+    """
+    try:
+        end_day = datetime.strptime(end, "%Y-%m-%d").date() if end else datetime.utcnow().date()
+        start_day = datetime.strptime(start, "%Y-%m-%d").date() if start else end_day - timedelta(days=6)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Dates must be YYYY-MM-DD")
+    if end_day < start_day:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'to' must not be before 'from'")
+    if (end_day - start_day).days >= settings.MESSAGE_LOG_QUERY_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range is limited to {settings.MESSAGE_LOG_QUERY_MAX_DAYS} days"
+        )
+    _get_hospital(hospital_id)
     
-    # Calculate statistics
-    total = len(logs)
-    successful = len([l for l in logs if l.get("status") == "success" or l.get("status") == "sent"])
-    failed = len([l for l in logs if l.get("status") == "failed"])
+    series = get_message_stats_series(hospital_id, start_day.isoformat(), end_day.isoformat())
     
     return {
+        "hospital_id": hospital_id,
+        "from": start_day.isoformat(),
+        "to": end_day.isoformat(),
+        "statistics": summarize(combine(series)),
+        "series": [{"date": day["date"], **summarize(day)} for day in series]
+    }
+
+
+@router.get("/{hospital_id}")
+def get_hospital_message_logs(
+    hospital_id: int,
+    log_date: Optional[str] = Query(None, description="Date in YYYY-MM-DD format"),
+    status_filter: Optional[str] = Query(None, description="Filter by status: 'success' or 'failed'"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MESSAGE_LOG_PAGE_MAX, description="Page size; omit for the whole day"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    current_admin: dict = Depends(get_current_admin)
+):
+    """
+    Get WhatsApp message logs for a hospital.
+    
+    Features:
+    - View all sent messages
+    - Filter by date
+    - Filter by status (success/failed)
+    - View retry attempts
+    - Page through a busy day with limit/cursor
+
+    `statistics` always covers the whole day (the retry histogram is not
+    kept per status); with a status filter, `matching_total` is the number
+    of that day's entries with that status.
+    """
+    hospital = _get_hospital(hospital_id, "id, name")
+    day = _parse_bound(log_date) if log_date else datetime.combine(datetime.utcnow().date(), time.min)
+    day_end = datetime.combine(day.date(), time.max)
+    _check_cursor(cursor)
+    
+    # Statistics come from the running counters, without reading the log
+    counters = get_message_stats(hospital_id, day.date().isoformat())
+    
+    # Get logs
+    logs, next_cursor = query_logs(hospital_id, day, day_end, status=status_filter, limit=limit, cursor=cursor)
+    
+    response = {
         "hospital_id": hospital_id,
         "hospital_name": hospital.get("name", ""),
-        "date": log_date or date.today().isoformat(),
-        "statistics": {
-            "total": total,
-            "successful": successful,
-            "failed": failed,
-            "success_rate": round((successful / total * 100) if total > 0 else 0, 2)
-        },
-        "logs": logs
+        "date": day.date().isoformat(),
+        "statistics": summarize(counters),
+        "logs": logs,
+        "next_cursor": next_cursor
     }
+    if status_filter:
+        response["status_filter"] = status_filter
+        response["matching_total"] = counters["by_status"].get(status_filter, 0)
+    return response
 
 
 @router.get("/{hospital_id}/failed")
 def get_failed_messages(
     hospital_id: int,
-    log_date: Optional[str] = Query(None, description="Date in YYYY-MM-DD format")
+    log_date: Optional[str] = Query(None, description="Date in YYYY-MM-DD format"),
+    current_admin: dict = Depends(get_current_admin)
 ):
     """
     Get failed WhatsApp messages for a hospital.
     Useful for retry mechanism.
     """
-    supabase = get_supabase()
-    if not supabase:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database not configured"
-        )
-    
-    # Verify hospital exists
-    hospital_result = supabase.table("hospitals").select("id").eq("id", hospital_id).execute()
-    if not hospital_result.data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Hospital not found"
-        )
+    _get_hospital(hospital_id)
     
     failed_logs = get_message_logs(hospital_id, date=log_date, status="failed")
     
@@ -96,6 +205,3 @@ def get_failed_messages(
         "failed_count": len(failed_logs),
         "failed_messages": failed_logs
     }
-
-
-
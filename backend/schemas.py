@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr, field_validator, model_validator, validator
 from datetime import date, datetime
 from typing import Optional, Union
+from core.schedule import normalize_time_slot
 from models import UserRole, AppointmentStatus, OperationStatus, Specialty, HospitalStatus
 
 # User Schemas
@@ -83,16 +84,11 @@ class AppointmentBase(BaseModel):
     
     @validator('time_slot')
     def validate_time_slot(cls, v):
-        # Morning slots: 9:30 AM to 3:30 PM
-        # Evening slots: 6:00 PM to 8:30 PM
-        valid_slots = [
-            "09:30", "10:00", "10:30", "11:00", "11:30", "12:00",
-            "12:30", "13:00", "13:30", "14:00", "14:30", "15:00", "15:30",
-            "18:00", "18:30", "19:00", "19:30", "20:00", "20:30"
-        ]
-        if v not in valid_slots:
-            raise ValueError(f'Invalid time slot. Must be one of: {", ".join(valid_slots)}')
-        return v
+        # Membership in the doctor's slot grid is checked at booking time
+        try:
+            return normalize_time_slot(v)
+        except (ValueError, AttributeError):
+            raise ValueError('Invalid time slot. Expected HH:MM')
 
 class AppointmentCreate(AppointmentBase):
     reason: Optional[str] = None  # Allow reason/notes for appointments
@@ -142,20 +138,12 @@ class GuestAppointmentCreate(BaseModel):
     @classmethod
     def validate_time_slot(cls, v):
         """Validate and normalize time slot format"""
-        # Normalize time slot (remove seconds if present, ensure HH:MM format)
-        if isinstance(v, str):
-            # Remove seconds if present (e.g., "10:00:00" -> "10:00")
-            if len(v) > 5:
-                v = v[:5]
-        
-        valid_slots = [
-            "09:30", "10:00", "10:30", "11:00", "11:30", "12:00",
-            "12:30", "13:00", "13:30", "14:00", "14:30", "15:00", "15:30",
-            "18:00", "18:30", "19:00", "19:30", "20:00", "20:30"
-        ]
-        if v not in valid_slots:
-            raise ValueError(f'Invalid time slot: {v}. Must be one of: {", ".join(valid_slots)}')
-        return v
+        # Normalize time slot (remove seconds if present, ensure HH:MM format);
+        # membership in the doctor's slot grid is checked at booking time
+        try:
+            return normalize_time_slot(v)
+        except (ValueError, AttributeError):
+            raise ValueError(f'Invalid time slot: {v}. Expected HH:MM')
 
 class AppointmentResponse(AppointmentBase):
     id: int
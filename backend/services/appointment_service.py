@@ -1,39 +1,99 @@
 import secrets
-from datetime import date as date_obj, datetime
+import logging
+from datetime import date as date_obj, datetime, timedelta
 from typing import Dict, Any, List, Optional
 from fastapi import HTTPException
+from postgrest.exceptions import APIError
 from core.database import get_supabase
 from core.security import get_password_hash
+from core.schedule import DEFAULT_GRID, SlotGrid
+from services import entity_cache, reminder_schedule, slot_index
+from services.schedule_service import ScheduleService
+
+logger = logging.getLogger(__name__)
 
 class AppointmentService:
+    # RPC error message -> (HTTP status, detail); see database/booking_rpc.sql
+    BOOKING_ERRORS = {
+        "DOCTOR_NOT_FOUND": (404, "Doctor not found"),
+        "DOCTOR_WITHOUT_HOSPITAL": (400, "Doctor is not associated with any hospital"),
+        "HOSPITAL_MISMATCH": (400, "Doctor does not belong to your selected hospital"),
+        "HOSPITAL_NOT_APPROVED": (400, "Hospital not found or not approved"),
+        "SLOT_TAKEN": (400, "Time slot already booked"),
+    }
+
+    _booking_rpc_available = True
+
+    # Longest window accepted by get_availability_range
+    AVAILABILITY_MAX_DAYS = 30
+
     @staticmethod
     def _get_db():
         return get_supabase()
 
     @staticmethod
-    def is_valid_time_slot(time_slot: str) -> bool:
-        valid_slots = [
-            "09:30", "10:00", "10:30", "11:00", "11:30", "12:00",
-            "12:30", "13:00", "13:30", "14:00", "14:30", "15:00", "15:30",
-            "18:00", "18:30", "19:00", "19:30", "20:00", "20:30"
-        ]
-        return time_slot in valid_slots
+    def is_valid_time_slot(time_slot: str, grid: SlotGrid = DEFAULT_GRID) -> bool:
+        return grid.is_valid_slot(time_slot)
 
     @classmethod
     def process_booking(cls, appointment_data: Dict[str, Any], current_user: Dict[str, Any], is_guest: bool = False) -> Dict[str, Any]:
-        supabase = cls._get_db()
+        if appointment_data["date"] < date_obj.today():
+            raise HTTPException(status_code=400, detail="Cannot book appointment for past dates")
 
-        if not cls.is_valid_time_slot(appointment_data["time_slot"]):
+        grid = ScheduleService.get_grid(appointment_data["doctor_id"])
+        if not cls.is_valid_time_slot(appointment_data["time_slot"], grid):
             raise HTTPException(status_code=400, detail="Invalid time slot")
+        if not grid.is_open(appointment_data["date"]):
+            raise HTTPException(status_code=400, detail="Doctor is not available on this date")
 
-        if appointment_data["date"] < date_obj.today():
-            raise HTTPException(status_code=400, detail="Cannot book appointment for past dates")
+        result = None
+        if cls._booking_rpc_available:
+            try:
+                result = cls._book_via_rpc(appointment_data, current_user, is_guest)
+            except APIError as e:
+                if e.code != "PGRST202":
+                    raise
+                # book_appointment() not deployed yet; use the multi-query path
+                logger.warning("book_appointment RPC not found, falling back to client-side booking")
+                cls._booking_rpc_available = False
+        if result is None:
+            result = cls._book_via_queries(appointment_data, current_user, is_guest)
+
+        apt = result["appointment"]
+        slot_index.mark_booked(apt["doctor_id"], str(apt["date"]), apt["time_slot"], grid)
+        return result
+
+    @classmethod
+    def _book_via_rpc(cls, appointment_data: Dict[str, Any], current_user: Dict[str, Any], is_guest: bool) -> Dict[str, Any]:
+        """Validate and reserve the slot in one database transaction."""
+        supabase = cls._get_db()
+        params = {
+            "p_doctor_id": appointment_data["doctor_id"],
+            "p_date": str(appointment_data["date"]),
+            "p_time_slot": appointment_data["time_slot"],
+            "p_user_id": None if is_guest else current_user.get("id"),
+            "p_user_hospital_id": None if is_guest else current_user.get("hospital_id"),
+            "p_reason": appointment_data.get("reason") or "",
+            "p_guest_name": appointment_data.get("patient_name", "").strip() if is_guest else None,
+            "p_guest_mobile": appointment_data.get("patient_phone", "").strip() if is_guest else None,
+        }
+        try:
+            result = supabase.rpc("book_appointment", params).execute()
+        except APIError as e:
+            if e.message in cls.BOOKING_ERRORS:
+                status_code, detail = cls.BOOKING_ERRORS[e.message]
+                raise HTTPException(status_code=status_code, detail=detail)
+            raise
+        return result.data
+
+    @classmethod
+    def _book_via_queries(cls, appointment_data: Dict[str, Any], current_user: Dict[str, Any], is_guest: bool) -> Dict[str, Any]:
+        supabase = cls._get_db()
 
         # Verify doctor
-        doctor_result = supabase.table("doctors").select("*").eq("id", appointment_data["doctor_id"]).eq("is_active", True).execute()
-        if not doctor_result.data:
+        doctor = entity_cache.get_doctor(appointment_data["doctor_id"])
+        if not doctor or not doctor.get("is_active"):
             raise HTTPException(status_code=404, detail="Doctor not found")
-        doctor = doctor_result.data[0]
         
         hospital_id = doctor.get("hospital_id")
         if not hospital_id:
@@ -44,12 +104,10 @@ class AppointmentService:
             raise HTTPException(status_code=400, detail="Doctor does not belong to your selected hospital")
 
         # Verify hospital
-        hospital_result = supabase.table("hospitals").select("*").eq("id", hospital_id).execute()
-        if not hospital_result.data or hospital_result.data[0].get("status") not in ("approved", "ACTIVE"):
+        hospital = entity_cache.get_hospital(hospital_id)
+        if not hospital or hospital.get("status") not in ("approved", "ACTIVE"):
             raise HTTPException(status_code=400, detail="Hospital not found or not approved")
 
-        hospital = hospital_result.data[0]
-
         # Check existing booking
         existing_result = supabase.table("appointments").select("*").eq(
             "doctor_id", appointment_data["doctor_id"]
@@ -89,7 +147,13 @@ class AppointmentService:
             "reason": appointment_data.get("reason", "")
         }
 
-        result = supabase.table("appointments").insert(appointment_record).execute()
+        try:
+            result = supabase.table("appointments").insert(appointment_record).execute()
+        except APIError as e:
+            # Lost the race against a concurrent booking (idx_appointments_doctor_slot_active)
+            if e.code == "23505":
+                raise HTTPException(status_code=400, detail="Time slot already booked")
+            raise
         db_appointment = result.data[0]
 
         return {
@@ -137,33 +201,92 @@ class AppointmentService:
             raise HTTPException(status_code=400, detail="Invalid action")
 
         res = supabase.table("appointments").update(update_data).eq("id", appointment_id).execute()
+        if res.data:
+            grid = ScheduleService.get_grid(apt["doctor_id"])
+            if update_data["status"] == "cancelled":
+                slot_index.mark_free(apt["doctor_id"], str(apt["date"]), apt["time_slot"], grid)
+            else:
+                slot_index.mark_booked(apt["doctor_id"], str(apt["date"]), apt["time_slot"], grid)
+            try:
+                if update_data["status"] == "confirmed":
+                    reminder_schedule.schedule_for_appointment(res.data[0])
+                else:
+                    reminder_schedule.cancel_for_appointment(appointment_id)
+            except Exception as e:
+                logger.error(f"Failed to update reminder for appointment {appointment_id}: {e}")
         return res.data[0] if res.data else {}
 
     @classmethod
     def get_available_slots(cls, doctor_id: int, date_str: str) -> Dict[str, Any]:
         supabase = cls._get_db()
         
-        doc_res = supabase.table("doctors").select("*").eq("id", doctor_id).eq("is_active", True).execute()
-        if not doc_res.data:
+        doctor = entity_cache.get_doctor(doctor_id)
+        if not doctor or not doctor.get("is_active"):
             raise HTTPException(status_code=404, detail="Doctor not found")
             
-        all_slots = [
-            "09:30", "10:00", "10:30", "11:00", "11:30", "12:00",
-            "12:30", "13:00", "13:30", "14:00", "14:30", "15:00", "15:30",
-            "18:00", "18:30", "19:00", "19:30", "20:00", "20:30"
-        ]
-        
-        booked_result = supabase.table("appointments").select("time_slot").eq(
-            "doctor_id", doctor_id
-        ).eq("date", date_str).neq("status", "cancelled").execute()
-        
-        booked_slots = [a["time_slot"] for a in (booked_result.data or [])]
-        available_slots = [s for s in all_slots if s not in booked_slots]
-        
+        try:
+            day = date_obj.fromisoformat(date_str)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+        date_str = day.isoformat()
+
+        grid = ScheduleService.get_grid(doctor_id)
+        mask = slot_index.get_mask(doctor_id, date_str, grid)
+        if mask is None:
+            booked_result = supabase.table("appointments").select("time_slot").eq(
+                "doctor_id", doctor_id
+            ).eq("date", date_str).neq("status", "cancelled").execute()
+            mask = slot_index.load(doctor_id, date_str, (a["time_slot"] for a in (booked_result.data or [])), grid)
+
         return {
             "doctor_id": doctor_id,
-            "doctor_name": doc_res.data[0]["name"],
+            "doctor_name": doctor["name"],
             "date": date_str,
-            "available_slots": available_slots,
-            "booked_slots": booked_slots
+            "available_slots": slot_index.free_slots(mask, grid) if grid.is_open(day) else [],
+            "booked_slots": slot_index.decode(mask, grid)
+        }
+
+    @classmethod
+    def get_availability_range(cls, doctor_id: int, start: date_obj, end: date_obj) -> Dict[str, Any]:
+        """Booked-slot bitmasks for every day in [start, end] from a single appointments query."""
+        if end < start:
+            raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+        num_days = (end - start).days + 1
+        if num_days > cls.AVAILABILITY_MAX_DAYS:
+            raise HTTPException(status_code=400, detail=f"Date range cannot exceed {cls.AVAILABILITY_MAX_DAYS} days")
+
+        doctor = entity_cache.get_doctor(doctor_id)
+        if not doctor or not doctor.get("is_active"):
+            raise HTTPException(status_code=404, detail="Doctor not found")
+
+        supabase = cls._get_db()
+
+        booked_result = supabase.table("appointments").select("date, time_slot").eq(
+            "doctor_id", doctor_id
+        ).gte("date", start.isoformat()).lte("date", end.isoformat()).neq("status", "cancelled").execute()
+
+        booked_by_day: Dict[str, List[str]] = {}
+        for a in booked_result.data or []:
+            booked_by_day.setdefault(str(a["date"]), []).append(a["time_slot"])
+
+        grid = ScheduleService.get_grid(doctor_id)
+        days = {}
+        closed = []
+        for offset in range(num_days):
+            day = start + timedelta(days=offset)
+            day_str = day.isoformat()
+            # Warm the per-day index so later available-slots calls skip the database
+            days[day_str] = slot_index.load(doctor_id, day_str, booked_by_day.get(day_str, []), grid)
+            if not grid.is_open(day):
+                closed.append(day_str)
+
+        return {
+            "doctor_id": doctor_id,
+            "doctor_name": doctor["name"],
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "slots": list(grid.slots),
+            "full_mask": grid.full_mask,
+            "booked": days,
+            "closed": closed
         }
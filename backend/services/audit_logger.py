@@ -3,9 +3,42 @@ Audit Logging Service for Legal Compliance
 Logs all critical actions for legal safety and compliance
 """
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable
 from core.database import get_supabase
 
+# Rows per request for bulk audit inserts
+AUDIT_BULK_INSERT_SIZE = 500
+
+
+def build_audit_row(
+    event_type: str,
+    user_id: Optional[int] = None,
+    user_role: Optional[str] = None,
+    action: str = "",
+    resource_type: Optional[str] = None,
+    resource_id: Optional[int] = None,
+    details: Optional[Dict[str, Any]] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    status: str = "success",
+    error_message: Optional[str] = None
+) -> Dict[str, Any]:
+    """Build an audit_logs row (see log_audit_event for event types)"""
+    return {
+        "event_type": event_type,
+        "user_id": user_id,
+        "user_role": user_role,
+        "action": action,
+        "resource_type": resource_type,
+        "resource_id": resource_id,
+        "details": details,  # Supabase handles JSONB as dict directly
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "status": status,
+        "error_message": error_message,
+        "created_at": datetime.utcnow().isoformat()
+    }
+
 
 def log_audit_event(
     event_type: str,
@@ -51,20 +84,10 @@ def log_audit_event(
             print(f"[AUDIT] {event_type}: {action} by user {user_id} - {status}")
             return
         
-        audit_data = {
-            "event_type": event_type,
-            "user_id": user_id,
-            "user_role": user_role,
-            "action": action,
-            "resource_type": resource_type,
-            "resource_id": resource_id,
-            "details": details,  # Supabase handles JSONB as dict directly
-            "ip_address": ip_address,
-            "user_agent": user_agent,
-            "status": status,
-            "error_message": error_message,
-            "created_at": datetime.utcnow().isoformat()
-        }
+        audit_data = build_audit_row(
+            event_type, user_id, user_role, action, resource_type, resource_id,
+            details, ip_address, user_agent, status, error_message
+        )
         
         # Insert into audit_logs table
         result = supabase.table("audit_logs").insert(audit_data).execute()
@@ -78,6 +101,30 @@ def log_audit_event(
         return None
 
 
+def log_audit_events_bulk(rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Insert many audit rows (from build_audit_row / message_send_audit_row)
+    in batches of AUDIT_BULK_INSERT_SIZE. Returns the number of rows written.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    supabase = get_supabase()
+    if not supabase:
+        print(f"[AUDIT] {len(rows)} events not stored (database unavailable)")
+        return 0
+    written = 0
+    for start in range(0, len(rows), AUDIT_BULK_INSERT_SIZE):
+        batch = rows[start:start + AUDIT_BULK_INSERT_SIZE]
+        try:
+            supabase.table("audit_logs").insert(batch).execute()
+            written += len(batch)
+        except Exception as e:
+            # Never fail the main operation due to audit logging issues
+            print(f"[AUDIT ERROR] Failed to log {len(batch)} events: {str(e)}")
+    return written
+
+
 def log_login_attempt(
     mobile: str,
     user_id: Optional[int] = None,
@@ -188,20 +235,40 @@ def log_message_send(
     details: Optional[Dict[str, Any]] = None
 ):
     """Log message sending (WhatsApp/Email)"""
+    return log_audit_event(**_message_send_fields(
+        user_id, message_type, recipient, subject_or_purpose, success, error_message, details
+    ))
+
+
+def message_send_audit_row(
+    user_id: Optional[int],
+    message_type: str,
+    recipient: str,
+    subject_or_purpose: Optional[str] = None,
+    success: bool = True,
+    error_message: Optional[str] = None,
+    details: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Same event as log_message_send, returned as a row for log_audit_events_bulk"""
+    return build_audit_row(**_message_send_fields(
+        user_id, message_type, recipient, subject_or_purpose, success, error_message, details
+    ))
+
+
+def _message_send_fields(user_id, message_type, recipient, subject_or_purpose, success, error_message, details) -> Dict[str, Any]:
     message_details = details or {}
     message_details["recipient"] = recipient
     message_details["message_type"] = message_type
     if subject_or_purpose:
         message_details["subject"] = subject_or_purpose
-    
-    return log_audit_event(
-        event_type="message_send",
-        user_id=user_id,
-        action=f"Send {message_type} to {recipient}",
-        details=message_details,
-        status="success" if success else "failed",
-        error_message=error_message
-    )
+    return {
+        "event_type": "message_send",
+        "user_id": user_id,
+        "action": f"Send {message_type} to {recipient}",
+        "details": message_details,
+        "status": "success" if success else "failed",
+        "error_message": error_message,
+    }
 
 
 def log_payment_event(
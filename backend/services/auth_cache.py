@@ -0,0 +1,53 @@
+"""
+Authenticated-principal cache
+Keeps recently resolved users keyed by (user_id, token_version) so that
+get_current_user does not re-read the users table on every request.
+"""
+import logging
+from typing import Any, Dict, Optional
+from jose import jwt, JWTError
+from core.cache import TTLCache
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+principal_cache = TTLCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS
+)
+
+
+def _key(user_id: Any, token_version: Any) -> tuple:
+    return (int(user_id), int(token_version) if token_version is not None else None)
+
+
+def get_cached_principal(user_id: Any, token_version: Any) -> Optional[Dict[str, Any]]:
+    """Return a copy of the cached user row, or None on a miss."""
+    user = principal_cache.get(_key(user_id, token_version))
+    return dict(user) if user is not None else None
+
+
+def cache_principal(user_id: Any, token_version: Any, user: Dict[str, Any]):
+    principal_cache.set(_key(user_id, token_version), dict(user))
+
+
+def invalidate_user(user_id: Any) -> int:
+    """Drop every cached principal for a user, whatever token_version it was cached under."""
+    uid = int(user_id)
+    removed = principal_cache.invalidate_where(lambda k: k[0] == uid)
+    if removed:
+        logger.debug(f"Invalidated {removed} cached principal(s) for user {uid}")
+    return removed
+
+
+def invalidate_token(token: str) -> int:
+    """Drop cached principals for the user a (possibly expired) token belongs to."""
+    try:
+        sub = jwt.get_unverified_claims(token).get("sub")
+    except JWTError:
+        return 0
+    return invalidate_user(sub) if sub is not None else 0
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    return principal_cache.stats()
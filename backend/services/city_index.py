@@ -0,0 +1,180 @@
+"""
+In-memory city search indexes
+Load a small, nearly static list of cities once and answer searches
+without touching the database:
+
+- a prefix trie over normalised city names, each node holding the ids of
+  the cities below it ordered by name length, for "starts with" matches;
+- a trigram index for "contains" matches anywhere in the name.
+
+Results are ranked like the old SQL path: prefix matches first, then by
+position of the match, then by name length.
+
+city_index covers the cities table; hospital_city_index is the distinct
+city/state list of registered hospitals (DoctorService.get_cities).
+"""
+import asyncio
+import bisect
+import logging
+import threading
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from core.config import settings
+from core.database import get_supabase, run_db
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = 1000
+
+
+def _normalise(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # (len(name), name, id) kept sorted so the shortest names come first
+        self.ids: List[Tuple[int, str, int]] = []
+
+
+def _load_cities(table: str, city_column: str, state_column: str, **eq: Any) -> List[Dict[str, Any]]:
+    """Page through `table` for (city, state) rows with a city, as city_name/state_name."""
+    supabase = get_supabase()
+    rows: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        query = supabase.table(table).select(f"{city_column}, {state_column}").not_.is_(city_column, "null")
+        for column, value in eq.items():
+            query = query.eq(column, value)
+        page = query.order("id").range(offset, offset + _PAGE_SIZE - 1).execute().data or []
+        rows.extend({"city_name": r.get(city_column), "state_name": r.get(state_column)} for r in page)
+        if len(page) < _PAGE_SIZE:
+            return rows
+        offset += _PAGE_SIZE
+
+
+class CityIndex:
+    def __init__(self, name: str, loader: Callable[[], List[Dict[str, Any]]]):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.RLock()
+        self._reset()
+        self.loaded = False
+
+    def _reset(self):
+        self._cities: List[Dict[str, Any]] = []
+        self._names: List[str] = []
+        self._keys: Dict[Tuple[str, str], int] = {}
+        self._root = _TrieNode()
+        self._trigrams: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._cities)
+
+    def _insert(self, city_name: str, state_name: Optional[str]) -> bool:
+        name = _normalise(city_name or "")
+        if not name:
+            return False
+        key = (name, _normalise(state_name or ""))
+        if key in self._keys:
+            return False
+
+        city_id = len(self._cities)
+        self._keys[key] = city_id
+        self._cities.append({"city_name": city_name.strip(), "state_name": (state_name or "").strip()})
+        self._names.append(name)
+
+        entry = (len(name), name, city_id)
+        node = self._root
+        for ch in name:
+            node = node.children.setdefault(ch, _TrieNode())
+            bisect.insort(node.ids, entry)
+        for gram in _trigrams(name):
+            self._trigrams.setdefault(gram, set()).add(city_id)
+        return True
+
+    def add(self, city_name: str, state_name: Optional[str] = None) -> bool:
+        """Add one city (e.g. after CityService.add_new_city). Returns False for duplicates."""
+        with self._lock:
+            return self._insert(city_name, state_name)
+
+    def rebuild(self, rows: Iterable[Dict[str, Any]]) -> int:
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._insert(row.get("city_name", ""), row.get("state_name"))
+            self.loaded = True
+            return len(self._cities)
+
+    def load_from_db(self) -> int:
+        """(Re)build the index from the database."""
+        if not get_supabase():
+            return 0
+        count = self.rebuild(self._loader())
+        logger.info(f"✅ {self.name} loaded ({count} cities)")
+        return count
+
+    def all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(city) for city in self._cities]
+
+    def search(self, query: str, limit: int = 20, prefix_only: bool = False) -> List[Dict[str, Any]]:
+        q = _normalise(query)
+        if not q:
+            return []
+        with self._lock:
+            results: List[int] = []
+            seen: Set[int] = set()
+
+            # 1. Prefix matches, shortest names first
+            node: Optional[_TrieNode] = self._root
+            for ch in q:
+                node = node.children.get(ch)
+                if node is None:
+                    break
+            if node is not None:
+                for _, _, city_id in node.ids[:limit]:
+                    results.append(city_id)
+                    seen.add(city_id)
+
+            # 2. Substring matches elsewhere in the name
+            if len(results) < limit and not prefix_only:
+                grams = _trigrams(q)
+                if grams:
+                    sets = sorted((self._trigrams.get(g, set()) for g in grams), key=len)
+                    candidates = set.intersection(*sets) if sets[0] else set()
+                else:
+                    # Two-character queries have no trigram; the table is small enough to scan
+                    candidates = range(len(self._names))
+                matches = [
+                    (self._names[i].index(q), len(self._names[i]), self._names[i], i)
+                    for i in candidates
+                    if i not in seen and q in self._names[i]
+                ]
+                matches.sort()
+                results.extend(i for *_, i in matches[:limit - len(results)])
+
+            return [dict(self._cities[i]) for i in results]
+
+
+city_index = CityIndex("City index", partial(_load_cities, "cities", "city_name", "state_name", is_active=True))
+hospital_city_index = CityIndex("Hospital city index", partial(_load_cities, "hospitals", "city", "state"))
+
+
+async def run_city_index_refresh(interval_seconds: Optional[int] = None):
+    """Background loop: periodically reload the indexes from the database."""
+    interval = interval_seconds or settings.CITY_INDEX_REFRESH_SECONDS
+    while True:
+        await asyncio.sleep(interval)
+        for index in (city_index, hospital_city_index):
+            try:
+                await run_db(index.load_from_db)
+            except Exception as e:
+                logger.error(f"❌ {index.name} refresh failed: {e}")
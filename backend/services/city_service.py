@@ -1,5 +1,6 @@
 from typing import List, Dict, Any
 from core.database import get_supabase
+from services.city_index import city_index
 
 class CityService:
     @staticmethod
@@ -8,6 +9,9 @@ class CityService:
 
     @classmethod
     def query_city_database(cls, query: str) -> List[Dict[str, Any]]:
+        if city_index.loaded:
+            return city_index.search(query, limit=20)
+
         supabase = cls._get_db()
         res = supabase.table("cities").select("city_name, state_name").ilike("city_name", f"%{query}%").eq("is_active", True).limit(20).execute()
         
@@ -52,4 +56,5 @@ class CityService:
             "is_active": True
         }
         res = supabase.table("cities").insert(new_city).execute()
+        city_index.add(city_name, new_city["state_name"])
         return {"message": "City added successfully", "city_name": city_name, "id": res.data[0]["id"]}
@@ -1,8 +1,26 @@
-from typing import Dict, Any, List, Optional
+import logging
+from typing import Dict, Any, List, Optional, Tuple
 from fastapi import HTTPException
+from postgrest.exceptions import APIError
 from core.database import get_supabase
+from services import entity_cache
+from services.city_index import hospital_city_index
+
+logger = logging.getLogger(__name__)
 
 class DoctorService:
+    # Columns exposed by the public doctor directory (no contact details or internals)
+    PUBLIC_FIELDS = (
+        "id", "name", "degree", "specialization", "institute_name",
+        "experience1", "experience2", "experience3", "experience4", "hospital_id"
+    )
+    # Search results additionally carry the hospital they belong to
+    SEARCH_FIELDS = PUBLIC_FIELDS + ("hospital_name", "city", "state", "rank")
+    SEARCH_DEFAULT_LIMIT = 20
+    SEARCH_MAX_LIMIT = 100
+
+    _search_rpc_available = True
+
     @staticmethod
     def _get_db():
         return get_supabase()
@@ -34,27 +52,160 @@ class DoctorService:
         if not doc_result.data:
             supabase.table("users").delete().eq("id", user_id).execute()
             raise HTTPException(status_code=500, detail="Failed to create doctor profile")
-            
+
+        entity_cache.invalidate_doctor(doc_result.data[0]["id"], user_id)
         return doc_result.data[0]
         
+    @staticmethod
+    def _project(fields: Optional[str], allowed: Tuple[str, ...]) -> List[str]:
+        """Parse a comma-separated ?fields= list; the id is always kept for cursors."""
+        if not fields:
+            return list(allowed)
+        requested = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in requested if f not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        if "id" not in requested:
+            requested.insert(0, "id")
+        return requested
+
+    @staticmethod
+    def _parse_cursor(cursor: Optional[str]) -> Tuple[Optional[float], Optional[int]]:
+        """Cursors are "<id>" for listings and "<rank>:<id>" for searches."""
+        if not cursor:
+            return None, None
+        try:
+            if ":" in cursor:
+                rank, last_id = cursor.split(":", 1)
+                return float(rank), int(last_id)
+            return None, int(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
     @classmethod
-    def get_public_doctors(cls, query: Optional[str] = None) -> List[Dict[str, Any]]:
-        supabase = cls._get_db()
-        db_query = supabase.table("doctors").select("*").eq("is_active", True)
+    def get_public_doctors(
+        cls,
+        query: Optional[str] = None,
+        hospital_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Active doctors, optionally filtered by a search term.
+        Returns (rows, next_cursor); next_cursor is None on the last page.
+        Without a limit, listings return every active doctor as before.
+        """
+        query = (query or "").strip()
         if query:
-            db_query = db_query.ilike("name", f"%{query}%")
-        result = db_query.execute()
-        return result.data if result.data else []
-        
+            return cls.search_doctors(query, hospital_id, limit or cls.SEARCH_DEFAULT_LIMIT, cursor, fields)
+
+        columns = cls._project(fields, cls.PUBLIC_FIELDS)
+        _, after_id = cls._parse_cursor(cursor)
+        supabase = cls._get_db()
+        db_query = supabase.table("doctors").select(", ".join(columns)).eq("is_active", True)
+        if hospital_id is not None:
+            db_query = db_query.eq("hospital_id", hospital_id)
+        if after_id is not None:
+            db_query = db_query.gt("id", after_id)
+        db_query = db_query.order("id")
+        if limit:
+            db_query = db_query.limit(min(limit, cls.SEARCH_MAX_LIMIT))
+        rows = db_query.execute().data or []
+
+        next_cursor = str(rows[-1]["id"]) if limit and len(rows) == min(limit, cls.SEARCH_MAX_LIMIT) else None
+        return rows, next_cursor
+
     @classmethod
-    def get_cities(cls) -> List[Dict[str, Any]]:
+    def search_doctors(
+        cls,
+        query: str,
+        hospital_id: Optional[int] = None,
+        limit: int = SEARCH_DEFAULT_LIMIT,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Ranked search over doctor name, specialization, hospital name and city
+        (pg_trgm, see database/doctor_search.sql). Keyset-paginated on (rank, id).
+        """
+        columns = cls._project(fields, cls.SEARCH_FIELDS)
+        limit = max(1, min(limit, cls.SEARCH_MAX_LIMIT))
+        after_rank, after_id = cls._parse_cursor(cursor)
+        if after_id is not None and after_rank is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        rows = None
+        if cls._search_rpc_available:
+            try:
+                rows = cls._search_via_rpc(query, hospital_id, limit, after_rank, after_id)
+            except APIError as e:
+                if e.code != "PGRST202":
+                    raise
+                logger.warning("search_doctors RPC not found, falling back to ILIKE search")
+                cls._search_rpc_available = False
+        if rows is None:
+            rows = cls._search_via_queries(query, hospital_id, limit, after_rank, after_id)
+
+        next_cursor = f"{rows[-1]['rank']}:{rows[-1]['id']}" if len(rows) == limit else None
+        return [{c: row.get(c) for c in columns} for row in rows], next_cursor
+
+    @classmethod
+    def _search_via_rpc(cls, query, hospital_id, limit, after_rank, after_id) -> List[Dict[str, Any]]:
         supabase = cls._get_db()
-        result = supabase.table("hospitals").select("city, state").not_.is_("city", "null").execute()
-        if not result.data: return []
-        
-        cities = {}
-        for h in result.data:
-            city_key = f"{h.get('city')}_{h.get('state')}"
-            if city_key not in cities:
-                cities[city_key] = {"name": h.get("city"), "state": h.get("state")}
-        return list(cities.values())
+        result = supabase.rpc("search_doctors", {
+            "p_query": query,
+            "p_hospital_id": hospital_id,
+            "p_limit": limit,
+            "p_after_rank": after_rank,
+            "p_after_id": after_id,
+        }).execute()
+        return [dict(row, rank=float(row["rank"])) for row in result.data or []]
+
+    @staticmethod
+    def _rank(term: str, row: Dict[str, Any]) -> float:
+        """Rough client-side equivalent of the SQL ranking, used when the RPC is missing."""
+        name = (row.get("name") or "").lower()
+        if name.startswith(term):
+            return 1.0
+        weighted = (
+            (name, 0.9),
+            ((row.get("specialization") or "").lower(), 0.7),
+            ((row.get("hospital_name") or "").lower(), 0.5),
+            ((row.get("city") or "").lower(), 0.5),
+        )
+        return max((weight for text, weight in weighted if term in text), default=0.0)
+
+    @classmethod
+    def _search_via_queries(cls, query, hospital_id, limit, after_rank, after_id) -> List[Dict[str, Any]]:
+        supabase = cls._get_db()
+        # Characters with a meaning in PostgREST or=() filters are dropped from the term
+        term = "".join(ch for ch in query.lower() if ch not in ",()*%").strip()
+        if not term:
+            return []
+        db_query = supabase.table("doctors").select(
+            ", ".join(cls.PUBLIC_FIELDS) + ", hospitals(name, city, state)"
+        ).eq("is_active", True).or_(f"name.ilike.*{term}*,specialization.ilike.*{term}*")
+        if hospital_id is not None:
+            db_query = db_query.eq("hospital_id", hospital_id)
+
+        rows = []
+        for row in db_query.execute().data or []:
+            hospital = row.pop("hospitals", None) or {}
+            row.update(hospital_name=hospital.get("name"), city=hospital.get("city"), state=hospital.get("state"))
+            row["rank"] = cls._rank(term, row)
+            rows.append(row)
+
+        rows.sort(key=lambda r: (-r["rank"], r["id"]))
+        if after_rank is not None:
+            rows = [r for r in rows if r["rank"] < after_rank or (r["rank"] == after_rank and r["id"] > after_id)]
+        return rows[:limit]
+
+    @classmethod
+    def get_cities(cls, query: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Distinct hospital cities, optionally filtered by name prefix (served from memory)."""
+        if not hospital_city_index.loaded:
+            hospital_city_index.load_from_db()
+        query = (query or "").strip()
+        cities = hospital_city_index.search(query, limit=limit, prefix_only=True) if query else hospital_city_index.all()
+        return [{"name": c["city_name"], "state": c["state_name"] or None} for c in cities]
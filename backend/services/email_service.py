@@ -7,6 +7,7 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Optional, Dict
 from core.database import get_supabase
+from services import entity_cache
 from core.config import settings
 import logging
 
@@ -25,20 +26,17 @@ def get_hospital_smtp_config(hospital_id: Optional[int] = None) -> Dict:
     
     if hospital_id and supabase:
         try:
-            result = supabase.table("hospitals").select(
-                "smtp_host, smtp_port, smtp_username, smtp_password, "
-                "smtp_from_email, smtp_enabled, smtp_use_ssl"
-            ).eq("id", hospital_id).execute()
+            hospital_config = entity_cache.get_hospital(hospital_id)
             
-            if result.data and result.data[0].get("smtp_enabled"):
-                hospital_config = result.data[0]
+            if hospital_config and hospital_config.get("smtp_enabled"):
                 # Only return config if all required fields are present
                 if hospital_config.get("smtp_host") and hospital_config.get("smtp_username"):
                     return {
                         "host": hospital_config.get("smtp_host"),
                         "port": hospital_config.get("smtp_port") or 587,
                         "username": hospital_config.get("smtp_username"),
-                        "password": hospital_config.get("smtp_password"),
+                        # Not in the cached row: read straight from the database
+                        "password": entity_cache.get_hospital_secrets(hospital_id, "smtp_password").get("smtp_password"),
                         "from_email": hospital_config.get("smtp_from_email") or hospital_config.get("smtp_username"),
                         "use_ssl": hospital_config.get("smtp_use_ssl", False),
                         "enabled": True
@@ -0,0 +1,152 @@
+"""
+Read-through cache for doctor and hospital rows.
+
+Booking, slot lookups, SMTP config and doctor auth all fetch the same few
+rows by id, often several times per request. Rows are cached in a short-lived
+process-local tier and, when Redis is reachable, a longer shared tier.
+
+Writers must call invalidate_doctor / invalidate_hospital after updating a
+row. That clears Redis and this worker's local tier; other workers may serve
+their local copy for up to ENTITY_CACHE_LOCAL_TTL_SECONDS.
+
+Only existing rows are cached. Callers still check is_active / status
+themselves, exactly as they did on the query result. Within a request,
+rows are also kept in the request identity map (core/request_context.py).
+Doctor rows are also changed outside the app (scripts, the dashboard), so
+authorization reads them with fresh=True: once per request from the
+database, refreshing both tiers on the way.
+
+Credential columns (SECRET_COLUMNS) are stripped before caching, so they
+never sit in Redis; read them with get_hospital_secrets where they're used.
+"""
+import json
+import logging
+from typing import Any, Dict, Optional
+from core.cache import TTLCache
+from core.config import settings
+from core.database import get_supabase
+from core.redis_store import get_redis, reset_redis
+from core.request_context import identity_discard, identity_get, identity_put
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "entity:"
+
+SECRET_COLUMNS = {
+    "hospitals": ("smtp_password", "whatsapp_access_token"),
+}
+
+_local = TTLCache(
+    max_entries=settings.ENTITY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ENTITY_CACHE_LOCAL_TTL_SECONDS
+)
+
+
+def _redis_key(kind: str, key: Any) -> str:
+    return f"{REDIS_KEY_PREFIX}{kind}:{key}"
+
+
+def _fetch(table: str, column: str, value: Any) -> Optional[Dict[str, Any]]:
+    supabase = get_supabase()
+    if not supabase:
+        return None
+    res = supabase.table(table).select("*").eq(column, value).execute()
+    if not res.data:
+        return None
+    secrets = SECRET_COLUMNS.get(table, ())
+    return {k: v for k, v in res.data[0].items() if k not in secrets}
+
+
+def _read_through(kind: str, table: str, column: str, value: Any, fresh: bool = False) -> Optional[Dict[str, Any]]:
+    row = identity_get(kind, value)
+    if row is not None:
+        return row
+
+    local_key = (kind, value)
+    row = None if fresh else _local.get(local_key)
+    if row is not None:
+        identity_put(kind, value, row)
+        return dict(row)
+
+    client = get_redis()
+    if client and not fresh:
+        try:
+            cached = client.get(_redis_key(kind, value))
+            if cached:
+                row = json.loads(cached)
+                _local.set(local_key, row)
+                identity_put(kind, value, row)
+                return dict(row)
+        except Exception as e:
+            logger.warning(f"Entity cache Redis read failed: {e}")
+            reset_redis()
+            client = None
+
+    row = _fetch(table, column, value)
+    if row is None:
+        return None
+    _local.set(local_key, row)
+    identity_put(kind, value, row)
+    if client:
+        try:
+            client.set(_redis_key(kind, value), json.dumps(row, default=str), ex=settings.ENTITY_CACHE_REDIS_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Entity cache Redis write failed: {e}")
+            reset_redis()
+    return dict(row)
+
+
+def _invalidate(*keys):
+    for key in keys:
+        _local.delete(key)
+        identity_discard(*key)
+    client = get_redis()
+    if client:
+        try:
+            client.delete(*(_redis_key(kind, value) for kind, value in keys))
+        except Exception as e:
+            logger.warning(f"Entity cache Redis invalidation failed: {e}")
+            reset_redis()
+
+
+def get_doctor(doctor_id: int) -> Optional[Dict[str, Any]]:
+    return _read_through("doctor", "doctors", "id", int(doctor_id))
+
+
+def get_doctor_by_user(user_id: int, fresh: bool = False) -> Optional[Dict[str, Any]]:
+    """fresh: skip the cache tiers (not the identity map) and refresh them from the database."""
+    return _read_through("doctor_user", "doctors", "user_id", int(user_id), fresh=fresh)
+
+
+def get_hospital(hospital_id: int) -> Optional[Dict[str, Any]]:
+    return _read_through("hospital", "hospitals", "id", int(hospital_id))
+
+
+def get_hospital_secrets(hospital_id: int, *columns: str) -> Dict[str, Any]:
+    """Read credential columns of a hospital straight from the database (never cached)."""
+    unknown = set(columns) - set(SECRET_COLUMNS["hospitals"])
+    if unknown:
+        raise ValueError(f"Not a secret hospital column: {', '.join(sorted(unknown))}")
+    supabase = get_supabase()
+    if not supabase or not columns:
+        return {}
+    res = supabase.table("hospitals").select(", ".join(columns)).eq("id", int(hospital_id)).execute()
+    return res.data[0] if res.data else {}
+
+
+def invalidate_doctor(doctor_id: Optional[int] = None, user_id: Optional[int] = None):
+    keys = []
+    if doctor_id is not None:
+        keys.append(("doctor", int(doctor_id)))
+    if user_id is not None:
+        keys.append(("doctor_user", int(user_id)))
+    if keys:
+        _invalidate(*keys)
+
+
+def invalidate_hospital(hospital_id: int):
+    _invalidate(("hospital", int(hospital_id)))
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    return _local.stats()
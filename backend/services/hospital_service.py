@@ -1,9 +1,36 @@
-from typing import Dict, Any, List, Optional
+import hashlib
+import itertools
+import logging
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
 from fastapi import HTTPException
+from core.config import settings
 from core.database import get_supabase
+from core.redis_store import get_redis, reset_redis
+from services import entity_cache
+from services.city_index import hospital_city_index
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 class HospitalService:
+    # Columns returned by hospital listings (no SMTP credentials or message templates)
+    PUBLIC_FIELDS = (
+        "id", "name", "email", "mobile", "status", "created_at",
+        "address_line1", "address_line2", "address_line3", "city", "state", "pincode",
+        "upi_id", "gpay_upi_id", "phonepay_upi_id", "paytm_upi_id", "bhim_upi_id",
+        "whatsapp_enabled"
+    )
+    LIST_MAX_LIMIT = 200
+
+    # Listing version, bumped after every write that changes listed data.
+    # Shared through Redis; otherwise per process (see HOSPITAL_LIST_LOCAL_VERSION_TTL_SECONDS).
+    _VERSION_KEY = "hospitals:list_version"
+    _local_version = itertools.count(1)
+    _local_version_value = 0
+    _boot_id = uuid.uuid4().hex[:8]
+
     @staticmethod
     def _get_db():
         return get_supabase()
@@ -35,16 +62,66 @@ class HospitalService:
         # Link payment back
         supabase.table("payments").update({"hospital_id": hospital["id"]}).eq("id", payment_id).execute()
 
+        if hospital.get("city"):
+            hospital_city_index.add(hospital["city"], hospital.get("state"))
+        cls.bump_list_version()
+
         return hospital
 
     @classmethod
-    def get_public_hospitals(cls, status_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+    def get_list_version(cls) -> str:
+        client = get_redis()
+        if client:
+            try:
+                return f"r{client.get(cls._VERSION_KEY) or 0}"
+            except Exception as e:
+                logger.warning(f"Hospital list version read failed: {e}")
+                reset_redis()
+        # Other workers' writes are invisible here, so the version also rolls over periodically
+        bucket = int(time.time() // settings.HOSPITAL_LIST_LOCAL_VERSION_TTL_SECONDS)
+        return f"l{cls._boot_id}.{cls._local_version_value}.{bucket}"
+
+    @classmethod
+    def bump_list_version(cls):
+        """Call after any write that changes what hospital listings return."""
+        cls._local_version_value = next(cls._local_version)
+        client = get_redis()
+        if client:
+            try:
+                client.incr(cls._VERSION_KEY)
+            except Exception as e:
+                logger.warning(f"Hospital list version bump failed: {e}")
+                reset_redis()
+
+    @classmethod
+    def list_etag(cls, status_filter: Optional[str], limit: Optional[int], cursor: Optional[int]) -> str:
+        """Strong ETag for one listing page; computed without touching the database."""
+        raw = f"{cls.get_list_version()}|{status_filter}|{limit}|{cursor}"
+        return f'"{hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]}"'
+
+    @classmethod
+    def get_public_hospitals(
+        cls,
+        status_filter: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Newest hospitals first, keyset-paginated on id.
+        Returns (rows, next_cursor); without a limit every hospital is returned.
+        """
         supabase = cls._get_db()
-        q = supabase.table("hospitals").select("*")
+        q = supabase.table("hospitals").select(", ".join(cls.PUBLIC_FIELDS))
         if status_filter:
             q = q.eq("status", status_filter)
-        res = q.order("created_at", desc=True).execute()
-        return res.data if res.data else []
+        if cursor is not None:
+            q = q.lt("id", cursor)
+        q = q.order("id", desc=True)
+        if limit:
+            q = q.limit(min(limit, cls.LIST_MAX_LIMIT))
+        rows = q.execute().data or []
+        next_cursor = rows[-1]["id"] if limit and len(rows) == min(limit, cls.LIST_MAX_LIMIT) else None
+        return rows, next_cursor
         
     @classmethod
     def get_hospital_by_id(cls, hospital_id: int) -> Dict[str, Any]:
@@ -66,7 +143,12 @@ class HospitalService:
         
         if not res.data:
             raise HTTPException(status_code=404, detail="Hospital not found or update failed")
-        return res.data[0]
+        hospital = res.data[0]
+        entity_cache.invalidate_hospital(hospital_id)
+        if new_status == "approved" and hospital.get("city"):
+            hospital_city_index.add(hospital["city"], hospital.get("state"))
+        cls.bump_list_version()
+        return hospital
 
     @classmethod
     def update_whatsapp_settings(cls, hospital_id: int, updates: Dict[str, Any]) -> Dict[str, Any]:
@@ -74,6 +156,8 @@ class HospitalService:
         res = supabase.table("hospitals").update(updates).eq("id", hospital_id).execute()
         if not res.data:
             raise HTTPException(status_code=404, detail="Hospital not found")
+        entity_cache.invalidate_hospital(hospital_id)
+        cls.bump_list_version()
         return res.data[0]
 
     @classmethod
@@ -82,4 +166,6 @@ class HospitalService:
         res = supabase.table("hospitals").update(updates).eq("id", hospital_id).execute()
         if not res.data:
             raise HTTPException(status_code=404, detail="Hospital not found")
+        entity_cache.invalidate_hospital(hospital_id)
+        cls.bump_list_version()
         return res.data[0]
@@ -0,0 +1,98 @@
+"""
+Leader election for singleton background work (the APScheduler instance).
+
+Every worker runs the election loop; only the current leader executes
+scheduled jobs. Two backends:
+
+- RedisLeaderLock: a key holding the leader's identity with a TTL that the
+  leader keeps renewing. Works across hosts. If Redis is unreachable the
+  current leader steps down rather than risk two leaders.
+- FileLeaderLock: an exclusive flock on a local file, held for as long as
+  the process lives. Used when Redis is not configured (single host).
+"""
+import logging
+import os
+import socket
+import uuid
+from typing import Optional
+from redis.exceptions import WatchError
+from core.redis_store import get_redis, reset_redis
+
+logger = logging.getLogger(__name__)
+
+
+def _identity() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class RedisLeaderLock:
+    def __init__(self, name: str, ttl_seconds: int):
+        self.key = f"leader:{name}"
+        self.ttl_seconds = ttl_seconds
+        self.identity = _identity()
+
+    def acquire_or_renew(self) -> bool:
+        client = get_redis()
+        if not client:
+            return False
+        try:
+            if client.set(self.key, self.identity, nx=True, ex=self.ttl_seconds):
+                return True
+            # Renew only if we still hold it; WATCH makes the check-and-extend atomic
+            with client.pipeline() as pipe:
+                pipe.watch(self.key)
+                if pipe.get(self.key) != self.identity:
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.expire(self.key, self.ttl_seconds)
+                pipe.execute()
+                return True
+        except WatchError:
+            return False
+        except Exception as e:
+            logger.warning(f"Leader lock {self.key} check failed: {e}")
+            reset_redis()
+            return False
+
+    def release(self):
+        client = get_redis()
+        if not client:
+            return
+        try:
+            with client.pipeline() as pipe:
+                pipe.watch(self.key)
+                if pipe.get(self.key) == self.identity:
+                    pipe.multi()
+                    pipe.delete(self.key)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+        except Exception as e:
+            logger.warning(f"Leader lock {self.key} release failed: {e}")
+
+
+class FileLeaderLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def acquire_or_renew(self) -> bool:
+        if self._fd is not None:
+            return True
+        import fcntl
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, _identity().encode("utf-8"))
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            os.close(self._fd)  # closing the descriptor drops the flock
+            self._fd = None
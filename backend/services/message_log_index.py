@@ -0,0 +1,162 @@
+"""
+Message Log Index
+Sidecar offset index for the per-hospital daily message log files.
+
+Each hospital_{id}_{date}.jsonl has a hospital_{id}_{date}.idx next to it
+holding one fixed-size record per log line: byte offset, line length,
+milliseconds since midnight (UTC) and a status code. Queries filter on the
+index and only read and parse the lines they actually return.
+
+Several worker processes append to the same files, so every append (and
+every catch-up of an index that lags its log) happens under an exclusive
+flock on the log file, with offsets taken from the file's real size.
+"""
+import json
+import os
+import struct
+from contextlib import contextmanager
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+RECORD = struct.Struct("<QIIB")
+
+STATUS_CODES = {"success": 1, "failed": 2, "sent": 3, "pending": 4}
+OTHER_STATUS = 0
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+
+class IndexRecord(NamedTuple):
+    offset: int
+    length: int
+    ms: int
+    status: int
+
+
+def index_path(log_path: str) -> str:
+    return log_path[:-len(".jsonl")] + ".idx"
+
+
+def status_code(status: Optional[str]) -> int:
+    return STATUS_CODES.get(status or "", OTHER_STATUS)
+
+
+def time_ms(timestamp: Optional[str]) -> int:
+    """Milliseconds since midnight for an ISO timestamp (0 if unparseable)."""
+    try:
+        t = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return 0
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 1000 + t.microsecond // 1000
+
+
+def pack(offset: int, length: int, entry: Dict) -> bytes:
+    return RECORD.pack(offset, length, time_ms(entry.get("timestamp")), status_code(entry.get("status")))
+
+
+def scan(f: BinaryIO, start: int = 0) -> List[IndexRecord]:
+    """Index the complete lines of a log file from byte offset `start`."""
+    records = []
+    f.seek(start)
+    offset = start
+    for line in f:
+        if not line.endswith(b"\n"):
+            break  # partially written line; picked up next time
+        if line.strip():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                entry = {}
+            records.append(IndexRecord(*RECORD.unpack(pack(offset, len(line), entry))))
+        offset += len(line)
+    return records
+
+
+def _load(log_path: str) -> Tuple[List[IndexRecord], int, int]:
+    """(records covering the whole log, how many came from the index, index file size)."""
+    try:
+        with open(index_path(log_path), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        data = b""
+    usable = len(data) - len(data) % RECORD.size
+    records = [IndexRecord(*r) for r in RECORD.iter_unpack(data[:usable])]
+
+    size = os.path.getsize(log_path)
+    end = records[-1].offset + records[-1].length if records else 0
+    if end > size:
+        # Index belongs to an older version of the file; start over
+        records, end = [], 0
+    indexed = len(records)
+    if end < size:
+        with open(log_path, "rb") as f:
+            records.extend(scan(f, end))
+    return records, indexed, len(data)
+
+
+def read_index(log_path: str, persist: bool = False) -> List[IndexRecord]:
+    """
+    Index records covering the whole log file. Lines the index doesn't
+    cover yet (files written before indexing existed) are indexed on the
+    fly, and appended to the index when `persist` is set.
+    """
+    records, indexed, idx_size = _load(log_path)
+    if persist and idx_size != len(records) * RECORD.size:
+        log_fd = os.open(log_path, os.O_RDONLY)
+        idx_fd = os.open(index_path(log_path), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            with locked(log_fd):
+                records = catch_up(log_path, idx_fd)
+        finally:
+            os.close(idx_fd)
+            os.close(log_fd)
+    return records
+
+
+@contextmanager
+def locked(log_fd: int) -> Iterator[None]:
+    """Exclusive flock on a log file, shared by every process appending to it."""
+    import fcntl
+    fcntl.flock(log_fd, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(log_fd, fcntl.LOCK_UN)
+
+
+def catch_up(log_path: str, idx_fd: int) -> List[IndexRecord]:
+    """
+    Make the index cover every complete line of its log, dropping a partly
+    written or outdated index and appending the missing records. Call with
+    the log locked; idx_fd must be opened O_RDWR | O_APPEND.
+    """
+    records, indexed, idx_size = _load(log_path)
+    if idx_size != indexed * RECORD.size:
+        os.ftruncate(idx_fd, indexed * RECORD.size)
+    if len(records) > indexed:
+        write_all(idx_fd, b"".join(RECORD.pack(*record) for record in records[indexed:]))
+    return records
+
+
+def append_offset(log_path: str, log_fd: int, idx_fd: int) -> int:
+    """
+    Where the next line of a locked log goes (its size), after making sure
+    the index covers everything before it. O(1) unless the index lags.
+    """
+    size = os.fstat(log_fd).st_size
+    idx_size = os.fstat(idx_fd).st_size
+    end = -1
+    if idx_size % RECORD.size == 0:
+        end = 0
+        if idx_size:
+            offset, length, _, _ = RECORD.unpack(os.pread(idx_fd, RECORD.size, idx_size - RECORD.size))
+            end = offset + length
+    if end != size:
+        catch_up(log_path, idx_fd)
+    return size
+
+
+def write_all(fd: int, data: bytes):
+    """One write() for the whole buffer (O_APPEND keeps it in one piece); loops only on a short write."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
@@ -0,0 +1,188 @@
+"""
+Message Log Query Engine
+Date/time range and status queries over the per-hospital daily log files.
+
+Plain daily files are filtered through their sidecar index and only the
+matching lines are read; gzipped (older) days are read sequentially.
+Results come back in time order as a generator, so callers can page with a
+cursor ("YYYY-MM-DD:<line>") or stream a long range without holding it in
+memory.
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from services import message_log_index, message_logger
+from services.message_log_index import OTHER_STATUS, STATUS_NAMES, status_code, time_ms
+
+logger = logging.getLogger(__name__)
+
+_DAY_END_MS = time_ms(datetime.combine(date.min, time.max).isoformat())
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Raises ValueError for a malformed cursor."""
+    if not cursor:
+        return None
+    day, _, position = cursor.rpartition(":")
+    datetime.strptime(day, "%Y-%m-%d")
+    if not position.isdigit():
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return day, int(position)
+
+
+def _days(start: date, end: date) -> Iterator[date]:
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def _bounds(day: date, start: datetime, end: datetime) -> Tuple[int, int]:
+    lo = time_ms(start.isoformat()) if day == start.date() else 0
+    hi = time_ms(end.isoformat()) if day == end.date() else _DAY_END_MS
+    return lo, hi
+
+
+def _iter_indexed(path: str, day: str, skip: int, lo: int, hi: int, status: Optional[str]) -> Iterator[Tuple[str, Dict]]:
+    # Days before yesterday get no more writes, so an index built here can be kept
+    persist = day < (datetime.utcnow().date() - timedelta(days=1)).isoformat()
+    records = message_log_index.read_index(path, persist=persist)
+    code = status_code(status) if status else None
+    with open(path, "rb") as f:
+        for position in range(skip, len(records)):
+            record = records[position]
+            if record.ms < lo or record.ms > hi:
+                continue
+            if code is not None and record.status != code:
+                continue
+            f.seek(record.offset)
+            entry = json.loads(f.read(record.length))
+            if code == OTHER_STATUS and entry.get("status") != status:
+                continue
+            yield f"{day}:{position + 1}", entry
+
+
+def _iter_compressed(path: str, day: str, skip: int, lo: int, hi: int, status: Optional[str]) -> Iterator[Tuple[str, Dict]]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        position = 0
+        for line in f:
+            if not line.strip():
+                continue
+            position += 1
+            if position <= skip:
+                continue
+            entry = json.loads(line)
+            if status and entry.get("status") != status:
+                continue
+            if lo <= time_ms(entry.get("timestamp")) <= hi:
+                yield f"{day}:{position}", entry
+
+
+def iter_logs(
+    hospital_id: int,
+    start: datetime,
+    end: datetime,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    Yield (cursor, entry) for every log entry of a hospital between
+    `start` and `end` (inclusive, UTC) in time order. Each cursor resumes
+    right after its entry.
+    """
+    message_logger._writer.flush()
+    log_dir = message_logger._writer.log_dir
+    after = parse_cursor(cursor)
+
+    for day in _days(start.date(), end.date()):
+        day_str = day.isoformat()
+        skip = 0
+        if after:
+            if day_str < after[0]:
+                continue
+            if day_str == after[0]:
+                skip = after[1]
+        lo, hi = _bounds(day, start, end)
+        path = message_logger.log_file_path(log_dir, hospital_id, day_str)
+        if os.path.exists(path):
+            yield from _iter_indexed(path, day_str, skip, lo, hi, status)
+        elif os.path.exists(path + ".gz"):
+            yield from _iter_compressed(path + ".gz", day_str, skip, lo, hi, status)
+
+
+def query_logs(
+    hospital_id: int,
+    start: datetime,
+    end: datetime,
+    status: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """One page of entries (everything without a limit) and the cursor for the next page (None at the end)."""
+    logs: List[Dict] = []
+    next_cursor = None
+    for position, entry in iter_logs(hospital_id, start, end, status=status, cursor=cursor):
+        if len(logs) == limit:
+            return logs, next_cursor
+        logs.append(entry)
+        next_cursor = position
+    return logs, None
+
+
+def count_logs(hospital_id: int, start: datetime, end: datetime) -> Dict[str, int]:
+    """Entries per status between `start` and `end`, counted from the index."""
+    message_logger._writer.flush()
+    log_dir = message_logger._writer.log_dir
+    counts: Dict[str, int] = {}
+    for day in _days(start.date(), end.date()):
+        day_str = day.isoformat()
+        lo, hi = _bounds(day, start, end)
+        path = message_logger.log_file_path(log_dir, hospital_id, day_str)
+        if os.path.exists(path):
+            for record in message_log_index.read_index(path):
+                if lo <= record.ms <= hi:
+                    name = STATUS_NAMES.get(record.status, "other")
+                    counts[name] = counts.get(name, 0) + 1
+        elif os.path.exists(path + ".gz"):
+            for _, entry in _iter_compressed(path + ".gz", day_str, 0, lo, hi, None):
+                name = entry.get("status") if status_code(entry.get("status")) != OTHER_STATUS else "other"
+                counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def stream_logs_json(
+    hospital_id: int,
+    start: datetime,
+    end: datetime,
+    status: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Iterator[bytes]:
+    """
+    Encode a query as a JSON object chunk by chunk:
+    {"hospital_id", "from", "to", "logs": [...], "count", "next_cursor"}.
+    Without a limit the whole range is streamed and next_cursor is null.
+    """
+    yield (
+        f'{{"hospital_id": {json.dumps(hospital_id)}, "from": {json.dumps(start.isoformat())}, '
+        f'"to": {json.dumps(end.isoformat())}, "logs": ['
+    ).encode("utf-8")
+    count = 0
+    next_cursor = None
+    try:
+        for position, entry in iter_logs(hospital_id, start, end, status=status, cursor=cursor):
+            if limit is not None and count == limit:
+                break
+            yield (", " if count else "").encode("utf-8") + json.dumps(entry).encode("utf-8")
+            count += 1
+            next_cursor = position
+        else:
+            next_cursor = None
+    except Exception as e:
+        # Headers are already sent: the client sees a truncated document
+        logger.error(f"Error streaming message logs for hospital {hospital_id}: {e}")
+        raise
+    yield f'], "count": {count}, "next_cursor": {json.dumps(next_cursor)}}}'.encode("utf-8")
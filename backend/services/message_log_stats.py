@@ -0,0 +1,164 @@
+"""
+Message Log Statistics
+Running delivery counters for the WhatsApp message logs.
+
+Counters are kept per hospital per day (total, per status and a
+retry-count histogram) in hospital_{id}_{date}.stats.json next to the
+day's log. Every worker process's log writer merges its batch into that
+file while it holds the log file's lock (see message_log_index), so the
+counters cover exactly the lines in the log, whichever worker wrote them.
+Reading a day's statistics never touches the log itself; days logged
+before counters existed are counted once from their log file and saved.
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import date, timedelta
+from typing import Any, BinaryIO, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SUCCESS_STATUSES = ("success", "sent")
+
+
+def stats_file_path(log_dir: str, hospital_id: int, log_date: str) -> str:
+    return f"{log_dir}/hospital_{hospital_id}_{log_date}.stats.json"
+
+
+def _empty() -> Dict[str, Any]:
+    return {"total": 0, "by_status": {}, "retries": {}}
+
+
+def _add(counters: Dict[str, Any], status: Optional[str], retry_count: Any, n: int = 1):
+    counters["total"] += n
+    status = status or "unknown"
+    counters["by_status"][status] = counters["by_status"].get(status, 0) + n
+    retries = str(retry_count or 0)
+    counters["retries"][retries] = counters["retries"].get(retries, 0) + n
+
+
+def combine(days: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum several days' counters."""
+    combined = _empty()
+    for counters in days:
+        combined["total"] += counters["total"]
+        for key in ("by_status", "retries"):
+            for name, n in counters[key].items():
+                combined[key][name] = combined[key].get(name, 0) + n
+    return combined
+
+
+def summarize(counters: Dict[str, Any]) -> Dict[str, Any]:
+    """The statistics block served by the whatsapp-logs endpoints."""
+    total = counters["total"]
+    successful = sum(counters["by_status"].get(s, 0) for s in SUCCESS_STATUSES)
+    return {
+        "total": total,
+        "successful": successful,
+        "failed": counters["by_status"].get("failed", 0),
+        "success_rate": round((successful / total * 100) if total > 0 else 0, 2),
+        "by_status": dict(counters["by_status"]),
+        "retries": dict(sorted(counters["retries"].items(), key=lambda item: int(item[0]))),
+    }
+
+
+class MessageLogStats:
+    """Per-hospital, per-day counters shared by all worker processes through JSON files."""
+
+    def __init__(self, log_dir: str):
+        self.log_dir = log_dir
+
+    def before_append(self, hospital_id: int, log_date: str, log_offset: int) -> Dict[str, Any]:
+        """
+        Counters for the first `log_offset` bytes of a day's log, read before
+        the writer appends to it. Call with the log locked.
+        """
+        counters = self._read(hospital_id, log_date)
+        if counters is None:
+            counters = self._count_log(hospital_id, log_date, limit=log_offset)
+        return counters
+
+    def after_append(self, hospital_id: int, log_date: str, counters: Dict[str, Any], entries: List[Dict[str, Any]]):
+        """Add the entries just appended and save. Call with the log still locked."""
+        for entry in entries:
+            _add(counters, entry.get("status"), entry.get("retry_count"))
+        path = stats_file_path(self.log_dir, hospital_id, log_date)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(counters, f)
+        os.replace(tmp_path, path)
+
+    def get(self, hospital_id: int, log_date: str) -> Dict[str, Any]:
+        """Counters for one hospital and day (zeros if nothing was logged)."""
+        counters = self._read(hospital_id, log_date)
+        if counters is None:
+            counters = self._count_log(hospital_id, log_date)
+            if counters["total"]:
+                self._save_backfill(hospital_id, log_date, counters)
+        return counters
+
+    def series(self, hospital_id: int, start: date, end: date) -> List[Dict[str, Any]]:
+        """[{"date", ...counters}] for every day from start to end inclusive."""
+        days = []
+        day = start
+        while day <= end:
+            days.append({"date": day.isoformat(), **self.get(hospital_id, day.isoformat())})
+            day += timedelta(days=1)
+        return days
+
+    def _read(self, hospital_id: int, log_date: str) -> Optional[Dict[str, Any]]:
+        path = stats_file_path(self.log_dir, hospital_id, log_date)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.warning(f"Rebuilding unreadable message log stats {path}: {e}")
+            return None
+
+    def _save_backfill(self, hospital_id: int, log_date: str, counters: Dict[str, Any]):
+        """
+        Save counters counted outside the log lock, only if no writer has
+        saved any in the meantime (os.link never replaces an existing file).
+        """
+        path = stats_file_path(self.log_dir, hospital_id, log_date)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(counters, f)
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        except Exception as e:
+            logger.error(f"Error saving message log stats {path}: {e}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _count_log(self, hospital_id: int, log_date: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Backfill counters for a day logged without them (its compressed part, then up to `limit` bytes of the log)."""
+        counters = _empty()
+        log_path = f"{self.log_dir}/hospital_{hospital_id}_{log_date}.jsonl"
+        if os.path.exists(log_path + ".gz"):
+            with gzip.open(log_path + ".gz", "rb") as f:
+                _count_lines(counters, f)
+        if os.path.exists(log_path):
+            with open(log_path, "rb") as f:
+                _count_lines(counters, f, limit)
+        return counters
+
+
+def _count_lines(counters: Dict[str, Any], f: BinaryIO, limit: Optional[int] = None):
+    read = 0
+    for line in f:
+        read += len(line)
+        if not line.endswith(b"\n") or (limit is not None and read > limit):
+            break  # partially written, or appended after `limit`
+        if line.strip():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                entry = {}
+            _add(counters, entry.get("status"), entry.get("retry_count"))
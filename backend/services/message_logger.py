@@ -1,23 +1,283 @@
 """
 Message Logger Service
 Logs all WhatsApp messages sent for audit and tracking
+
+log_message() only queues the entry; a background writer thread appends it
+to the per-hospital daily JSONL file. The writer keeps files open in
+append mode and writes queued entries in batches, at least every
+MESSAGE_LOG_FLUSH_SECONDS, with one write() of complete lines per file so
+lines from several worker processes never interleave. Once a day it gzips
+files older than MESSAGE_LOG_COMPRESS_AFTER_DAYS. If the queue is full,
+entries are dropped and counted rather than blocking the sender.
+
+Alongside each line the writer appends a record to the file's sidecar
+index (see message_log_index), holding a lock on the log file so several
+worker processes agree on the offsets; reads go through message_log_query.
+Delivery counters are merged by the writer, under the same lock, into a
+stats file next to the logs (see message_log_stats).
 """
+import atexit
+import gzip
 import logging
 import json
 import os
-from datetime import datetime
-from typing import Dict, Optional, List
+import queue
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, Optional, List, Tuple
+from core.config import settings
+from services import message_log_index
+from services.message_log_stats import MessageLogStats
 
 logger = logging.getLogger(__name__)
 
 # Directory for message logs
 LOG_DIR = "./whatsapp_logs"
 
+_LOG_FILE_RE = re.compile(r"^hospital_(\d+)_(\d{4}-\d{2}-\d{2})\.jsonl$")
+_ROTATE_LOCK = ".rotate.lock"
+_STOP = object()
+
+
 def ensure_log_directory():
     """Ensure log directory exists."""
     os.makedirs(LOG_DIR, exist_ok=True)
 
 
+def log_file_path(log_dir: str, hospital_id: int, log_date: str) -> str:
+    return f"{log_dir}/hospital_{hospital_id}_{log_date}.jsonl"
+
+
+class MessageLogWriter:
+    """Background, batched appender for the per-hospital daily log files."""
+
+    def __init__(
+        self,
+        log_dir: str = LOG_DIR,
+        flush_seconds: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        compress_after_days: Optional[int] = None,
+        max_open_files: Optional[int] = None
+    ):
+        self.log_dir = log_dir
+        self.flush_seconds = flush_seconds or settings.MESSAGE_LOG_FLUSH_SECONDS
+        self.batch_size = batch_size or settings.MESSAGE_LOG_BATCH_SIZE
+        self.compress_after_days = compress_after_days if compress_after_days is not None else settings.MESSAGE_LOG_COMPRESS_AFTER_DAYS
+        self.max_open_files = max_open_files or settings.MESSAGE_LOG_MAX_OPEN_FILES
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue or settings.MESSAGE_LOG_QUEUE_MAX)
+        # path -> (log fd, index fd), both opened O_APPEND
+        self._handles: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._rotated_on: Optional[str] = None
+        self.stats = MessageLogStats(log_dir)
+        self.written = 0
+        self.dropped = 0
+
+    # ── producer side (any thread) ──────────────────────────
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="message-log-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        """Queue one entry; never blocks. False if it had to be dropped."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """Wait until everything queued so far is on disk (used before reads)."""
+        if not (self._thread and self._thread.is_alive()):
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        if self._thread and self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+    # ── writer thread ───────────────────────────────────────
+    def _run(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_seconds))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            stop = False
+            waiters = []
+            pending: Dict[str, List[Dict[str, Any]]] = {}
+            for item in batch:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    path = log_file_path(self.log_dir, item["hospital_id"], item["timestamp"][:10])
+                    pending.setdefault(path, []).append(item)
+            for path, entries in pending.items():
+                self._write(path, entries)
+            for waiter in waiters:
+                waiter.set()
+
+            if stop:
+                self._close_all()
+                return
+            try:
+                self._maybe_rotate()
+            except Exception as e:
+                logger.error(f"Error rotating message logs: {e}")
+
+    def _handle(self, path: str) -> Tuple[int, int]:
+        handles = self._handles.get(path)
+        if handles is not None:
+            self._handles.move_to_end(path)
+            return handles
+        if len(self._handles) >= self.max_open_files:
+            _, oldest = self._handles.popitem(last=False)
+            _close(oldest)
+        log = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        idx = os.open(message_log_index.index_path(path), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        handles = self._handles[path] = (log, idx)
+        return handles
+
+    def _write(self, path: str, entries: List[Dict[str, Any]]):
+        """Append a batch of entries to one log file and its index."""
+        try:
+            log, idx = self._handle(path)
+            lines = [(json.dumps(entry) + "\n").encode("utf-8") for entry in entries]
+            hospital_id, log_date = entries[0]["hospital_id"], entries[0]["timestamp"][:10]
+            with message_log_index.locked(log):
+                # Other workers append to the same file: offsets come from its real size
+                offset = message_log_index.append_offset(path, log, idx)
+                counters = self._stats_before(hospital_id, log_date, offset)
+                records = []
+                for entry, line in zip(entries, lines):
+                    records.append(message_log_index.pack(offset, len(line), entry))
+                    offset += len(line)
+                message_log_index.write_all(log, b"".join(lines))
+                message_log_index.write_all(idx, b"".join(records))
+                self.written += len(entries)
+                if counters is not None:
+                    self._stats_after(hospital_id, log_date, counters, entries)
+        except Exception as e:
+            logger.error(f"Error logging message: {str(e)}")
+
+    def _stats_before(self, hospital_id: int, log_date: str, offset: int) -> Optional[Dict[str, Any]]:
+        try:
+            return self.stats.before_append(hospital_id, log_date, offset)
+        except Exception as e:
+            logger.error(f"Error reading message log stats: {e}")
+            return None
+
+    def _stats_after(self, hospital_id: int, log_date: str, counters: Dict[str, Any], entries: List[Dict[str, Any]]):
+        try:
+            self.stats.after_append(hospital_id, log_date, counters, entries)
+        except Exception as e:
+            logger.error(f"Error saving message log stats: {e}")
+
+    def _close_all(self):
+        while self._handles:
+            _, handles = self._handles.popitem()
+            _close(handles)
+
+    def _maybe_rotate(self, today: Optional[str] = None):
+        today = today or datetime.utcnow().strftime("%Y-%m-%d")
+        if self._rotated_on == today:
+            return
+        self._rotated_on = today
+        # Yesterday's files are complete: release their handles
+        for path in [p for p in self._handles if not p.endswith(f"_{today}.jsonl")]:
+            _close(self._handles.pop(path))
+        self.compress_old_files(today)
+
+    def compress_old_files(self, today: str) -> int:
+        """Gzip daily files at least compress_after_days old; returns how many."""
+        if self.compress_after_days <= 0 or not os.path.isdir(self.log_dir):
+            return 0
+        cutoff = (datetime.strptime(today, "%Y-%m-%d") - timedelta(days=self.compress_after_days)).strftime("%Y-%m-%d")
+        import fcntl
+        lock_fd = os.open(os.path.join(self.log_dir, _ROTATE_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return 0  # another worker is compressing right now
+            compressed = 0
+            for entry in os.scandir(self.log_dir):
+                match = _LOG_FILE_RE.match(entry.name)
+                if not match or match.group(2) > cutoff:
+                    continue
+                try:
+                    self._compress(entry.path)
+                except FileNotFoundError:
+                    continue  # already compressed by another worker
+                compressed += 1
+        finally:
+            os.close(lock_fd)
+        if compressed:
+            logger.info(f"✅ Compressed {compressed} message log files older than {self.compress_after_days} days")
+        return compressed
+
+    def _compress(self, path: str):
+        gz_path = path + ".gz"
+        tmp_path = f"{gz_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as out:
+                # Late writes for an already-compressed day become an extra gzip member
+                if os.path.exists(gz_path):
+                    with open(gz_path, "rb") as existing:
+                        shutil.copyfileobj(existing, out)
+                with open(path, "rb") as src, gzip.GzipFile(fileobj=out, mode="wb") as dst:
+                    shutil.copyfileobj(src, dst)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, gz_path)
+        os.remove(path)
+        # Compressed days are read sequentially; a late write starts a fresh index
+        idx_path = message_log_index.index_path(path)
+        if os.path.exists(idx_path):
+            os.remove(idx_path)
+
+
+def _close(handles: Tuple[int, ...]):
+    for fd in handles:
+        try:
+            os.close(fd)
+        except Exception:
+            pass
+
+
+_writer = MessageLogWriter()
+atexit.register(_writer.close)
+
+
 def log_message(
     hospital_id: int,
     mobile: str,
@@ -28,7 +288,7 @@ def log_message(
 ):
     """
     Log WhatsApp message attempt.
-    
+
     Args:
         hospital_id: Hospital ID
         mobile: Mobile number
@@ -38,8 +298,6 @@ def log_message(
         retry_count: Number of retry attempts
     """
     try:
-        ensure_log_directory()
-        
         log_entry = {
             "timestamp": datetime.utcnow().isoformat(),
             "hospital_id": hospital_id,
@@ -49,20 +307,17 @@ def log_message(
             "error": error,
             "retry_count": retry_count
         }
-        
-        # Log to file (one file per hospital per day)
-        log_date = datetime.utcnow().strftime("%Y-%m-%d")
-        log_file = f"{LOG_DIR}/hospital_{hospital_id}_{log_date}.jsonl"
-        
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry) + "\n")
-        
+
+        # Written (and counted) in one file per hospital per day by the background writer
+        if not _writer.submit(log_entry):
+            logger.warning(f"Message log queue full, dropped entry for {mobile}")
+
         # Also log to application logger
         if status == "success":
             logger.info(f"Message logged: {mobile} - {status}")
         else:
             logger.warning(f"Message logged: {mobile} - {status} - {error}")
-            
+
     except Exception as e:
         logger.error(f"Error logging message: {str(e)}")
 
@@ -74,41 +329,42 @@ def get_message_logs(
 ) -> List[Dict]:
     """
     Get message logs for a hospital.
-    
+
     Args:
         hospital_id: Hospital ID
         date: Date in YYYY-MM-DD format (optional)
         status: Filter by status ('success' or 'failed') (optional)
-    
+
     Returns:
         List of log entries
     """
     try:
-        ensure_log_directory()
-        
-        if date:
-            log_file = f"{LOG_DIR}/hospital_{hospital_id}_{date}.jsonl"
-        else:
-            # Get today's log file
-            log_date = datetime.utcnow().strftime("%Y-%m-%d")
-            log_file = f"{LOG_DIR}/hospital_{hospital_id}_{log_date}.jsonl"
-        
-        if not os.path.exists(log_file):
-            return []
-        
-        logs = []
-        with open(log_file, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    entry = json.loads(line)
-                    if not status or entry.get("status") == status:
-                        logs.append(entry)
-        
-        return logs
-        
+        from services.message_log_query import iter_logs
+        day = datetime.strptime(date, "%Y-%m-%d") if date else datetime.combine(datetime.utcnow().date(), time.min)
+        return [entry for _, entry in iter_logs(hospital_id, day, datetime.combine(day.date(), time.max), status=status)]
+
     except Exception as e:
         logger.error(f"Error reading message logs: {str(e)}")
         return []
 
 
+def get_message_stats(hospital_id: int, date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Delivery counters for a hospital's day, without reading the log.
+
+    Returns:
+        {"total", "by_status": {status: n}, "retries": {retry_count: n}}
+    """
+    log_date = date or datetime.utcnow().strftime("%Y-%m-%d")
+    _writer.flush()
+    return _writer.stats.get(hospital_id, log_date)
+
 
+def get_message_stats_series(hospital_id: int, start: str, end: str) -> List[Dict[str, Any]]:
+    """Daily delivery counters for a hospital from start to end (YYYY-MM-DD, inclusive)."""
+    _writer.flush()
+    return _writer.stats.series(
+        hospital_id,
+        datetime.strptime(start, "%Y-%m-%d").date(),
+        datetime.strptime(end, "%Y-%m-%d").date()
+    )
@@ -169,3 +169,50 @@ Please arrive on time.
 
 – {hospital_name}"""
 
+
+
+def get_operation_reminder_message(
+    patient_name: str,
+    doctor_name: str,
+    date: str,
+    hospital_name: str,
+    specialty: Optional[str] = None,
+    custom_template: Optional[str] = None
+) -> str:
+    """
+    Generate operation reminder message (operations have a date but no time slot).
+    
+    Args:
+        patient_name: Patient's name
+        doctor_name: Doctor's name
+        date: Operation date
+        hospital_name: Hospital name
+        specialty: Specialty (optional)
+        custom_template: Custom template from hospital settings
+    
+    Returns:
+        str: Formatted message
+    """
+    if custom_template:
+        message = custom_template
+        message = message.replace("{patient_name}", patient_name)
+        message = message.replace("{doctor_name}", doctor_name)
+        message = message.replace("{date}", format_date(date))
+        message = message.replace("{time}", "")
+        message = message.replace("{hospital_name}", hospital_name)
+        if specialty:
+            message = message.replace("{specialty}", specialty)
+        return message
+    
+    specialty_text = f" ({specialty})" if specialty else ""
+    
+    # Default template
+    return f"""Hello {patient_name},
+
+Reminder: Your operation with Dr {doctor_name}{specialty_text} is scheduled for:
+
+🗓 Date: {format_date(date)}
+
+Please follow the preparation instructions given by the hospital.
+
+– {hospital_name}"""
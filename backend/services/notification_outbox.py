@@ -0,0 +1,265 @@
+"""
+Transactional outbox for WhatsApp / email notifications (database/notification_outbox.sql).
+
+Producers write outbox rows in the same transaction as the change they
+announce (the book_operation RPC), or with enqueue() where there is no
+transaction to join. Every worker runs run_outbox_worker():
+
+1. Lease due rows with claim_notifications(). FOR UPDATE SKIP LOCKED means
+   two workers never get the same row, and an expired lease makes a row
+   claimable again.
+2. Deliver the rows on a small thread pool.
+3. Mark each row sent, or reschedule it with exponential backoff. After
+   max_attempts a row is marked dead.
+
+A full batch is followed immediately by the next one, so a backlog drains
+continuously. enqueue() also wakes this worker's loop. After a failed
+drain the loop backs off exponentially (up to OUTBOX_BACKOFF_MAX_SECONDS),
+so a deployment without the outbox table logs one warning instead of an
+error every poll.
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from postgrest.exceptions import APIError
+from core.config import settings
+from core.database import get_supabase
+from services.whatsapp_transports import send_message
+
+logger = logging.getLogger(__name__)
+
+TABLE = "notification_outbox"
+
+Delivery = Callable[[Dict[str, Any]], Tuple[bool, Optional[str]]]
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_claim_rpc_available = True
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_wake_event: Optional[asyncio.Event] = None
+
+# Table or RPC not there yet: database/notification_outbox.sql not applied
+_MISSING_SCHEMA_CODES = ("PGRST202", "PGRST205", "42P01")
+
+_stats = {"claimed": 0, "sent": 0, "retried": 0, "dead": 0, "batches": 0, "last_batch_at": None}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str, n: int = 1):
+    # Bumped from the delivery threads as well as the loop
+    with _stats_lock:
+        _stats[key] += n
+
+
+def notification(
+    channel: str,
+    recipient: str,
+    message: str,
+    hospital_id: Optional[int] = None,
+    subject: Optional[str] = None,
+    message_html: Optional[str] = None,
+    purpose: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    resource_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """Build one outbox row (for enqueue() or an RPC's p_notifications)."""
+    row = {
+        "channel": channel, "recipient": recipient, "message": message, "hospital_id": hospital_id,
+        "subject": subject, "message_html": message_html, "purpose": purpose,
+        "resource_type": resource_type, "resource_id": resource_id,
+    }
+    return {k: v for k, v in row.items() if v is not None}
+
+
+def enqueue(rows: List[Dict[str, Any]]) -> int:
+    """Insert outbox rows outside of a booking transaction."""
+    if not rows:
+        return 0
+    supabase = get_supabase()
+    if not supabase:
+        logger.error(f"❌ Supabase not available, dropping {len(rows)} notifications")
+        return 0
+    res = supabase.table(TABLE).insert(rows).execute()
+    wake()
+    return len(res.data or [])
+
+
+def wake():
+    """Start the next drain right away instead of at the next poll (thread-safe)."""
+    if _loop and _wake_event and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_wake_event.set)
+
+
+def backoff_seconds(attempts: int) -> float:
+    delay = min(settings.OUTBOX_BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), settings.OUTBOX_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def poll_delay(failures: int) -> float:
+    """Seconds until the next drain after `failures` failed drains in a row."""
+    if not failures:
+        return settings.OUTBOX_POLL_SECONDS
+    return min(settings.OUTBOX_POLL_SECONDS * 2 ** failures, settings.OUTBOX_BACKOFF_MAX_SECONDS)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _claim_via_queries(worker: str, limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+    """Fallback claim: optimistic update guarded by the attempts counter."""
+    supabase = get_supabase()
+    now = _now().isoformat()
+    due = supabase.table(TABLE).select("*").or_(
+        f"and(status.eq.pending,next_attempt_at.lte.{now}),and(status.eq.processing,locked_until.lt.{now})"
+    ).order("next_attempt_at").limit(limit).execute().data or []
+    claimed = []
+    for row in due:
+        res = supabase.table(TABLE).update({
+            "status": "processing",
+            "locked_by": worker,
+            "locked_until": (_now() + timedelta(seconds=lease_seconds)).isoformat(),
+            "attempts": row["attempts"] + 1,
+        }).eq("id", row["id"]).eq("attempts", row["attempts"]).execute()
+        if res.data:
+            claimed.append(res.data[0])
+    return claimed
+
+
+def claim(worker: str = WORKER_ID, limit: Optional[int] = None, lease_seconds: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Lease up to `limit` due rows to this worker."""
+    global _claim_rpc_available
+    supabase = get_supabase()
+    if not supabase:
+        return []
+    limit = limit or settings.OUTBOX_BATCH_SIZE
+    lease_seconds = lease_seconds or settings.OUTBOX_LEASE_SECONDS
+    if _claim_rpc_available:
+        try:
+            return supabase.rpc("claim_notifications", {
+                "p_worker": worker, "p_limit": limit, "p_lease_seconds": lease_seconds
+            }).execute().data or []
+        except APIError as e:
+            if e.code != "PGRST202":
+                raise
+            logger.warning("claim_notifications RPC not found, falling back to optimistic claims")
+            _claim_rpc_available = False
+    return _claim_via_queries(worker, limit, lease_seconds)
+
+
+def _finish(row: Dict[str, Any], update: Dict[str, Any]):
+    # Only the current lease holder may record the outcome
+    get_supabase().table(TABLE).update(update).eq("id", row["id"]).eq(
+        "locked_by", row["locked_by"]
+    ).eq("attempts", row["attempts"]).execute()
+
+
+def mark_sent(row: Dict[str, Any]):
+    _finish(row, {"status": "sent", "sent_at": _now().isoformat(), "locked_until": None, "last_error": None})
+
+
+def mark_failed(row: Dict[str, Any], error: Optional[str]) -> str:
+    """Reschedule with backoff, or give up after max_attempts. Returns the new status."""
+    if row["attempts"] >= row.get("max_attempts", settings.OUTBOX_MAX_ATTEMPTS):
+        status = "dead"
+        update = {"status": status, "locked_until": None, "last_error": error}
+    else:
+        status = "pending"
+        update = {
+            "status": status,
+            "locked_until": None,
+            "last_error": error,
+            "next_attempt_at": (_now() + timedelta(seconds=backoff_seconds(row["attempts"]))).isoformat(),
+        }
+    _finish(row, update)
+    return status
+
+
+def deliver(row: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+    """Send one outbox row over its channel."""
+    if row["channel"] == "whatsapp":
+        # Hospital's transport; a full Selenium send queue raises and backs off
+        ok = send_message(row["hospital_id"], row["recipient"], row["message"])
+        return ok, None if ok else "WhatsApp send failed"
+    if row["channel"] == "email":
+        from services.email_service import send_email
+        ok = asyncio.run(send_email(
+            to_email=row["recipient"],
+            subject=row.get("subject") or "",
+            body_text=row["message"],
+            body_html=row.get("message_html"),
+            hospital_id=row.get("hospital_id")
+        ))
+        return ok, None if ok else "Email send failed"
+    return False, f"Unknown channel {row['channel']}"
+
+
+def process_row(row: Dict[str, Any], delivery: Optional[Delivery] = None) -> str:
+    """Deliver one leased row and record the outcome. Returns the row's new status."""
+    try:
+        ok, error = (delivery or deliver)(row)
+    except Exception as e:
+        ok, error = False, str(e)
+    try:
+        if ok:
+            mark_sent(row)
+            _count("sent")
+            return "sent"
+        status = mark_failed(row, error)
+        _count("dead" if status == "dead" else "retried")
+        if status == "dead":
+            logger.error(f"❌ Notification {row['id']} ({row['channel']} to {row['recipient']}) gave up after {row['attempts']} attempts: {error}")
+        return status
+    except Exception as e:
+        # The lease expires and the row is claimed again
+        logger.error(f"❌ Could not record outcome of notification {row['id']}: {e}")
+        return "processing"
+
+
+def get_outbox_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return dict(_stats, worker=WORKER_ID)
+
+
+async def run_outbox_worker(delivery: Optional[Delivery] = None):
+    """Background loop: claim and deliver due notifications until cancelled."""
+    global _loop, _wake_event
+    _loop = asyncio.get_running_loop()
+    _wake_event = asyncio.Event()
+    pool = ThreadPoolExecutor(max_workers=settings.OUTBOX_WORKERS, thread_name_prefix="outbox")
+    failures = 0
+    try:
+        while True:
+            rows: List[Dict[str, Any]] = []
+            try:
+                rows = await asyncio.to_thread(claim)
+                failures = 0
+                if rows:
+                    with _stats_lock:
+                        _stats["claimed"] += len(rows)
+                        _stats["batches"] += 1
+                        _stats["last_batch_at"] = _now().isoformat()
+                    await asyncio.gather(*(_loop.run_in_executor(pool, process_row, row, delivery) for row in rows))
+            except Exception as e:
+                failures += 1
+                if isinstance(e, APIError) and e.code in _MISSING_SCHEMA_CODES:
+                    if failures == 1:
+                        logger.warning(f"⚠️ Outbox table not found (apply database/notification_outbox.sql), backing off: {e}")
+                else:
+                    logger.error(f"❌ Outbox drain failed: {e}")
+            if len(rows) >= settings.OUTBOX_BATCH_SIZE:
+                continue
+            _wake_event.clear()
+            try:
+                await asyncio.wait_for(_wake_event.wait(), timeout=poll_delay(failures))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        _loop = _wake_event = None
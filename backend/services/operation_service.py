@@ -1,9 +1,17 @@
+import logging
 from typing import Dict, Any, List
 from datetime import date
 from fastapi import HTTPException
+from postgrest.exceptions import APIError
 from core.database import get_supabase
+from services import entity_cache, notification_outbox
+from services.message_templates import get_confirmation_message
+
+logger = logging.getLogger(__name__)
 
 class OperationService:
+    _booking_rpc_available = True
+
     @staticmethod
     def _get_db():
         return get_supabase()
@@ -16,10 +24,9 @@ class OperationService:
             raise HTTPException(status_code=400, detail="Cannot book operation for past dates")
 
         # Verify doctor
-        doctor_result = supabase.table("doctors").select("*").eq("id", operation_data["doctor_id"]).eq("is_active", True).execute()
-        if not doctor_result.data:
+        doctor = entity_cache.get_doctor(operation_data["doctor_id"])
+        if not doctor or not doctor.get("is_active"):
             raise HTTPException(status_code=404, detail="Doctor not found")
-        doctor = doctor_result.data[0]
 
         hospital_id = doctor.get("hospital_id")
         user_hospital_id = current_user.get("hospital_id")
@@ -31,11 +38,63 @@ class OperationService:
             raise HTTPException(status_code=400, detail="Doctor does not belong to your selected hospital")
 
         # Verify hospital is approved
-        hospital_result = supabase.table("hospitals").select("*").eq("id", hospital_id).execute()
-        if not hospital_result.data or hospital_result.data[0].get("status") != "approved":
+        hospital = entity_cache.get_hospital(hospital_id)
+        if not hospital or hospital.get("status") != "approved":
             raise HTTPException(status_code=400, detail="Cannot book operation with unapproved hospital")
-        hospital = hospital_result.data[0]
 
+        notifications = cls._booking_notifications(operation_data, current_user, doctor, hospital)
+        db_op = None
+        if cls._booking_rpc_available:
+            try:
+                res = supabase.rpc("book_operation", {
+                    "p_patient_id": current_user["id"],
+                    "p_doctor_id": operation_data["doctor_id"],
+                    "p_hospital_id": hospital_id,
+                    "p_specialty": str(operation_data.get("specialty")),
+                    "p_operation_date": str(operation_data["date"]),
+                    "p_notes": operation_data.get("notes"),
+                    "p_notifications": notifications
+                }).execute()
+                db_op = res.data
+            except APIError as e:
+                if e.code != "PGRST202":
+                    raise
+                # book_operation() not deployed yet; insert, then enqueue separately
+                logger.warning("book_operation RPC not found, falling back to client-side booking")
+                cls._booking_rpc_available = False
+        if db_op is None:
+            db_op = cls._book_via_queries(operation_data, current_user, hospital_id, notifications)
+        elif notifications:
+            notification_outbox.wake()
+
+        return {
+            "operation": db_op,
+            "hospital": hospital,
+            "doctor": doctor
+        }
+
+    @classmethod
+    def _booking_notifications(cls, operation_data: Dict[str, Any], current_user: Dict[str, Any], doctor: Dict[str, Any], hospital: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not (hospital.get("whatsapp_enabled") == "true" or hospital.get("whatsapp_enabled") is True):
+            return []
+        if not current_user.get("mobile"):
+            return []
+        msg = get_confirmation_message(
+            patient_name=current_user.get("name", ""),
+            doctor_name=doctor.get("name", ""),
+            date=str(operation_data["date"]),
+            time_slot=None,
+            hospital_name=hospital.get("name", ""),
+            specialty=str(operation_data.get("specialty")),
+            custom_template=hospital.get("whatsapp_confirmation_template")
+        )
+        return [notification_outbox.notification(
+            "whatsapp", current_user["mobile"], msg, hospital_id=hospital["id"], purpose="Operation confirmation"
+        )]
+
+    @classmethod
+    def _book_via_queries(cls, operation_data: Dict[str, Any], current_user: Dict[str, Any], hospital_id: int, notifications: List[Dict[str, Any]]) -> Dict[str, Any]:
+        supabase = cls._get_db()
         operation_record = {
             "patient_id": current_user["id"],
             "specialty": str(operation_data.get("specialty")),
@@ -49,14 +108,16 @@ class OperationService:
         result = supabase.table("operations").insert(operation_record).execute()
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to create operation")
-        
         db_op = result.data[0]
 
-        return {
-            "operation": db_op,
-            "hospital": hospital,
-            "doctor": doctor
-        }
+        # Not atomic with the insert: a crash here loses the notification, never the booking
+        try:
+            notification_outbox.enqueue([
+                dict(n, resource_type="operation", resource_id=db_op["id"]) for n in notifications
+            ])
+        except Exception as e:
+            logger.error(f"Failed to enqueue notifications for operation {db_op['id']}: {e}")
+        return db_op
 
     @classmethod
     def get_patient_operations(cls, patient_id: int) -> List[Dict[str, Any]]:
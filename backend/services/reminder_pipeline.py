@@ -0,0 +1,291 @@
+"""
+Reminder pipeline for the scheduled WhatsApp jobs.
+
+Each run does the following:
+1. Page through the day's confirmed rows (keyset on id, with only the columns
+   a message needs, including patient and doctor names via embedded selects).
+2. Group the rows by hospital.
+3. Send each hospital's messages as one batch through its WhatsApp
+   transport, with several hospitals handled in parallel
+   (REMINDER_MAX_PARALLEL_HOSPITALS).
+4. Write the audit events in bulk.
+
+Each run returns ReminderRunMetrics, which is also logged.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from core.config import settings
+from core.database import get_supabase
+from services import entity_cache
+from services.audit_logger import log_audit_events_bulk, message_send_audit_row
+from services.whatsapp_transports import get_transport
+from services.message_templates import (
+    get_followup_message,
+    get_operation_reminder_message,
+    get_reminder_message,
+)
+
+logger = logging.getLogger(__name__)
+
+Sender = Callable[[int, str, str], bool]
+
+
+@dataclass(frozen=True)
+class ReminderKind:
+    name: str
+    table: str
+    date_column: str
+    patient_column: str
+    columns: str
+    purpose: str
+    # Day of the rows relative to the run date (follow-ups look at yesterday)
+    day_offset: int = 0
+
+
+APPOINTMENT_REMINDER = ReminderKind(
+    name="appointment_reminder",
+    table="appointments",
+    date_column="date",
+    patient_column="user_id",
+    columns="id, date, time_slot, hospital_id, user_id, users(name, mobile), doctors(name)",
+    purpose="Appointment reminder",
+)
+OPERATION_REMINDER = ReminderKind(
+    name="operation_reminder",
+    table="operations",
+    date_column="operation_date",
+    patient_column="patient_id",
+    columns="id, operation_date, specialty, hospital_id, patient_id, users!patient_id(name, mobile), doctors(name)",
+    purpose="Operation reminder",
+)
+APPOINTMENT_FOLLOWUP = ReminderKind(
+    name="appointment_followup",
+    table="appointments",
+    date_column="date",
+    patient_column="user_id",
+    columns="id, date, followup_date, hospital_id, user_id, users(name, mobile), doctors(name)",
+    purpose="Appointment follow-up",
+    day_offset=-1,
+)
+
+
+@dataclass
+class ReminderRunMetrics:
+    kind: str
+    day: str
+    pages: int = 0
+    fetched: int = 0
+    hospitals: int = 0
+    sent: int = 0
+    failed: int = 0
+    skipped: int = 0
+    audit_rows: int = 0
+    fetch_seconds: float = 0.0
+    send_seconds: float = 0.0
+    duration_seconds: float = 0.0
+    messages_per_second: float = 0.0
+    per_hospital: Dict[int, Dict[str, int]] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+last_run_metrics: Dict[str, Dict[str, Any]] = {}
+
+
+def _whatsapp_enabled(hospital: Dict[str, Any]) -> bool:
+    return hospital.get("whatsapp_enabled") == "true" or hospital.get("whatsapp_enabled") is True
+
+
+def iter_confirmed_rows(kind: ReminderKind, day: str, page_size: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Yield pages of confirmed rows for one day, ordered by id."""
+    supabase = get_supabase()
+    if not supabase:
+        return
+    page_size = page_size or settings.REMINDER_PAGE_SIZE
+    last_id = 0
+    while True:
+        page = supabase.table(kind.table).select(kind.columns).eq(
+            kind.date_column, day
+        ).eq("status", "confirmed").gt("id", last_id).order("id").limit(page_size).execute().data or []
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+
+def build_message(kind: ReminderKind, row: Dict[str, Any], hospital: Dict[str, Any]) -> Optional[str]:
+    """Render the hospital's template for one row, or None if there is nothing to send."""
+    patient_name = (row.get("users") or {}).get("name") or "Patient"
+    doctor_name = (row.get("doctors") or {}).get("name") or ""
+    hospital_name = hospital.get("name", "")
+    if kind is APPOINTMENT_REMINDER:
+        return get_reminder_message(
+            patient_name, doctor_name, str(row["date"]), row.get("time_slot") or "", hospital_name,
+            custom_template=hospital.get("whatsapp_reminder_template")
+        )
+    if kind is OPERATION_REMINDER:
+        return get_operation_reminder_message(
+            patient_name, doctor_name, str(row["operation_date"]), hospital_name,
+            specialty=row.get("specialty"),
+            custom_template=hospital.get("whatsapp_reminder_template")
+        )
+    if kind is APPOINTMENT_FOLLOWUP:
+        if not row.get("followup_date"):
+            return None
+        return get_followup_message(
+            patient_name, doctor_name, str(row["followup_date"]), hospital_name,
+            custom_template=hospital.get("whatsapp_followup_template")
+        )
+    raise ValueError(f"Unknown reminder kind {kind.name}")
+
+
+def _send_all(hospital: Dict[str, Any], hospital_id: int, items: List[tuple], sender: Optional[Sender]) -> List[tuple]:
+    """(ok, error) per (row, mobile, message) item."""
+    if sender is None:
+        # The hospital's transport: Selenium sends queue up, Cloud API sends go out concurrently
+        try:
+            results = get_transport(hospital).send_batch(hospital_id, [(mobile, message) for _, mobile, message in items])
+            return [(ok, None) for ok in results]
+        except Exception as e:
+            logger.error(f"❌ Batch send failed for hospital {hospital_id}: {e}")
+            return [(False, str(e))] * len(items)
+    outcomes = []
+    for row, mobile, message in items:
+        try:
+            outcomes.append((sender(hospital_id, mobile, message), None))
+        except Exception as e:
+            outcomes.append((False, str(e)))
+            logger.error(f"Error sending reminder for row {row.get('id')}: {e}")
+    return outcomes
+
+
+def _dispatch_hospital(kind: ReminderKind, hospital_id: int, rows: List[Dict[str, Any]], sender: Optional[Sender] = None) -> Dict[str, Any]:
+    """Send one hospital's messages through its WhatsApp transport."""
+    counts = {"sent": 0, "failed": 0, "skipped": 0}
+    audit_rows = []
+    hospital = entity_cache.get_hospital(hospital_id) or {}
+    if not _whatsapp_enabled(hospital):
+        counts["skipped"] = len(rows)
+        return {"counts": counts, "audit_rows": audit_rows}
+
+    items = []
+    for row in rows:
+        patient = row.get("users") or {}
+        mobile = patient.get("mobile")
+        message = build_message(kind, row, hospital)
+        if not mobile or not message:
+            counts["skipped"] += 1
+            continue
+        items.append((row, mobile, message))
+
+    for (row, mobile, _), (ok, error) in zip(items, _send_all(hospital, hospital_id, items, sender)):
+        counts["sent" if ok else "failed"] += 1
+        audit_rows.append(message_send_audit_row(
+            user_id=row.get(kind.patient_column),
+            message_type="whatsapp",
+            recipient=mobile,
+            subject_or_purpose=kind.purpose,
+            success=ok,
+            error_message=error,
+            details={"resource_type": kind.table, "resource_id": row.get("id"), "hospital_id": hospital_id}
+        ))
+    return {"counts": counts, "audit_rows": audit_rows}
+
+
+def run_reminders(
+    kind: ReminderKind,
+    run_date: Optional[date] = None,
+    sender: Optional[Sender] = None,
+    max_parallel: Optional[int] = None
+) -> ReminderRunMetrics:
+    """Fetch, group, dispatch and audit one kind of reminder for one day."""
+    started = time.monotonic()
+    day = ((run_date or datetime.now().date()) + timedelta(days=kind.day_offset)).isoformat()
+    metrics = ReminderRunMetrics(kind=kind.name, day=day)
+
+    by_hospital: Dict[int, List[Dict[str, Any]]] = {}
+    for page in iter_confirmed_rows(kind, day):
+        metrics.pages += 1
+        metrics.fetched += len(page)
+        for row in page:
+            by_hospital.setdefault(row["hospital_id"], []).append(row)
+    metrics.fetch_seconds = round(time.monotonic() - started, 3)
+    metrics.hospitals = len(by_hospital)
+
+    audit_rows: List[Dict[str, Any]] = []
+    if by_hospital:
+        send_started = time.monotonic()
+        workers = max(1, min(max_parallel or settings.REMINDER_MAX_PARALLEL_HOSPITALS, len(by_hospital)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reminders") as pool:
+            futures = {
+                hospital_id: pool.submit(_dispatch_hospital, kind, hospital_id, rows, sender)
+                for hospital_id, rows in by_hospital.items()
+            }
+            for hospital_id, future in futures.items():
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"❌ Reminder dispatch failed for hospital {hospital_id}: {e}")
+                    result = {"counts": {"sent": 0, "failed": len(by_hospital[hospital_id]), "skipped": 0}, "audit_rows": []}
+                counts = result["counts"]
+                metrics.per_hospital[hospital_id] = counts
+                metrics.sent += counts["sent"]
+                metrics.failed += counts["failed"]
+                metrics.skipped += counts["skipped"]
+                audit_rows.extend(result["audit_rows"])
+        metrics.send_seconds = round(time.monotonic() - send_started, 3)
+
+    metrics.audit_rows = log_audit_events_bulk(audit_rows)
+    metrics.duration_seconds = round(time.monotonic() - started, 3)
+    attempted = metrics.sent + metrics.failed
+    if attempted and metrics.send_seconds:
+        metrics.messages_per_second = round(attempted / metrics.send_seconds, 2)
+
+    last_run_metrics[kind.name] = metrics.to_dict()
+    logger.info(
+        f"✅ {kind.purpose}s for {day}: {metrics.sent} sent, {metrics.failed} failed, "
+        f"{metrics.skipped} skipped across {metrics.hospitals} hospitals in {metrics.duration_seconds}s "
+        f"({metrics.messages_per_second} msg/s)"
+    )
+    return metrics
+
+
+def send_single_reminder(kind: ReminderKind, row_id: int, sender: Optional[Sender] = None) -> bool:
+    """Send one reminder now (used by per-appointment scheduled jobs)."""
+    supabase = get_supabase()
+    if not supabase:
+        return False
+    res = supabase.table(kind.table).select(kind.columns + ", status").eq("id", row_id).execute()
+    if not res.data or res.data[0].get("status") in ("cancelled", "completed"):
+        return False
+    row = res.data[0]
+    result = _dispatch_hospital(kind, row["hospital_id"], [row], sender)
+    log_audit_events_bulk(result["audit_rows"])
+    return result["counts"]["sent"] == 1
+
+
+def reminder_notification(kind: ReminderKind, row_id: int) -> Optional[Dict[str, Any]]:
+    """Outbox row for one reminder due now, or None if there is nothing to send."""
+    from services.notification_outbox import notification
+    supabase = get_supabase()
+    if not supabase:
+        return None
+    res = supabase.table(kind.table).select(kind.columns + ", status").eq("id", row_id).execute()
+    if not res.data or res.data[0].get("status") in ("cancelled", "completed"):
+        return None
+    row = res.data[0]
+    hospital = entity_cache.get_hospital(row["hospital_id"]) or {}
+    mobile = (row.get("users") or {}).get("mobile")
+    message = build_message(kind, row, hospital)
+    if not _whatsapp_enabled(hospital) or not mobile or not message:
+        return None
+    return notification(
+        "whatsapp", mobile, message, hospital_id=row["hospital_id"],
+        purpose=kind.purpose, resource_type=kind.table, resource_id=row_id
+    )
@@ -0,0 +1,267 @@
+"""
+Per-appointment reminder scheduling.
+
+Instead of sending every appointment reminder from one 9 AM job, each
+confirmed appointment gets its own one-time job (in the persistent
+scheduler job store), REMINDER_LEAD_HOURS before its time slot. That job
+store is the send-time index. It is updated incrementally: confirming an
+appointment adds its job, and cancelling or completing it removes the job.
+An hourly reconcile pass schedules anything that was missed, for example
+appointments confirmed while no scheduler was running.
+
+An appointment confirmed inside the lead window gets no job: its reminder
+goes straight into the notification outbox, which every worker drains.
+(A one-off job due within minutes, added by a worker that is not the
+scheduler leader, could otherwise miss its grace period.)
+
+Send times are spread out in two ways:
+- a deterministic per-appointment jitter of +/- REMINDER_JITTER_SECONDS;
+- a per-hospital cap of REMINDER_HOSPITAL_MAX_PER_MINUTE sends per minute.
+  Minute buckets are counted in Redis, or per process without it. When a
+  bucket is full the reminder moves to the next free minute, but never
+  past the appointment itself. Each appointment remembers its reservation,
+  so rescheduling or cancelling frees the minute again, and reconcile skips
+  appointments whose reminder is already scheduled or queued.
+"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Optional
+from zoneinfo import ZoneInfo
+from core.cache import TTLCache
+from core.config import settings
+from core.database import get_supabase
+from core.redis_store import get_redis, reset_redis
+
+logger = logging.getLogger(__name__)
+
+# Appointment dates and slots are local hospital time
+TIMEZONE = ZoneInfo("Asia/Kolkata")
+
+# Never send a reminder later than this before the appointment
+_MIN_NOTICE = timedelta(minutes=15)
+_BUCKET_KEY_PREFIX = "reminder_rate:"
+_RESERVATION_KEY_PREFIX = "reminder_reservation:"
+_BUCKET_TTL_SECONDS = 3 * 86400
+
+_local_buckets = TTLCache(max_entries=100000, ttl_seconds=_BUCKET_TTL_SECONDS)
+_local_reservations = TTLCache(max_entries=100000, ttl_seconds=_BUCKET_TTL_SECONDS)
+_local_lock = threading.Lock()
+
+
+def _slot_datetime(appointment: Dict[str, Any]) -> Optional[datetime]:
+    try:
+        day = date.fromisoformat(str(appointment["date"])[:10])
+        hours, minutes = str(appointment["time_slot"])[:5].split(":")
+        return datetime.combine(day, time(int(hours), int(minutes)), TIMEZONE)
+    except (KeyError, ValueError, TypeError):
+        return None
+
+
+def _jitter_seconds(appointment_id: int) -> int:
+    spread = settings.REMINDER_JITTER_SECONDS
+    if spread <= 0:
+        return 0
+    digest = hashlib.sha256(f"reminder:{appointment_id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % (2 * spread + 1) - spread
+
+
+def _reserve_bucket(hospital_id: int, minute: int) -> bool:
+    """Count one send in this hospital's minute bucket; False if the bucket is full."""
+    cap = settings.REMINDER_HOSPITAL_MAX_PER_MINUTE
+    if cap <= 0:
+        return True
+    key = f"{_BUCKET_KEY_PREFIX}{hospital_id}:{minute}"
+    client = get_redis()
+    if client:
+        try:
+            pipe = client.pipeline()
+            pipe.incr(key)
+            pipe.expire(key, _BUCKET_TTL_SECONDS)
+            count = pipe.execute()[0]
+            if count > cap:
+                client.decr(key)
+                return False
+            return True
+        except Exception as e:
+            logger.warning(f"Reminder rate bucket update failed: {e}")
+            reset_redis()
+    with _local_lock:
+        count = _local_buckets.get(key, 0)
+        if count >= cap:
+            return False
+        _local_buckets.set(key, count + 1)
+        return True
+
+
+def _release_bucket(hospital_id: int, minute: int):
+    key = f"{_BUCKET_KEY_PREFIX}{hospital_id}:{minute}"
+    client = get_redis()
+    if client:
+        try:
+            if client.decr(key) < 0:
+                client.delete(key)
+            return
+        except Exception as e:
+            logger.warning(f"Reminder rate bucket release failed: {e}")
+            reset_redis()
+    with _local_lock:
+        count = _local_buckets.get(key, 0)
+        if count > 1:
+            _local_buckets.set(key, count - 1)
+        else:
+            _local_buckets.delete(key)
+
+
+def _remember(appointment_id: int, hospital_id: int, minute: Optional[int], until: datetime):
+    """Record that this appointment's reminder is scheduled or queued (and which bucket it holds)."""
+    key = f"{_RESERVATION_KEY_PREFIX}{appointment_id}"
+    value = json.dumps({"hospital_id": hospital_id, "minute": minute})
+    ttl = max(60, int((until - datetime.now(TIMEZONE)).total_seconds()) + 3600)
+    client = get_redis()
+    if client:
+        try:
+            client.set(key, value, ex=ttl)
+            return
+        except Exception as e:
+            logger.warning(f"Reminder reservation write failed: {e}")
+            reset_redis()
+    _local_reservations.set(key, value)
+
+
+def _take_reservation(appointment_id: int) -> Optional[Dict[str, Any]]:
+    key = f"{_RESERVATION_KEY_PREFIX}{appointment_id}"
+    client = get_redis()
+    if client:
+        try:
+            pipe = client.pipeline()
+            pipe.get(key)
+            pipe.delete(key)
+            value = pipe.execute()[0]
+            return json.loads(value) if value else None
+        except Exception as e:
+            logger.warning(f"Reminder reservation read failed: {e}")
+            reset_redis()
+    with _local_lock:
+        value = _local_reservations.get(key)
+        _local_reservations.delete(key)
+    return json.loads(value) if value else None
+
+
+def _has_reservation(appointment_id: int) -> bool:
+    key = f"{_RESERVATION_KEY_PREFIX}{appointment_id}"
+    client = get_redis()
+    if client:
+        try:
+            return bool(client.exists(key))
+        except Exception as e:
+            logger.warning(f"Reminder reservation read failed: {e}")
+            reset_redis()
+    return _local_reservations.get(key) is not None
+
+
+def release_reservation(appointment_id: int):
+    """Forget an appointment's reminder and free the minute bucket it held."""
+    reservation = _take_reservation(appointment_id)
+    if reservation and reservation.get("minute") is not None:
+        _release_bucket(reservation["hospital_id"], reservation["minute"])
+
+
+def compute_send_time(appointment: Dict[str, Any], now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Pick (and reserve) the send time for one appointment. None if it is too
+    late for a reminder; `now` if it is already inside the lead window.
+    """
+    slot_at = _slot_datetime(appointment)
+    now = now or datetime.now(TIMEZONE)
+    if slot_at is None:
+        return None
+    latest = slot_at - _MIN_NOTICE
+    if latest <= now:
+        return None
+
+    target = slot_at - timedelta(hours=settings.REMINDER_LEAD_HOURS) + timedelta(seconds=_jitter_seconds(appointment["id"]))
+    if target <= now:
+        # Confirmed inside the lead window: the caller sends it right away
+        return now
+    target = min(target, latest)
+
+    minute = int(target.timestamp()) // 60
+    for shift in range(settings.REMINDER_MAX_SHIFT_MINUTES + 1):
+        candidate = target + timedelta(minutes=shift)
+        if candidate > latest:
+            break
+        if _reserve_bucket(appointment["hospital_id"], minute + shift):
+            _remember(appointment["id"], appointment["hospital_id"], minute + shift, slot_at)
+            return candidate
+    logger.warning(f"⚠️ Reminder rate cap exhausted for hospital {appointment['hospital_id']}, sending appointment {appointment['id']} over cap")
+    _remember(appointment["id"], appointment["hospital_id"], None, slot_at)
+    return target
+
+
+def _enqueue_now(appointment: Dict[str, Any]) -> bool:
+    from services import notification_outbox, reminder_pipeline
+    row = reminder_pipeline.reminder_notification(reminder_pipeline.APPOINTMENT_REMINDER, appointment["id"])
+    if row is None or not notification_outbox.enqueue([row]):
+        return False
+    slot_at = _slot_datetime(appointment) or datetime.now(TIMEZONE)
+    _remember(appointment["id"], appointment["hospital_id"], None, slot_at)
+    return True
+
+
+def schedule_for_appointment(appointment: Dict[str, Any]) -> Optional[datetime]:
+    """Add/replace the reminder job for a confirmed appointment."""
+    from services import scheduler_service
+    if settings.REMINDER_LEAD_HOURS <= 0 or not scheduler_service.scheduler.running:
+        # The reconcile pass picks it up once a scheduler is running
+        return None
+    # Replacing: free the minute the previous schedule held
+    release_reservation(appointment["id"])
+    now = datetime.now(TIMEZONE)
+    send_at = compute_send_time(appointment, now=now)
+    if send_at is None:
+        scheduler_service.cancel_one_time_reminder(appointment["id"])
+        return None
+    if send_at <= now:
+        scheduler_service.cancel_one_time_reminder(appointment["id"])
+        return send_at if _enqueue_now(appointment) else None
+    scheduler_service.schedule_one_time_reminder(appointment["id"], send_at)
+    return send_at
+
+
+def cancel_for_appointment(appointment_id: int):
+    from services import scheduler_service
+    release_reservation(appointment_id)
+    if scheduler_service.scheduler.running:
+        scheduler_service.cancel_one_time_reminder(appointment_id)
+
+
+def reconcile_upcoming(days: int = 2, page_size: int = 500) -> int:
+    """Schedule reminders for upcoming confirmed appointments that have none scheduled or queued yet."""
+    from services import scheduler_service
+    supabase = get_supabase()
+    if not supabase or settings.REMINDER_LEAD_HOURS <= 0:
+        return 0
+    today = datetime.now(TIMEZONE).date()
+    scheduled = 0
+    last_id = 0
+    while True:
+        page = supabase.table("appointments").select("id, date, time_slot, hospital_id").eq(
+            "status", "confirmed"
+        ).gte("date", today.isoformat()).lte("date", (today + timedelta(days=days - 1)).isoformat()).gt(
+            "id", last_id
+        ).order("id").limit(page_size).execute().data or []
+        for apt in page:
+            if _has_reservation(apt["id"]):
+                continue
+            if scheduler_service.scheduler.get_job(f"reminder_{apt['id']}") is None:
+                if schedule_for_appointment(apt):
+                    scheduled += 1
+        if len(page) < page_size:
+            break
+        last_id = page[-1]["id"]
+    if scheduled:
+        logger.info(f"✅ Scheduled {scheduled} missing appointment reminders")
+    return scheduled
@@ -0,0 +1,75 @@
+from typing import Dict, Any, Optional
+import logging
+from fastapi import HTTPException
+from core.cache import TTLCache
+from core.config import settings
+from core.database import get_supabase
+from core.schedule import DEFAULT_GRID, SlotGrid, compile_schedule
+
+logger = logging.getLogger(__name__)
+
+class ScheduleService:
+    """Resolves and caches the compiled slot grid for each doctor."""
+
+    _grids = TTLCache(max_entries=settings.SCHEDULE_CACHE_MAX_ENTRIES, ttl_seconds=settings.SCHEDULE_CACHE_TTL_SECONDS)
+
+    @staticmethod
+    def _get_db():
+        return get_supabase()
+
+    @classmethod
+    def get_grid(cls, doctor_id: int) -> SlotGrid:
+        grid = cls._grids.get(doctor_id)
+        if grid is not None:
+            return grid
+
+        supabase = cls._get_db()
+        if not supabase:
+            return DEFAULT_GRID
+        try:
+            res = supabase.table("doctors").select("schedule, hospitals(schedule)").eq("id", doctor_id).execute()
+        except Exception as e:
+            # Missing schedule columns or a transient error: default hours, cached briefly
+            logger.warning(f"Using default schedule for doctor {doctor_id}: {e}")
+            cls._grids.set(doctor_id, DEFAULT_GRID, ttl_seconds=settings.SCHEDULE_CACHE_ERROR_TTL_SECONDS)
+            return DEFAULT_GRID
+
+        grid = DEFAULT_GRID
+        if res.data:
+            row = res.data[0]
+            hospital = row.get("hospitals") or {}
+            try:
+                grid = compile_schedule(hospital.get("schedule"), row.get("schedule"))
+            except Exception as e:
+                # A malformed stored schedule won't fix itself: cache the default hours
+                logger.warning(f"Invalid schedule for doctor {doctor_id}, using defaults: {e}")
+        cls._grids.set(doctor_id, grid)
+        return grid
+
+    @classmethod
+    def invalidate(cls, doctor_id: Optional[int] = None):
+        if doctor_id is None:
+            cls._grids.clear()
+        else:
+            cls._grids.delete(doctor_id)
+
+    @staticmethod
+    def validate(schedule: Dict[str, Any]) -> SlotGrid:
+        try:
+            grid = compile_schedule(schedule)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid schedule: {e}")
+        if not grid.slots:
+            raise HTTPException(status_code=400, detail="Schedule does not produce any slots")
+        return grid
+
+    @classmethod
+    def update_hospital_schedule(cls, hospital_id: int, schedule: Dict[str, Any]) -> Dict[str, Any]:
+        grid = cls.validate(schedule)
+        supabase = cls._get_db()
+        res = supabase.table("hospitals").update({"schedule": schedule}).eq("id", hospital_id).execute()
+        if not res.data:
+            raise HTTPException(status_code=404, detail="Hospital not found")
+        # Every doctor of the hospital may inherit this schedule
+        cls.invalidate()
+        return {"hospital_id": hospital_id, "slots": list(grid.slots)}
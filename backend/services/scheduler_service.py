@@ -1,25 +1,68 @@
 """
 Background scheduler for sending WhatsApp reminders and follow-ups
 Uses APScheduler for reliable background job execution
+
+Jobs live in a persistent job store (SCHEDULER_JOBSTORE_URL) so one-time
+reminders survive restarts. Every worker starts the scheduler paused, which
+still lets it add jobs to the shared store; only the worker that wins leader
+election (services/leader_election.py) resumes it and executes jobs.
+
+APScheduler only wakes for jobs added through its own instance, so a job a
+follower adds would otherwise wait until the leader's next known run time
+and could miss its grace period. The leader therefore re-reads the store
+every SCHEDULER_POLL_SECONDS via the poll_job_store job.
 """
+import asyncio
 import os
 from datetime import datetime, timedelta
 from typing import Optional
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.schedulers.base import STATE_PAUSED, STATE_RUNNING
+from apscheduler.jobstores.base import JobLookupError
 from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
+from core.config import settings
 from core.database import get_supabase
-from services.audit_logger import log_message_send
+from services import reminder_pipeline
 from services.error_monitoring import capture_exception
+from services.leader_election import FileLeaderLock, RedisLeaderLock
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def _build_jobstore(url: str):
+    """Job store for SCHEDULER_JOBSTORE_URL; falls back to memory if its driver is missing."""
+    if url == "memory":
+        return MemoryJobStore()
+    try:
+        if url.startswith(("redis://", "rediss://", "unix://")):
+            from apscheduler.jobstores.redis import RedisJobStore
+            from redis.connection import parse_url
+            connect_args = parse_url(url)
+            return RedisJobStore(db=connect_args.pop("db", 0), **connect_args)
+        from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+        return SQLAlchemyJobStore(url=url, tablename="apscheduler_jobs")
+    except ImportError as e:
+        logger.error(f"❌ Job store driver for {url.split(':')[0]} not installed ({e}); jobs will not survive restarts")
+        return MemoryJobStore()
+
+
+def _build_leader_lock():
+    backend = settings.SCHEDULER_LEADER_BACKEND
+    if backend == "auto":
+        shared = not settings.SCHEDULER_JOBSTORE_URL.startswith(("sqlite", "memory"))
+        backend = "redis" if shared else "file"
+    if backend == "redis":
+        return RedisLeaderLock("scheduler", settings.SCHEDULER_LEADER_TTL_SECONDS)
+    return FileLeaderLock(settings.SCHEDULER_LOCK_FILE)
+
+
 # Configure scheduler
 jobstores = {
-    'default': MemoryJobStore()
+    'default': _build_jobstore(settings.SCHEDULER_JOBSTORE_URL)
 }
 executors = {
     'default': ThreadPoolExecutor(20)
@@ -37,13 +80,15 @@ scheduler = AsyncIOScheduler(
     timezone='Asia/Kolkata'
 )
 
+leader_lock = _build_leader_lock()
+
 
 def start_scheduler():
-    """Start the scheduler"""
+    """Start the scheduler (paused until this worker becomes leader)"""
     try:
         if not scheduler.running:
-            scheduler.start()
-            logger.info("✅ Background scheduler started")
+            scheduler.start(paused=True)
+            logger.info("✅ Background scheduler started (waiting for leadership)")
             
             # Add scheduled jobs
             add_scheduled_jobs()
@@ -63,6 +108,30 @@ def shutdown_scheduler():
     except Exception as e:
         logger.error(f"❌ Error shutting down scheduler: {e}")
         capture_exception(e)
+    finally:
+        leader_lock.release()
+
+
+def update_leadership(is_leader: bool):
+    """Resume job execution on the leader, pause it everywhere else"""
+    if is_leader and scheduler.state == STATE_PAUSED:
+        scheduler.resume()
+        logger.info("👑 This worker is now the scheduler leader")
+    elif not is_leader and scheduler.state == STATE_RUNNING:
+        scheduler.pause()
+        logger.warning("⚠️ Lost scheduler leadership, pausing job execution")
+
+
+async def run_leader_election(interval_seconds: Optional[float] = None):
+    """Background loop: acquire/renew the leader lock well within its TTL"""
+    interval = interval_seconds or max(1, settings.SCHEDULER_LEADER_TTL_SECONDS / 3)
+    while True:
+        try:
+            update_leadership(await asyncio.to_thread(leader_lock.acquire_or_renew))
+        except Exception as e:
+            logger.error(f"❌ Scheduler leader election failed: {e}")
+            update_leadership(False)
+        await asyncio.sleep(interval)
 
 
 def add_scheduled_jobs():
@@ -86,149 +155,68 @@ def add_scheduled_jobs():
             replace_existing=True
         )
         
-        # Check pending messages - runs every hour
+        # Backfill per-appointment reminder jobs - runs every hour
         scheduler.add_job(
-            process_pending_messages,
+            index_upcoming_reminders,
             trigger=IntervalTrigger(hours=1),
-            id='process_pending_messages',
-            name='Process pending WhatsApp messages',
+            id='index_upcoming_reminders',
+            name='Schedule missing appointment reminders',
+            next_run_time=datetime.now(scheduler.timezone) + timedelta(minutes=1),
             replace_existing=True
         )
         
+        # Wakes the leader so it sees jobs added by other workers in time
+        scheduler.add_job(
+            poll_job_store,
+            trigger=IntervalTrigger(seconds=settings.SCHEDULER_POLL_SECONDS),
+            id='poll_job_store',
+            name='Pick up jobs added by other workers',
+            replace_existing=True
+        )
+        
+        # Pending WhatsApp messages are now delivered by the notification outbox
+        try:
+            scheduler.remove_job('process_pending_messages')
+        except JobLookupError:
+            pass
+        
         logger.info("✅ Scheduled jobs added to scheduler")
     except Exception as e:
         logger.error(f"❌ Failed to add scheduled jobs: {e}")
         capture_exception(e)
 
 
+def poll_job_store():
+    """No-op; running it makes the leader re-read the shared job store"""
+
+
 def send_daily_reminders():
     """Send reminders for appointments/operations scheduled for today"""
     try:
-        supabase = get_supabase()
-        if not supabase:
+        if not get_supabase():
             logger.warning("⚠️ Supabase not available, skipping reminders")
             return
-        
-        today = datetime.now().date().isoformat()
-        
-        # Get appointments scheduled for today
-        appointments = supabase.table("appointments").select("*").eq("date", today).eq("status", "confirmed").execute()
-        
-        if appointments.data:
-            from services.whatsapp_service import send_appointment_reminder
-            for apt in appointments.data:
-                try:
-                    send_appointment_reminder(apt)
-                    log_message_send(
-                        user_id=apt.get("patient_id"),
-                        message_type="whatsapp",
-                        recipient=apt.get("patient_mobile", ""),
-                        subject_or_purpose="Appointment reminder",
-                        success=True
-                    )
-                except Exception as e:
-                    logger.error(f"Error sending reminder for appointment {apt.get('id')}: {e}")
-                    log_message_send(
-                        user_id=apt.get("patient_id"),
-                        message_type="whatsapp",
-                        recipient=apt.get("patient_mobile", ""),
-                        subject_or_purpose="Appointment reminder",
-                        success=False,
-                        error_message=str(e)
-                    )
-        
-        # Get operations scheduled for today
-        operations = supabase.table("operations").select("*").eq("operation_date", today).eq("status", "confirmed").execute()
-        
-        if operations.data:
-            from services.whatsapp_service import send_operation_reminder
-            for op in operations.data:
-                try:
-                    send_operation_reminder(op)
-                    log_message_send(
-                        user_id=op.get("patient_id"),
-                        message_type="whatsapp",
-                        recipient=op.get("patient_mobile", ""),
-                        subject_or_purpose="Operation reminder",
-                        success=True
-                    )
-                except Exception as e:
-                    logger.error(f"Error sending reminder for operation {op.get('id')}: {e}")
-                    log_message_send(
-                        user_id=op.get("patient_id"),
-                        message_type="whatsapp",
-                        recipient=op.get("patient_mobile", ""),
-                        subject_or_purpose="Operation reminder",
-                        success=False,
-                        error_message=str(e)
-                    )
-        
-        logger.info(f"✅ Daily reminders processed: {len(appointments.data or [])} appointments, {len(operations.data or [])} operations")
+        if settings.REMINDER_LEAD_HOURS <= 0:
+            # Otherwise appointments get their own jobs (services/reminder_schedule.py)
+            reminder_pipeline.run_reminders(reminder_pipeline.APPOINTMENT_REMINDER)
+        reminder_pipeline.run_reminders(reminder_pipeline.OPERATION_REMINDER)
     except Exception as e:
         logger.error(f"❌ Error in send_daily_reminders: {e}")
         capture_exception(e)
 
 
 def send_follow_up_messages():
-    """Send follow-up messages for completed appointments/operations"""
+    """Send follow-up messages for yesterday's appointments"""
     try:
-        supabase = get_supabase()
-        if not supabase:
+        if not get_supabase():
             logger.warning("⚠️ Supabase not available, skipping follow-ups")
             return
-        
-        yesterday = (datetime.now() - timedelta(days=1)).date().isoformat()
-        
-        # Get completed appointments from yesterday
-        appointments = supabase.table("appointments").select("*").eq("date", yesterday).eq("status", "confirmed").execute()
-        
-        if appointments.data:
-            from services.whatsapp_service import send_follow_up
-            for apt in appointments.data:
-                try:
-                    send_follow_up(apt, "appointment")
-                    log_message_send(
-                        user_id=apt.get("patient_id"),
-                        message_type="whatsapp",
-                        recipient=apt.get("patient_mobile", ""),
-                        subject_or_purpose="Appointment follow-up",
-                        success=True
-                    )
-                except Exception as e:
-                    logger.error(f"Error sending follow-up for appointment {apt.get('id')}: {e}")
-        
-        logger.info(f"✅ Follow-up messages processed: {len(appointments.data or [])} appointments")
+        reminder_pipeline.run_reminders(reminder_pipeline.APPOINTMENT_FOLLOWUP)
     except Exception as e:
         logger.error(f"❌ Error in send_follow_up_messages: {e}")
         capture_exception(e)
 
 
-def process_pending_messages():
-    """Process pending WhatsApp messages"""
-    try:
-        supabase = get_supabase()
-        if not supabase:
-            return
-        
-        # Get pending messages from whatsapp_logs
-        pending = supabase.table("whatsapp_logs").select("*").eq("status", "pending").limit(50).execute()
-        
-        if pending.data:
-            from services.whatsapp_service import send_message
-            for msg in pending.data:
-                try:
-                    send_message(msg["recipient"], msg["message"])
-                    # Update status
-                    supabase.table("whatsapp_logs").update({"status": "sent"}).eq("id", msg["id"]).execute()
-                except Exception as e:
-                    logger.error(f"Error processing pending message {msg.get('id')}: {e}")
-                    # Update status to failed
-                    supabase.table("whatsapp_logs").update({"status": "failed", "error_message": str(e)}).eq("id", msg["id"]).execute()
-    except Exception as e:
-        logger.error(f"❌ Error in process_pending_messages: {e}")
-        capture_exception(e)
-
-
 def schedule_one_time_reminder(appointment_id: int, reminder_time: datetime):
     """Schedule a one-time reminder for a specific appointment"""
     try:
@@ -246,25 +234,32 @@ def schedule_one_time_reminder(appointment_id: int, reminder_time: datetime):
         capture_exception(e)
 
 
+def cancel_one_time_reminder(appointment_id: int):
+    """Remove a pending one-time reminder, if there is one"""
+    try:
+        scheduler.remove_job(f'reminder_{appointment_id}')
+        logger.info(f"✅ One-time reminder removed for appointment {appointment_id}")
+    except JobLookupError:
+        pass
+    except Exception as e:
+        logger.error(f"❌ Failed to remove reminder: {e}")
+        capture_exception(e)
+
+
+def index_upcoming_reminders():
+    """Schedule reminders for confirmed appointments that have no job yet"""
+    try:
+        from services import reminder_schedule
+        reminder_schedule.reconcile_upcoming()
+    except Exception as e:
+        logger.error(f"❌ Error in index_upcoming_reminders: {e}")
+        capture_exception(e)
+
+
 def send_single_reminder(appointment_id: int):
     """Send reminder for a specific appointment"""
     try:
-        supabase = get_supabase()
-        if not supabase:
-            return
-        
-        appointment = supabase.table("appointments").select("*").eq("id", appointment_id).execute()
-        if appointment.data:
-            apt = appointment.data[0]
-            from services.whatsapp_service import send_appointment_reminder
-            send_appointment_reminder(apt)
-            log_message_send(
-                user_id=apt.get("patient_id"),
-                message_type="whatsapp",
-                recipient=apt.get("patient_mobile", ""),
-                subject_or_purpose="Appointment reminder",
-                success=True
-            )
+        reminder_pipeline.send_single_reminder(reminder_pipeline.APPOINTMENT_REMINDER, appointment_id)
     except Exception as e:
         logger.error(f"❌ Error sending single reminder: {e}")
         capture_exception(e)
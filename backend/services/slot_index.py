@@ -0,0 +1,140 @@
+"""
+Slot Availability Index
+Per-(doctor, date) bitmap of booked slots so that available-slots lookups
+do not have to read the appointments table.
+
+Bit i of a mask is set when slot i of the doctor's SlotGrid (see
+core/schedule.py) is taken. Masks live in Redis (native bitmaps, shared by
+all workers) when it is reachable, otherwise in a short-lived process-local
+cache. Bookings and cancellations update the
+bitmap incrementally; a missing bitmap is rebuilt from appointments on the
+next lookup.
+
+Rebuilds only ever set bits (never clear them), so a rebuild racing with a
+booking cannot hide that booking; the worst case is a just-cancelled slot
+showing as taken until the entry expires (SLOT_INDEX_REDIS_TTL_SECONDS
+after it was created; writes do not extend it). Double-booking itself is
+prevented by the database (see database/booking_rpc.sql).
+"""
+import logging
+import threading
+from typing import Iterable, List, Optional
+from core.cache import TTLCache
+from core.config import settings
+from core.redis_store import get_redis, reset_redis
+from core.schedule import DEFAULT_GRID, SlotGrid
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "slot_bitmap:"
+# Redis bitmaps: offset 0 marks "loaded", slot i lives at offset i + 1
+_LOADED_OFFSET = 0
+# BITFIELD reads unsigned integers of at most 63 bits at a time
+_BITFIELD_CHUNK = 63
+
+_local = TTLCache(
+    max_entries=settings.SLOT_INDEX_MAX_ENTRIES,
+    ttl_seconds=settings.SLOT_INDEX_LOCAL_TTL_SECONDS
+)
+_local_lock = threading.Lock()
+
+
+def encode(slots: Iterable[str], grid: SlotGrid = DEFAULT_GRID) -> int:
+    mask = 0
+    for slot in slots:
+        bit = grid.index.get(slot)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def decode(mask: int, grid: SlotGrid = DEFAULT_GRID) -> List[str]:
+    return [slot for i, slot in enumerate(grid.slots) if mask >> i & 1]
+
+
+def free_slots(mask: int, grid: SlotGrid = DEFAULT_GRID) -> List[str]:
+    return [slot for i, slot in enumerate(grid.slots) if not mask >> i & 1]
+
+
+def _redis_key(doctor_id: int, date_str: str, grid: SlotGrid) -> str:
+    # The grid fingerprint keeps bitmaps from an older schedule from being misread
+    return f"{REDIS_KEY_PREFIX}{doctor_id}:{date_str}:{grid.fingerprint}"
+
+
+def _read_redis_bits(client, key: str, width: int) -> List[int]:
+    chunks = [(offset, min(_BITFIELD_CHUNK, width - offset)) for offset in range(0, width, _BITFIELD_CHUNK)]
+    op = client.bitfield(key)
+    for offset, size in chunks:
+        op = op.get(f"u{size}", offset)
+    bits = []
+    # BITFIELD returns each chunk with its first offset as the most significant bit
+    for (offset, size), value in zip(chunks, op.execute()):
+        bits.extend(value >> (size - 1 - j) & 1 for j in range(size))
+    return bits
+
+
+def get_mask(doctor_id: int, date_str: str, grid: SlotGrid = DEFAULT_GRID) -> Optional[int]:
+    """Return the booked-slot mask, or None if the index has no entry yet."""
+    client = get_redis()
+    if client:
+        try:
+            bits = _read_redis_bits(client, _redis_key(doctor_id, date_str, grid), len(grid.slots) + 1)
+            if not bits[_LOADED_OFFSET]:
+                return None
+            return sum(1 << i for i, bit in enumerate(bits[1:]) if bit)
+        except Exception as e:
+            logger.warning(f"Slot index Redis read failed: {e}")
+            reset_redis()
+    return _local.get((doctor_id, date_str, grid.fingerprint))
+
+
+def _set_bits(doctor_id: int, date_str: str, grid: SlotGrid, bits: Iterable[int], value: int, mark_loaded: bool):
+    bits = list(bits)
+    client = get_redis()
+    if client:
+        try:
+            key = _redis_key(doctor_id, date_str, grid)
+            pipe = client.pipeline()
+            if mark_loaded:
+                pipe.setbit(key, _LOADED_OFFSET, 1)
+            for bit in bits:
+                pipe.setbit(key, bit + 1, value)
+            # TTL is set once, when the key is created: a write must not keep a
+            # bitmap with a stale bit from a racing rebuild alive indefinitely
+            pipe.expire(key, settings.SLOT_INDEX_REDIS_TTL_SECONDS, nx=True)
+            pipe.execute()
+            return
+        except Exception as e:
+            logger.warning(f"Slot index Redis write failed: {e}")
+            reset_redis()
+
+    with _local_lock:
+        key = (doctor_id, date_str, grid.fingerprint)
+        mask = _local.get(key)
+        if mask is None:
+            if not mark_loaded:
+                # Nothing cached yet; the next lookup rebuilds from the database
+                return
+            mask = 0
+        for bit in bits:
+            mask = mask | (1 << bit) if value else mask & ~(1 << bit)
+        _local.set(key, mask)
+
+
+def load(doctor_id: int, date_str: str, booked_slots: Iterable[str], grid: SlotGrid = DEFAULT_GRID) -> int:
+    """Store a mask rebuilt from the database (merged with any concurrent bookings)."""
+    mask = encode(booked_slots, grid)
+    _set_bits(doctor_id, date_str, grid, (i for i in range(len(grid.slots)) if mask >> i & 1), 1, mark_loaded=True)
+    return mask
+
+
+def mark_booked(doctor_id: int, date_str: str, time_slot: str, grid: SlotGrid = DEFAULT_GRID):
+    bit = grid.index.get(time_slot)
+    if bit is not None:
+        _set_bits(doctor_id, date_str, grid, [bit], 1, mark_loaded=False)
+
+
+def mark_free(doctor_id: int, date_str: str, time_slot: str, grid: SlotGrid = DEFAULT_GRID):
+    bit = grid.index.get(time_slot)
+    if bit is not None:
+        _set_bits(doctor_id, date_str, grid, [bit], 0, mark_loaded=False)
@@ -0,0 +1,175 @@
+"""
+Token Revocation Service
+Answers "has this JWT been revoked?" without a database round-trip in the
+common case.
+
+- An in-process Bloom filter holds fingerprints of every live revoked token.
+  A negative answer is final, so valid tokens cost zero network I/O.
+- Revoked fingerprints are mirrored to Redis with a TTL equal to the token's
+  remaining lifetime; a Bloom positive is confirmed there (or against the
+  token_blacklist table when Redis is down) to rule out false positives.
+- The filter is rebuilt periodically from token_blacklist so revocations made
+  by other workers are picked up, and expired rows are purged at the same time.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+from core.config import settings
+from core.database import get_supabase, run_db
+from core.redis_store import get_redis, reset_redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "revoked_token:"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys (double hashing on SHA-256)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def token_fingerprint(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _remaining_seconds(expires_at: datetime) -> int:
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return int((expires_at - datetime.now(timezone.utc)).total_seconds())
+
+
+_lock = threading.Lock()
+_bloom = BloomFilter(settings.TOKEN_REVOCATION_BLOOM_CAPACITY)
+# fingerprint -> expiry timestamp, for revocations made by this process
+_local_revocations: Dict[str, float] = {}
+# Until the first successful rebuild the filter is incomplete, so it cannot answer "no"
+_loaded = False
+
+
+def revoke(token: str, expires_at: datetime):
+    """Record a revocation locally and in Redis. The caller persists the DB row."""
+    fingerprint = token_fingerprint(token)
+    ttl = _remaining_seconds(expires_at)
+    with _lock:
+        _bloom.add(fingerprint)
+        if ttl > 0:
+            _local_revocations[fingerprint] = datetime.now(timezone.utc).timestamp() + ttl
+
+    if ttl <= 0:
+        return
+    client = get_redis()
+    if client:
+        try:
+            client.set(REDIS_KEY_PREFIX + fingerprint, "1", ex=ttl)
+        except Exception as e:
+            logger.warning(f"Could not mirror token revocation to Redis: {e}")
+            reset_redis()
+
+
+def is_revoked(token: str) -> bool:
+    fingerprint = token_fingerprint(token)
+    if _loaded and fingerprint not in _bloom:
+        return False
+
+    client = get_redis()
+    if client:
+        try:
+            return bool(client.exists(REDIS_KEY_PREFIX + fingerprint))
+        except Exception as e:
+            logger.warning(f"Redis revocation lookup failed, falling back to database: {e}")
+            reset_redis()
+
+    supabase = get_supabase()
+    if not supabase:
+        # Bloom says "maybe" and we cannot confirm: fail closed.
+        return True
+    result = supabase.table("token_blacklist").select("id").eq("token", token).execute()
+    return bool(result.data)
+
+
+def refresh_from_database() -> int:
+    """Rebuild the Bloom filter from the unexpired rows of token_blacklist."""
+    supabase = get_supabase()
+    if not supabase:
+        return 0
+    now = datetime.now(timezone.utc).isoformat()
+    rows = supabase.table("token_blacklist").select("token, expires_at").gt("expires_at", now).execute().data or []
+
+    bloom = BloomFilter(max(settings.TOKEN_REVOCATION_BLOOM_CAPACITY, len(rows) * 2))
+    client = get_redis()
+    pipe = client.pipeline() if client else None
+    for row in rows:
+        fingerprint = token_fingerprint(row["token"])
+        bloom.add(fingerprint)
+        if pipe is not None:
+            ttl = _remaining_seconds(datetime.fromisoformat(row["expires_at"]))
+            if ttl > 0:
+                pipe.set(REDIS_KEY_PREFIX + fingerprint, "1", ex=ttl)
+    if pipe is not None:
+        try:
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not mirror revocations to Redis: {e}")
+            reset_redis()
+
+    global _bloom, _loaded
+    with _lock:
+        # Carry over revocations made by this process while the snapshot was read
+        now_ts = datetime.now(timezone.utc).timestamp()
+        for fingerprint, expires_ts in list(_local_revocations.items()):
+            if expires_ts <= now_ts:
+                del _local_revocations[fingerprint]
+            else:
+                bloom.add(fingerprint)
+        _bloom = bloom
+        _loaded = True
+    return len(rows)
+
+
+def purge_expired_tokens() -> int:
+    """Delete token_blacklist rows whose token has already expired."""
+    supabase = get_supabase()
+    if not supabase:
+        return 0
+    now = datetime.now(timezone.utc).isoformat()
+    result = supabase.table("token_blacklist").delete().lt("expires_at", now).execute()
+    purged = len(result.data or [])
+    if purged:
+        logger.info(f"🧹 Purged {purged} expired token_blacklist rows")
+    return purged
+
+
+async def run_revocation_maintenance(interval_seconds: Optional[int] = None):
+    """Background loop: periodically purge expired rows and rebuild the filter."""
+    interval = interval_seconds or settings.TOKEN_REVOCATION_REFRESH_SECONDS
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_db(purge_expired_tokens)
+            await run_db(refresh_from_database)
+        except Exception as e:
+            logger.error(f"❌ Token revocation maintenance failed: {e}")
@@ -2,6 +2,8 @@ from typing import Dict, Any, Optional
 from fastapi import HTTPException, status
 from core.database import get_supabase
 from core.security import get_password_hash, verify_password
+from services.auth_cache import invalidate_user, invalidate_token
+from services import token_revocation
 from datetime import datetime
 
 class UserService:
@@ -50,6 +52,7 @@ class UserService:
         # Update last login
         supabase = cls._get_db()
         supabase.table("users").update({"last_login_at": datetime.now().isoformat()}).eq("id", user["id"]).execute()
+        invalidate_user(user["id"])
         
         user.pop("password_hash", None)
         return user
@@ -57,10 +60,12 @@ class UserService:
     @classmethod
     def revoke_token(cls, token: str, expires_at: datetime):
         supabase = cls._get_db()
+        token_revocation.revoke(token, expires_at)
         supabase.table("token_blacklist").insert({
             "token": token,
             "expires_at": expires_at.isoformat()
         }).execute()
+        invalidate_token(token)
         
     @classmethod
     def increment_token_version(cls, user_id: int):
@@ -71,3 +76,4 @@ class UserService:
             user = supabase.table("users").select("token_version").eq("id", user_id).execute().data[0]
             new_v = (user.get("token_version") or 1) + 1
             supabase.table("users").update({"token_version": new_v}).eq("id", user_id).execute()
+        invalidate_user(user_id)
@@ -0,0 +1,173 @@
+"""
+Per-hospital WhatsApp send queue.
+
+Each hospital has one WhatsApp Web session, and a browser can only drive
+one chat at a time. Every send therefore goes through that hospital's FIFO
+queue, which a single dedicated worker thread drains. Sends for one
+hospital are serialized while different hospitals send in parallel.
+Callers get a Future and never touch the driver themselves.
+
+Backpressure: a queue holds at most WHATSAPP_QUEUE_MAX_DEPTH messages.
+submit() raises WhatsAppQueueFull beyond that. The outbox treats this as a
+failed attempt and retries later with backoff.
+
+An idle worker exits after WHATSAPP_QUEUE_IDLE_SECONDS and is restarted by
+the next submit().
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Sender = Callable[[int, str, str], bool]
+
+
+class WhatsAppQueueFull(Exception):
+    """The hospital's send queue is at WHATSAPP_QUEUE_MAX_DEPTH."""
+
+
+@dataclass
+class QueueMetrics:
+    enqueued: int = 0
+    sent: int = 0
+    failed: int = 0
+    rejected: int = 0
+    cancelled: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    send_seconds_total: float = 0.0
+    send_seconds_max: float = 0.0
+
+    def snapshot(self, depth: int) -> Dict[str, Any]:
+        done = self.sent + self.failed
+        return {
+            "depth": depth,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "avg_wait_seconds": round(self.wait_seconds_total / done, 3) if done else 0.0,
+            "max_wait_seconds": round(self.wait_seconds_max, 3),
+            "avg_send_seconds": round(self.send_seconds_total / done, 3) if done else 0.0,
+            "max_send_seconds": round(self.send_seconds_max, 3),
+        }
+
+
+@dataclass
+class _HospitalQueue:
+    jobs: "queue.Queue[Tuple[str, str, float, Future]]"
+    metrics: QueueMetrics = field(default_factory=QueueMetrics)
+    worker: Optional[threading.Thread] = None
+
+
+def _default_sender(hospital_id: int, mobile: str, message: str) -> bool:
+    # Imported lazily: Selenium is only needed on the worker that actually sends
+    from services.whatsapp_service import send_whatsapp_message_by_hospital_id
+    return send_whatsapp_message_by_hospital_id(hospital_id, mobile, message)
+
+
+class WhatsAppSendQueue:
+    def __init__(self, sender: Optional[Sender] = None, max_depth: Optional[int] = None, idle_seconds: Optional[float] = None):
+        self._sender = sender or _default_sender
+        self._max_depth = max_depth if max_depth is not None else settings.WHATSAPP_QUEUE_MAX_DEPTH
+        self._idle_seconds = idle_seconds if idle_seconds is not None else settings.WHATSAPP_QUEUE_IDLE_SECONDS
+        self._queues: Dict[int, _HospitalQueue] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, hospital_id: int, mobile: str, message: str) -> Future:
+        """Queue one message; the Future resolves to the send result (bool)."""
+        future: Future = Future()
+        with self._lock:
+            hq = self._queues.get(hospital_id)
+            if hq is None:
+                hq = self._queues[hospital_id] = _HospitalQueue(jobs=queue.Queue(maxsize=self._max_depth))
+            try:
+                hq.jobs.put_nowait((mobile, message, time.monotonic(), future))
+            except queue.Full:
+                hq.metrics.rejected += 1
+                raise WhatsAppQueueFull(f"WhatsApp queue for hospital {hospital_id} is full ({self._max_depth} messages)")
+            hq.metrics.enqueued += 1
+            if hq.worker is None or not hq.worker.is_alive():
+                hq.worker = threading.Thread(
+                    target=self._run, args=(hospital_id, hq), name=f"whatsapp-{hospital_id}", daemon=True
+                )
+                hq.worker.start()
+        return future
+
+    def send(self, hospital_id: int, mobile: str, message: str, timeout: Optional[float] = None) -> bool:
+        """Queue one message and wait for it.
+
+        If the message is still queued after `timeout` it is withdrawn and
+        TimeoutError is raised. A send already in progress is always waited
+        for, so a retry can never duplicate it.
+        """
+        future = self.submit(hospital_id, mobile, message)
+        timeout = timeout if timeout is not None else settings.WHATSAPP_QUEUE_SEND_TIMEOUT_SECONDS
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise TimeoutError(f"WhatsApp message for hospital {hospital_id} waited over {timeout}s in the queue")
+            return future.result()
+
+    def _run(self, hospital_id: int, hq: _HospitalQueue):
+        while True:
+            try:
+                mobile, message, enqueued_at, future = hq.jobs.get(timeout=self._idle_seconds)
+            except queue.Empty:
+                with self._lock:
+                    # submit() holds the lock while enqueueing, so nothing can slip in here
+                    if hq.jobs.empty():
+                        hq.worker = None
+                        return
+                continue
+            if not future.set_running_or_notify_cancel():
+                hq.metrics.cancelled += 1
+                continue
+            started = time.monotonic()
+            wait = started - enqueued_at
+            try:
+                ok = bool(self._sender(hospital_id, mobile, message))
+                future.set_result(ok)
+            except Exception as e:
+                ok = False
+                logger.error(f"WhatsApp send worker error for hospital {hospital_id}: {e}")
+                future.set_exception(e)
+            elapsed = time.monotonic() - started
+            m = hq.metrics
+            m.sent += ok
+            m.failed += not ok
+            m.wait_seconds_total += wait
+            m.wait_seconds_max = max(m.wait_seconds_max, wait)
+            m.send_seconds_total += elapsed
+            m.send_seconds_max = max(m.send_seconds_max, elapsed)
+
+    def depth(self, hospital_id: int) -> int:
+        hq = self._queues.get(hospital_id)
+        return hq.jobs.qsize() if hq else 0
+
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            return {
+                hospital_id: dict(hq.metrics.snapshot(hq.jobs.qsize()), worker_alive=bool(hq.worker and hq.worker.is_alive()))
+                for hospital_id, hq in self._queues.items()
+            }
+
+
+send_queue = WhatsAppSendQueue()
+
+
+def send_via_queue(hospital_id: int, mobile: str, message: str) -> bool:
+    """Sender for background jobs: serialized on the hospital's queue."""
+    return send_queue.send(hospital_id, mobile, message)
+
+
+def get_queue_stats() -> Dict[int, Dict[str, Any]]:
+    return send_queue.stats()
@@ -2,11 +2,14 @@
 WhatsApp Web Automation Service using Selenium
 Handles sending WhatsApp messages from hospital's WhatsApp number
 """
+import atexit
 import os
+import threading
 import time
 import urllib.parse
 import logging
-from typing import Optional
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -15,46 +18,34 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from webdriver_manager.chrome import ChromeDriverManager
+from core.config import settings
 from services.message_logger import log_message
+from services.whatsapp_sessions import WhatsAppSessionPool
+from services.whatsapp_transports.base import normalize_mobile
 
 logger = logging.getLogger(__name__)
 
-# Store active driver sessions per hospital
-_driver_sessions = {}
+CHAT_LIST_XPATH = "//div[@id='pane-side']"
+QR_CODE_XPATH = "//canvas[@aria-label]"
 
-def open_whatsapp_session(hospital_id: int) -> Optional[webdriver.Chrome]:
-    """
-    Open WhatsApp Web session for a hospital (One Time).
-    Hospital admin scans QR once only. Session remains logged in.
-    
-    Requirements:
-    - WhatsApp Web opened once
-    - QR scanned manually
-    - Chrome session saved
-    - No logout unless session expires
-    
-    Args:
-        hospital_id: Hospital ID for session management
-    
-    Returns:
-        webdriver.Chrome: Chrome driver instance, or None if failed
-    """
-    # Check if session already exists and is active
-    if hospital_id in _driver_sessions:
-        driver = _driver_sessions[hospital_id]
-        try:
-            # Check if driver is still active
-            driver.current_url
-            logger.info(f"Using existing WhatsApp session for hospital {hospital_id}")
-            return driver
-        except Exception:
-            # Session expired, remove it
-            del _driver_sessions[hospital_id]
-    
-    # Create new session
+_driver_path: Optional[str] = None
+_driver_path_lock = threading.Lock()
+
+
+def _chromedriver_path() -> str:
+    """Resolve the chromedriver binary once per process (webdriver-manager hits the network)."""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = settings.WHATSAPP_CHROMEDRIVER_PATH or ChromeDriverManager().install()
+        return _driver_path
+
+
+def _launch_session(hospital_id: int) -> Optional[webdriver.Chrome]:
+    """Start Chrome on the hospital's saved profile and load WhatsApp Web."""
     try:
         # Create directory for hospital's WhatsApp session data
-        session_dir = f"./whatsapp_sessions/{hospital_id}"
+        session_dir = os.path.join(settings.WHATSAPP_SESSION_DIR, str(hospital_id))
         os.makedirs(session_dir, exist_ok=True)
         
         # Chrome options with user data directory (persistent session)
@@ -62,33 +53,37 @@ def open_whatsapp_session(hospital_id: int) -> Optional[webdriver.Chrome]:
         options.add_argument(f"--user-data-dir={os.path.abspath(session_dir)}")
         options.add_argument("--no-sandbox")
         options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-extensions")
+        if settings.WHATSAPP_HEADLESS:
+            options.add_argument("--headless=new")
+            options.add_argument("--disable-gpu")
+            options.add_argument("--window-size=1280,900")
+            # WhatsApp Web refuses the default HeadlessChrome user agent
+            options.add_argument(f"--user-agent={settings.WHATSAPP_USER_AGENT}")
         
-        # Create Chrome driver
         driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()),
+            service=Service(_chromedriver_path()),
             options=options
         )
         
         # Navigate to WhatsApp Web
         driver.get("https://web.whatsapp.com")
-        
         logger.info(f"WhatsApp Web opened for hospital {hospital_id}")
-        logger.info("Hospital admin scans QR once only. Session remains logged in.")
         
-        # Wait for QR code scan (first time only)
-        # Wait up to 2 minutes for user to scan QR code
+        # Logged-in profiles show the chat list; new or expired ones show a QR code
         try:
-            WebDriverWait(driver, 120).until(
-                lambda d: "web.whatsapp.com" in d.current_url and "qr" not in d.current_url.lower()
+            WebDriverWait(driver, settings.WHATSAPP_CHAT_TIMEOUT_SECONDS, poll_frequency=0.5).until(
+                EC.presence_of_element_located((By.XPATH, f"{CHAT_LIST_XPATH} | {QR_CODE_XPATH}"))
             )
-            logger.info(f"WhatsApp Web session established for hospital {hospital_id}")
+            if driver.find_elements(By.XPATH, QR_CODE_XPATH):
+                qr_path = os.path.join(session_dir, "qr.png")
+                driver.save_screenshot(qr_path)
+                logger.warning(f"WhatsApp for hospital {hospital_id} needs a QR scan (screenshot at {qr_path})")
+            else:
+                logger.info(f"WhatsApp Web session established for hospital {hospital_id}")
         except TimeoutException:
-            logger.warning(f"QR code scan timeout for hospital {hospital_id}")
-            logger.info("Session will be saved. You can scan QR code later.")
-            # Don't quit - let user scan QR code later
+            logger.warning(f"WhatsApp Web did not finish loading for hospital {hospital_id}")
         
-        # Store session (persistent - no logout unless session expires)
-        _driver_sessions[hospital_id] = driver
         return driver
         
     except Exception as e:
@@ -96,6 +91,31 @@ def open_whatsapp_session(hospital_id: int) -> Optional[webdriver.Chrome]:
         return None
 
 
+# Live browser sessions per hospital (profiles stay on disk when evicted)
+session_pool = WhatsAppSessionPool(_launch_session, settings.WHATSAPP_MAX_SESSIONS)
+atexit.register(session_pool.close_all)
+
+
+def open_whatsapp_session(hospital_id: int) -> Optional[webdriver.Chrome]:
+    """
+    Open WhatsApp Web session for a hospital (One Time).
+    Hospital admin scans QR once only. Session remains logged in.
+    
+    Requirements:
+    - WhatsApp Web opened once
+    - QR scanned manually
+    - Chrome session saved
+    - No logout unless session expires
+    
+    Args:
+        hospital_id: Hospital ID for session management
+    
+    Returns:
+        webdriver.Chrome: Chrome driver instance, or None if failed
+    """
+    return session_pool.get(hospital_id)
+
+
 def get_whatsapp_driver(hospital_id: int) -> Optional[webdriver.Chrome]:
     """
     Get or create WhatsApp Web driver session for a hospital.
@@ -104,13 +124,78 @@ def get_whatsapp_driver(hospital_id: int) -> Optional[webdriver.Chrome]:
     return open_whatsapp_session(hospital_id)
 
 
+def get_session_stats() -> Dict[str, Any]:
+    """Live sessions with age, idle time and (with psutil) memory/CPU."""
+    return session_pool.stats()
+
+
+SEND_BUTTON_XPATH = "//span[@data-icon='send']"
+COMPOSE_BOX_XPATH = "//footer//div[@contenteditable='true']"
+INVALID_NUMBER_XPATH = "//div[@role='dialog' and contains(., 'invalid')]"
+
+
+class InvalidNumberError(Exception):
+    """WhatsApp reports the number is not on WhatsApp; retrying cannot help."""
+
+
+# Cumulative per-step timings: step -> {"count", "total_seconds", "max_seconds"}
+_step_timings: Dict[str, Dict[str, float]] = {}
+_step_timings_lock = threading.Lock()
+
+
+class _StepTimer:
+    """Times the steps of one send and folds them into _step_timings."""
+
+    def __init__(self):
+        self.steps: Dict[str, float] = {}
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self.steps[name] = round(self.steps.get(name, 0.0) + elapsed, 3)
+            with _step_timings_lock:
+                stats = _step_timings.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+                stats["count"] += 1
+                stats["total_seconds"] += elapsed
+                stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+
+def get_send_timing_stats() -> Dict[str, Dict[str, float]]:
+    """Average/max seconds spent in each send step on this worker."""
+    with _step_timings_lock:
+        return {
+            name: {
+                "count": int(stats["count"]),
+                "avg_seconds": round(stats["total_seconds"] / stats["count"], 3) if stats["count"] else 0.0,
+                "max_seconds": round(stats["max_seconds"], 3),
+            }
+            for name, stats in _step_timings.items()
+        }
+
+
+def _chat_ready(driver):
+    """Wait condition: the send button is clickable, or WhatsApp rejected the number."""
+    if driver.find_elements(By.XPATH, INVALID_NUMBER_XPATH):
+        raise InvalidNumberError("Phone number is not on WhatsApp")
+    return EC.element_to_be_clickable((By.XPATH, SEND_BUTTON_XPATH))(driver)
+
+
+def _compose_box_cleared(driver):
+    boxes = driver.find_elements(By.XPATH, COMPOSE_BOX_XPATH)
+    return not boxes or not boxes[-1].text.strip()
+
+
 def send_whatsapp_message(
     driver: webdriver.Chrome,
     mobile: str,
     message: str,
     hospital_id: Optional[int] = None,
     retry_count: int = 0,
-    max_retries: int = 3
+    max_retries: Optional[int] = None
 ) -> bool:
     """
     Send WhatsApp message using driver.
@@ -118,58 +203,64 @@ def send_whatsapp_message(
     Trigger this after booking + CSV save.
     
     Features:
-    - Retry failed messages (up to max_retries)
-    - Logs all message attempts
-    - Error handling & logging
+    - Waits for the chat to be ready instead of sleeping a fixed time
+    - Retries failed messages (up to max_retries) with exponential backoff
+    - Logs all message attempts, with per-step timings
     
     Args:
         driver: Chrome WebDriver instance (from open_whatsapp_session)
         mobile: Mobile number (with +91 prefix)
         message: Message text to send
         hospital_id: Hospital ID for logging (optional)
-        retry_count: Current retry attempt (internal use)
-        max_retries: Maximum number of retry attempts
+        retry_count: Attempts already made (for callers resuming a retry)
+        max_retries: Maximum number of retry attempts (default WHATSAPP_MAX_RETRIES)
     
     Returns:
         bool: True if message sent successfully, False otherwise
     """
-    try:
-        # Encode message for URL
-        text = urllib.parse.quote(message)
-        url = f"https://web.whatsapp.com/send?phone={mobile}&text={text}"
-        
-        # Navigate to chat
-        driver.get(url)
-        
-        # Wait for page to load
-        time.sleep(10)
-        
-        # Find and click send button
-        send_btn = driver.find_element(By.XPATH, "//span[@data-icon='send']")
-        send_btn.click()
-        
-        # Log successful message
-        if hospital_id:
-            log_message(hospital_id, mobile, message, "success", retry_count=retry_count)
-        
-        logger.info(f"Message sent successfully to {mobile}")
-        return True
-        
-    except Exception as e:
-        error_msg = str(e)
-        logger.error(f"Error sending WhatsApp message: {error_msg}")
-        
-        # Log failed message
-        if hospital_id:
-            log_message(hospital_id, mobile, message, "failed", error=error_msg, retry_count=retry_count)
-        
-        # Retry if not exceeded max retries
-        if retry_count < max_retries:
-            logger.info(f"Retrying message to {mobile} (attempt {retry_count + 1}/{max_retries})")
-            time.sleep(5)  # Wait before retry
-            return send_whatsapp_message(driver, mobile, message, hospital_id, retry_count + 1, max_retries)
-        
-        return False
+    if max_retries is None:
+        max_retries = settings.WHATSAPP_MAX_RETRIES
+    url = f"https://web.whatsapp.com/send?phone={mobile}&text={urllib.parse.quote(message)}"
+
+    while True:
+        timer = _StepTimer()
+        try:
+            with timer.step("navigate"):
+                driver.get(url)
+
+            # The send button appears once the chat has loaded with the text prefilled
+            with timer.step("wait_chat"):
+                send_btn = WebDriverWait(driver, settings.WHATSAPP_CHAT_TIMEOUT_SECONDS, poll_frequency=0.25).until(_chat_ready)
+
+            with timer.step("click_send"):
+                send_btn.click()
+
+            # Leaving the page before the compose box clears can drop the message
+            with timer.step("wait_sent"):
+                try:
+                    WebDriverWait(driver, settings.WHATSAPP_SEND_CONFIRM_TIMEOUT_SECONDS, poll_frequency=0.25).until(_compose_box_cleared)
+                except TimeoutException:
+                    logger.warning(f"Send to {mobile} not confirmed within {settings.WHATSAPP_SEND_CONFIRM_TIMEOUT_SECONDS}s")
+
+            if hospital_id:
+                log_message(hospital_id, mobile, message, "success", retry_count=retry_count)
+            logger.info(f"Message sent successfully to {mobile} ({timer.steps})")
+            return True
+
+        except Exception as e:
+            error_msg = str(e) or type(e).__name__
+            logger.error(f"Error sending WhatsApp message: {error_msg} ({timer.steps})")
+
+            if hospital_id:
+                log_message(hospital_id, mobile, message, "failed", error=error_msg, retry_count=retry_count)
+
+            if isinstance(e, InvalidNumberError) or retry_count >= max_retries:
+                return False
+
+            delay = min(settings.WHATSAPP_RETRY_BACKOFF_SECONDS * 2 ** retry_count, settings.WHATSAPP_RETRY_BACKOFF_MAX_SECONDS)
+            retry_count += 1
+            logger.info(f"Retrying message to {mobile} in {delay}s (attempt {retry_count}/{max_retries})")
+            time.sleep(delay)
 
 
 def send_whatsapp_message_by_hospital_id(
@@ -189,27 +280,16 @@ def send_whatsapp_message_by_hospital_id(
     Returns:
         bool: True if message sent successfully, False otherwise
     """
-    # Normalize mobile number
-    mobile = mobile.strip()
-    if not mobile.startswith("+91"):
-        if mobile.startswith("91"):
-            mobile = "+" + mobile
-        elif mobile.startswith("0"):
-            mobile = "+91" + mobile[1:]
-        else:
-            mobile = "+91" + mobile
-    
-    # Remove any spaces or dashes
-    mobile = mobile.replace(" ", "").replace("-", "")
-    
-    # Get driver
-    driver = get_whatsapp_driver(hospital_id)
-    if not driver:
-        logger.error(f"Cannot send message: No active WhatsApp session for hospital {hospital_id}")
-        return False
+    mobile = normalize_mobile(mobile)
     
-    # Send message (with hospital_id for logging)
-    return send_whatsapp_message(driver, mobile, message, hospital_id=hospital_id)
+    # Lease the driver so the pool cannot evict it mid-send
+    with session_pool.lease(hospital_id) as driver:
+        if not driver:
+            logger.error(f"Cannot send message: No active WhatsApp session for hospital {hospital_id}")
+            return False
+        
+        # Send message (with hospital_id for logging)
+        return send_whatsapp_message(driver, mobile, message, hospital_id=hospital_id)
 
 
 def check_whatsapp_session_health(hospital_id: int) -> bool:
@@ -219,27 +299,9 @@ def check_whatsapp_session_health(hospital_id: int) -> bool:
     Returns:
         bool: True if session is active, False otherwise
     """
-    if hospital_id not in _driver_sessions:
-        return False
-    
-    try:
-        driver = _driver_sessions[hospital_id]
-        driver.current_url
-        return True
-    except Exception:
-        # Session expired
-        if hospital_id in _driver_sessions:
-            del _driver_sessions[hospital_id]
-        return False
+    return session_pool.is_alive(hospital_id)
 
 
 def close_whatsapp_session(hospital_id: int):
-    """Close WhatsApp session for a hospital."""
-    if hospital_id in _driver_sessions:
-        try:
-            _driver_sessions[hospital_id].quit()
-        except Exception:
-            pass
-        del _driver_sessions[hospital_id]
-        logger.info(f"WhatsApp session closed for hospital {hospital_id}")
-
+    """Close WhatsApp session for a hospital (its profile stays on disk)."""
+    session_pool.close(hospital_id)
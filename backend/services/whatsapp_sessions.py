@@ -0,0 +1,202 @@
+"""
+Pool of live WhatsApp Web browser sessions, one per hospital.
+
+Each hospital's Chrome profile lives in WHATSAPP_SESSION_DIR/{hospital_id}
+and stays logged in on disk, so a browser can be closed and relaunched
+later without scanning the QR code again. The pool keeps at most
+`max_sessions` browsers running. Opening one more closes the least
+recently used session that is not in the middle of a send; only the
+browser process goes, the profile stays. If every session is busy, the
+pool runs over the limit until one is released.
+
+stats() reports each session's age, idle time and send count. With psutil
+installed it also reports memory (RSS) and CPU for the driver and its
+Chrome processes.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    import psutil
+except ImportError:  # optional: session metrics without memory/CPU
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+DriverFactory = Callable[[int], Optional[Any]]
+
+
+@dataclass
+class _Session:
+    driver: Any
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    in_use: int = 0
+    leases: int = 0
+    processes: Dict[int, Any] = field(default_factory=dict)
+
+
+def _quit(hospital_id: int, driver: Any):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+    logger.info(f"WhatsApp session closed for hospital {hospital_id}")
+
+
+class WhatsAppSessionPool:
+    def __init__(self, factory: DriverFactory, max_sessions: int):
+        self._factory = factory
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[int, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._open_locks: Dict[int, threading.Lock] = {}
+        self.evictions = 0
+
+    def _alive(self, session: _Session) -> bool:
+        try:
+            session.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self, hospital_id: int) -> Optional[_Session]:
+        with self._lock:
+            session = self._sessions.get(hospital_id)
+            if session is None:
+                return None
+            session.in_use += 1
+            session.leases += 1
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(hospital_id)
+        if self._alive(session):
+            return session
+        logger.warning(f"WhatsApp session for hospital {hospital_id} is gone, relaunching")
+        with self._lock:
+            if self._sessions.get(hospital_id) is session:
+                del self._sessions[hospital_id]
+        _quit(hospital_id, session.driver)
+        return None
+
+    def _open(self, hospital_id: int) -> Optional[_Session]:
+        with self._lock:
+            open_lock = self._open_locks.setdefault(hospital_id, threading.Lock())
+        with open_lock:
+            # Another thread may have opened it while we waited
+            session = self._checkout(hospital_id)
+            if session:
+                return session
+            driver = self._factory(hospital_id)
+            if driver is None:
+                return None
+            session = _Session(driver=driver, in_use=1, leases=1)
+            with self._lock:
+                self._sessions[hospital_id] = session
+                evicted = self._pick_evictions()
+            for evicted_id, evicted_session in evicted:
+                _quit(evicted_id, evicted_session.driver)
+            return session
+
+    def _pick_evictions(self):
+        """LRU sessions to close so we are back within max_sessions (call with the lock held)."""
+        evicted = []
+        for hospital_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if self._sessions[hospital_id].in_use == 0:
+                evicted.append((hospital_id, self._sessions.pop(hospital_id)))
+        if len(self._sessions) > self.max_sessions:
+            logger.warning(f"⚠️ {len(self._sessions)} WhatsApp sessions busy, over the limit of {self.max_sessions}")
+        self.evictions += len(evicted)
+        return evicted
+
+    @contextmanager
+    def lease(self, hospital_id: int) -> Iterator[Optional[Any]]:
+        """Driver for one send; the session cannot be evicted while leased."""
+        session = self._checkout(hospital_id) or self._open(hospital_id)
+        try:
+            yield session.driver if session else None
+        finally:
+            if session:
+                with self._lock:
+                    session.in_use -= 1
+                    session.last_used = time.monotonic()
+
+    def get(self, hospital_id: int) -> Optional[Any]:
+        """Driver for a hospital, opening it if needed (not protected from eviction)."""
+        with self.lease(hospital_id) as driver:
+            return driver
+
+    def is_alive(self, hospital_id: int) -> bool:
+        with self._lock:
+            session = self._sessions.get(hospital_id)
+        if session is None:
+            return False
+        if self._alive(session):
+            return True
+        self.close(hospital_id)
+        return False
+
+    def close(self, hospital_id: int):
+        with self._lock:
+            session = self._sessions.pop(hospital_id, None)
+        if session:
+            _quit(hospital_id, session.driver)
+
+    def close_all(self):
+        with self._lock:
+            sessions = list(self._sessions.items())
+            self._sessions.clear()
+        for hospital_id, session in sessions:
+            _quit(hospital_id, session.driver)
+
+    def _resource_usage(self, session: _Session) -> Dict[str, Any]:
+        process = getattr(getattr(session.driver, "service", None), "process", None)
+        if psutil is None or process is None:
+            return {}
+        try:
+            root = psutil.Process(process.pid)
+            current = {p.pid: p for p in [root] + root.children(recursive=True)}
+        except psutil.Error:
+            return {}
+        # Reuse Process objects so cpu_percent() measures since the previous call
+        for pid in list(session.processes):
+            if pid not in current:
+                del session.processes[pid]
+        for pid, proc in current.items():
+            session.processes.setdefault(pid, proc)
+        rss = cpu = 0.0
+        for proc in session.processes.values():
+            try:
+                rss += proc.memory_info().rss
+                cpu += proc.cpu_percent(None)
+            except psutil.Error:
+                pass
+        return {"processes": len(session.processes), "rss_mb": round(rss / 1048576, 1), "cpu_percent": round(cpu, 1)}
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            sessions = list(self._sessions.items())
+        per_session = {}
+        for hospital_id, session in sessions:
+            per_session[hospital_id] = dict(
+                {
+                    "age_seconds": round(now - session.created_at, 1),
+                    "idle_seconds": round(now - session.last_used, 1),
+                    "in_use": session.in_use,
+                    "leases": session.leases,
+                },
+                **self._resource_usage(session)
+            )
+        return {
+            "live": len(sessions),
+            "max_sessions": self.max_sessions,
+            "evictions": self.evictions,
+            "sessions": per_session,
+        }
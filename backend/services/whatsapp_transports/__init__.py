@@ -0,0 +1,62 @@
+"""
+WhatsApp Transport Factory
+Picks the transport for each hospital and sends through it.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from core.config import settings
+from services import entity_cache
+from .base import WhatsAppTransportBase
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ("selenium", "cloud_api", "stub")
+
+_transports: Dict[str, WhatsAppTransportBase] = {}
+_lock = threading.Lock()
+
+
+def _build(name: str) -> WhatsAppTransportBase:
+    if name == "cloud_api":
+        from .cloud_api import CloudApiTransport
+        return CloudApiTransport()
+    if name == "stub":
+        from .stub import StubTransport
+        return StubTransport()
+    from .selenium import SeleniumTransport
+    return SeleniumTransport()
+
+
+def get_transport(hospital: Optional[Dict[str, Any]] = None) -> WhatsAppTransportBase:
+    """
+    Returns the transport for a hospital.
+
+    Controlled by hospitals.whatsapp_transport, falling back to the
+    WHATSAPP_TRANSPORT env var:
+      - "selenium" (default): WhatsApp Web automation
+      - "cloud_api": WhatsApp Business Cloud API
+      - "stub": local stub server (WHATSAPP_STUB_URL)
+    """
+    name = ((hospital or {}).get("whatsapp_transport") or settings.WHATSAPP_TRANSPORT).lower().strip()
+    if name not in TRANSPORTS:
+        logger.warning(f"Unknown WhatsApp transport {name!r}, using selenium")
+        name = "selenium"
+    with _lock:
+        transport = _transports.get(name)
+        if transport is None:
+            transport = _transports[name] = _build(name)
+            logger.info(f"🔌 WhatsApp transport initialized: {transport.name}")
+    return transport
+
+
+def send_message(hospital_id: int, mobile: str, message: str) -> bool:
+    """Send one message with the hospital's transport."""
+    return get_transport(entity_cache.get_hospital(hospital_id)).send(hospital_id, mobile, message)
+
+
+def send_batch(hospital_id: int, messages: List[Tuple[str, str]]) -> List[bool]:
+    """Send several (mobile, message) pairs with the hospital's transport."""
+    return get_transport(entity_cache.get_hospital(hospital_id)).send_batch(hospital_id, messages)
+
@@ -0,0 +1,53 @@
+"""
+WhatsApp Transport Abstraction Layer
+Defines the contract that all WhatsApp transports must implement.
+"""
+
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_mobile(mobile: str) -> str:
+    """Indian mobile number in +91XXXXXXXXXX form."""
+    mobile = mobile.strip()
+    if not mobile.startswith("+91"):
+        if mobile.startswith("91"):
+            mobile = "+" + mobile
+        elif mobile.startswith("0"):
+            mobile = "+91" + mobile[1:]
+        else:
+            mobile = "+91" + mobile
+    # Remove any spaces or dashes
+    return mobile.replace(" ", "").replace("-", "")
+
+
+class WhatsAppTransportBase(ABC):
+    """Abstract base class for WhatsApp transports (Selenium, Cloud API, stub)"""
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Return the transport name, e.g. 'selenium' or 'cloud_api'"""
+        ...
+
+    @abstractmethod
+    def send(self, hospital_id: int, mobile: str, message: str) -> bool:
+        """Send one text message from the hospital's number. Return True if accepted."""
+        ...
+
+    def send_batch(self, hospital_id: int, messages: List[Tuple[str, str]]) -> List[bool]:
+        """
+        Send several (mobile, message) pairs; results are in input order.
+        Override in transports that can send concurrently.
+        """
+        results = []
+        for mobile, message in messages:
+            try:
+                results.append(self.send(hospital_id, mobile, message))
+            except Exception as e:
+                logger.error(f"{self.name} send to {mobile} failed: {e}")
+                results.append(False)
+        return results
@@ -0,0 +1,110 @@
+"""
+WhatsApp Cloud API Transport Implementation
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from core.cache import TTLCache
+from core.config import settings
+from services import entity_cache
+from services.message_logger import log_message
+from .base import WhatsAppTransportBase, normalize_mobile
+
+logger = logging.getLogger(__name__)
+
+
+class CloudApiTransport(WhatsAppTransportBase):
+    """Sends over the WhatsApp Business Cloud API using a pooled HTTP session."""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        access_token: Optional[str] = None,
+        phone_number_id: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        self._base_url = (base_url or settings.WHATSAPP_CLOUD_API_URL).rstrip("/")
+        self._access_token = access_token if access_token is not None else settings.WHATSAPP_CLOUD_API_TOKEN
+        self._phone_number_id = phone_number_id if phone_number_id is not None else settings.WHATSAPP_CLOUD_API_PHONE_NUMBER_ID
+        self._concurrency = concurrency or settings.WHATSAPP_CLOUD_API_CONCURRENCY
+        self._timeout = timeout or settings.WHATSAPP_CLOUD_API_TIMEOUT_SECONDS
+
+        # Keep-alive connections shared by all sends; retry only responses that
+        # mean the message was not accepted (throttled / unavailable)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self._concurrency,
+            max_retries=Retry(
+                total=2, read=0, backoff_factor=0.5,
+                status_forcelist=(429, 503), allowed_methods=frozenset({"POST"})
+            ),
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # Per-hospital tokens, kept briefly in this process only (never in Redis)
+        self._tokens = TTLCache(max_entries=1000, ttl_seconds=60)
+        self._executor = ThreadPoolExecutor(max_workers=self._concurrency, thread_name_prefix=f"whatsapp-{self.name}")
+
+    @property
+    def name(self) -> str:
+        return "cloud_api"
+
+    # ── helpers ──────────────────────────────────────────────
+    def _credentials(self, hospital_id: int) -> Tuple[str, str]:
+        """Hospital's own Cloud API number/token, falling back to the global ones."""
+        hospital: Dict[str, Any] = entity_cache.get_hospital(hospital_id) or {}
+        phone_number_id = hospital.get("whatsapp_phone_number_id")
+        token = None
+        if phone_number_id:
+            # Not in the shared entity cache; read with a column-limited query
+            token = self._tokens.get(hospital_id)
+            if token is None:
+                token = entity_cache.get_hospital_secrets(hospital_id, "whatsapp_access_token").get("whatsapp_access_token") or ""
+                self._tokens.set(hospital_id, token)
+        return phone_number_id or self._phone_number_id, token or self._access_token
+
+    # ── send ────────────────────────────────────────────────
+    def send(self, hospital_id: int, mobile: str, message: str) -> bool:
+        mobile = normalize_mobile(mobile)
+        phone_number_id, token = self._credentials(hospital_id)
+        if not phone_number_id or not token:
+            log_message(hospital_id, mobile, message, "failed", error=f"{self.name} credentials not configured")
+            return False
+        try:
+            resp = self._session.post(
+                f"{self._base_url}/{phone_number_id}/messages",
+                json={
+                    "messaging_product": "whatsapp",
+                    "to": mobile.lstrip("+"),
+                    "type": "text",
+                    "text": {"body": message},
+                },
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=self._timeout,
+            )
+            if resp.ok:
+                log_message(hospital_id, mobile, message, "success")
+                return True
+            error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+        except requests.RequestException as e:
+            error = str(e)
+        logger.error(f"❌ {self.name} send to {mobile} failed: {error}")
+        log_message(hospital_id, mobile, message, "failed", error=error)
+        return False
+
+    def send_batch(self, hospital_id: int, messages: List[Tuple[str, str]]) -> List[bool]:
+        futures = [self._executor.submit(self.send, hospital_id, mobile, message) for mobile, message in messages]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"{self.name} batch send failed: {e}")
+                results.append(False)
+        return results
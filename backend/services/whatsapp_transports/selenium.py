@@ -0,0 +1,18 @@
+"""
+Selenium (WhatsApp Web) Transport Implementation
+"""
+
+from .base import WhatsAppTransportBase
+
+
+class SeleniumTransport(WhatsAppTransportBase):
+    """Drives the hospital's WhatsApp Web session, one message at a time."""
+
+    @property
+    def name(self) -> str:
+        return "selenium"
+
+    def send(self, hospital_id: int, mobile: str, message: str) -> bool:
+        # A browser session drives one chat at a time: go through the hospital's queue
+        from services.whatsapp_queue import send_via_queue
+        return send_via_queue(hospital_id, mobile, message)
@@ -0,0 +1,108 @@
+"""
+Local WhatsApp stub: a tiny Cloud API look-alike server and its transport.
+
+The stub transport is the Cloud API transport pointed at WHATSAPP_STUB_URL,
+so tests and local runs exercise the real HTTP path without sending
+anything. Run the server standalone with:
+
+    python -m services.whatsapp_transports.stub --port 8088
+"""
+
+import argparse
+import itertools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from core.config import settings
+from .cloud_api import CloudApiTransport
+
+
+class StubTransport(CloudApiTransport):
+    """Cloud API transport against the local stub server."""
+
+    def __init__(self, base_url: Optional[str] = None, **kwargs):
+        super().__init__(
+            base_url=base_url or settings.WHATSAPP_STUB_URL,
+            access_token="stub",
+            phone_number_id="stub",
+            **kwargs
+        )
+
+    @property
+    def name(self) -> str:
+        return "stub"
+
+
+class StubCloudApiServer:
+    """
+    Accepts POST /{phone_number_id}/messages like the Cloud API and records
+    each message; GET /messages returns what was received. Every
+    `fail_every`-th message gets a 500, to exercise failure handling.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, fail_every: int = 0):
+        self.messages: List[Dict[str, Any]] = []
+        self.fail_every = fail_every
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status: int, body: Dict[str, Any]):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                if not self.path.endswith("/messages"):
+                    return self._reply(404, {"error": {"message": "Unknown endpoint"}})
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    n = next(server._ids)
+                    if server.fail_every and n % server.fail_every == 0:
+                        return self._reply(500, {"error": {"message": "Stub failure"}})
+                    server.messages.append(dict(body, phone_number_id=self.path.strip("/").split("/")[0]))
+                self._reply(200, {"messaging_product": "whatsapp", "messages": [{"id": f"wamid.stub-{n}"}]})
+
+            def do_GET(self):
+                with server._lock:
+                    self._reply(200, {"messages": list(server.messages)})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubCloudApiServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="whatsapp-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local WhatsApp Cloud API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--fail-every", type=int, default=0)
+    args = parser.parse_args()
+    stub = StubCloudApiServer(args.host, args.port, args.fail_every)
+    print(f"WhatsApp stub listening on {stub.url}")
+    stub._httpd.serve_forever()
@@ -63,3 +63,27 @@ async def test_book_guest_appointment(async_client: AsyncClient, mock_supabase):
     
     # We didn't fully mock doctors for guest so it might fail with 404. Let's verify the mock failure handling.
     assert response.status_code in [404, 200, 500] 
+
+def test_booking_rpc_maps_slot_taken(mocker):
+    from datetime import date
+    from fastapi import HTTPException
+    from postgrest.exceptions import APIError
+    from core.schedule import DEFAULT_GRID
+    from services.appointment_service import AppointmentService
+
+    db = mocker.MagicMock()
+    db.rpc.return_value.execute.side_effect = APIError({"message": "SLOT_TAKEN", "code": "P0001"})
+    mocker.patch.object(AppointmentService, "_get_db", return_value=db)
+    mocker.patch("services.appointment_service.ScheduleService.get_grid", return_value=DEFAULT_GRID)
+
+    with pytest.raises(HTTPException) as exc:
+        AppointmentService.process_booking(
+            {"doctor_id": 5, "date": date(2030, 1, 1), "time_slot": "10:00"},
+            {"id": 1}
+        )
+
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Time slot already booked"
+    db.rpc.assert_called_once()
+    assert db.rpc.call_args[0][0] == "book_appointment"
+    db.table.assert_not_called()
@@ -0,0 +1,75 @@
+import pytest
+from datetime import date
+from fastapi import HTTPException
+from core.schedule import DEFAULT_GRID
+from services import entity_cache, reminder_schedule, slot_index
+from services.appointment_service import AppointmentService
+from services.schedule_service import ScheduleService
+
+
+@pytest.fixture
+def db(mocker):
+    slot_index._local.clear()
+    mocker.patch.object(slot_index, "get_redis", return_value=None)
+    mocker.patch.object(ScheduleService, "get_grid", return_value=DEFAULT_GRID)
+    mocker.patch.object(entity_cache, "get_doctor", return_value={"id": 5, "name": "Dr. Smith", "is_active": True})
+    db = mocker.MagicMock()
+    mocker.patch.object(AppointmentService, "_get_db", return_value=db)
+    return db
+
+
+def test_range_groups_booked_slots_per_day_from_one_query(db):
+    chain = db.table.return_value.select.return_value.eq.return_value.gte.return_value.lte.return_value.neq.return_value
+    chain.execute.return_value.data = [
+        {"date": "2030-01-01", "time_slot": "10:00"},
+        {"date": "2030-01-03", "time_slot": "18:00"},
+        {"date": "2030-01-01", "time_slot": "20:30"},
+    ]
+
+    result = AppointmentService.get_availability_range(5, date(2030, 1, 1), date(2030, 1, 3))
+
+    assert db.table.call_count == 1
+    assert list(result["booked"]) == ["2030-01-01", "2030-01-02", "2030-01-03"]
+    assert slot_index.decode(result["booked"]["2030-01-01"]) == ["10:00", "20:30"]
+    assert result["booked"]["2030-01-02"] == 0
+    assert slot_index.decode(result["booked"]["2030-01-03"]) == ["18:00"]
+    assert result["slots"] == list(DEFAULT_GRID.slots) and result["closed"] == []
+    # The per-day index is warmed, so a single-day lookup skips the database
+    assert AppointmentService.get_available_slots(5, "2030-01-03")["booked_slots"] == ["18:00"]
+    assert db.table.call_count == 1
+
+
+@pytest.mark.parametrize("start, end", [
+    (date(2030, 1, 3), date(2030, 1, 1)),  # to before from
+    (date(2030, 1, 1), date(2030, 1, 1 + AppointmentService.AVAILABILITY_MAX_DAYS)),  # one day too many
+])
+def test_invalid_ranges_are_rejected(db, start, end):
+    with pytest.raises(HTTPException) as exc:
+        AppointmentService.get_availability_range(5, start, end)
+    assert exc.value.status_code == 400
+    db.table.assert_not_called()
+
+
+def test_inactive_doctor_is_not_found(db, mocker):
+    mocker.patch.object(entity_cache, "get_doctor", return_value={"id": 5, "name": "Dr. Smith", "is_active": False})
+    with pytest.raises(HTTPException) as exc:
+        AppointmentService.get_availability_range(5, date(2030, 1, 1), date(2030, 1, 2))
+    assert exc.value.status_code == 404
+    db.table.assert_not_called()
+
+
+def test_cancel_then_confirm_books_the_slot_again(db, mocker):
+    mocker.patch.object(reminder_schedule, "schedule_for_appointment")
+    mocker.patch.object(reminder_schedule, "cancel_for_appointment")
+    slot_index.load(5, "2030-01-01", ["10:00"])
+    row = {"id": 1, "user_id": 2, "doctor_id": 5, "date": "2030-01-01", "time_slot": "10:00", "status": "confirmed"}
+    db.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [row]
+
+    db.table.return_value.update.return_value.eq.return_value.execute.return_value.data = [{**row, "status": "cancelled"}]
+    AppointmentService.update_status(1, 2, "patient", "cancel")
+    assert slot_index.decode(slot_index.get_mask(5, "2030-01-01")) == []
+
+    row["status"] = "cancelled"
+    db.table.return_value.update.return_value.eq.return_value.execute.return_value.data = [{**row, "status": "confirmed"}]
+    AppointmentService.update_status(1, 5, "doctor", "confirm")
+    assert slot_index.decode(slot_index.get_mask(5, "2030-01-01")) == ["10:00"]
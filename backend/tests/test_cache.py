@@ -0,0 +1,54 @@
+import time
+from core.cache import TTLCache
+from services import auth_cache
+
+
+def test_ttl_cache_lru_eviction_and_stats():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" becomes most recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_ttl_cache_expiry():
+    cache = TTLCache(max_entries=10, ttl_seconds=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_principal_cache_invalidation():
+    auth_cache.principal_cache.clear()
+    auth_cache.cache_principal("7", 1, {"id": 7, "name": "A"})
+    auth_cache.cache_principal(7, 2, {"id": 7, "name": "A"})
+    auth_cache.cache_principal(8, 1, {"id": 8, "name": "B"})
+
+    cached = auth_cache.get_cached_principal(7, "1")
+    cached["name"] = "mutated"
+    assert auth_cache.get_cached_principal(7, 1)["name"] == "A"
+
+    assert auth_cache.invalidate_user(7) == 2
+    assert auth_cache.get_cached_principal(7, 1) is None
+    assert auth_cache.get_cached_principal(8, 1) is not None
+
+
+def test_ttl_cache_prefix_invalidation():
+    cache = TTLCache(max_entries=10, ttl_seconds=60)
+    cache.set("search:pu", [1])
+    cache.set("search:pune", [2])
+    cache.set("popular", [3])
+    cache.set(("search:pu",), [4])
+
+    assert cache.invalidate_prefix("search:") == 2
+    assert cache.get("popular") == [3]
+    assert cache.get(("search:pu",)) == [4]
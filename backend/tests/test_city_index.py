@@ -0,0 +1,39 @@
+from services.city_index import CityIndex
+
+
+def _index():
+    index = CityIndex("test", list)
+    index.rebuild([
+        {"city_name": "Navi Mumbai", "state_name": "Maharashtra"},
+        {"city_name": "Mumbai", "state_name": "Maharashtra"},
+        {"city_name": "Mumbra", "state_name": "Maharashtra"},
+        {"city_name": "New Delhi", "state_name": "Delhi"},
+        {"city_name": "Delhi", "state_name": "Delhi"},
+    ])
+    return index
+
+
+def test_prefix_matches_rank_before_substring_matches():
+    names = [c["city_name"] for c in _index().search("mum")]
+    assert names == ["Mumbai", "Mumbra", "Navi Mumbai"]
+
+
+def test_short_query_and_limit():
+    index = _index()
+    assert [c["city_name"] for c in index.search("de")] == ["Delhi", "New Delhi"]
+    assert len(index.search("mum", limit=1)) == 1
+    assert index.search("xyz") == []
+
+
+def test_incremental_add_and_duplicates():
+    index = _index()
+    assert index.add("Mumbai", "Maharashtra") is False
+    assert index.add("Delhi Cantonment", "Delhi") is True
+    assert [c["city_name"] for c in index.search("delhi")] == ["Delhi", "Delhi Cantonment", "New Delhi"]
+    assert len(index) == 6
+
+
+def test_prefix_only_search():
+    index = _index()
+    assert [c["city_name"] for c in index.search("mum", prefix_only=True)] == ["Mumbai", "Mumbra"]
+    assert len(index.all()) == 5
@@ -0,0 +1,46 @@
+import pytest
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from services.doctor_service import DoctorService
+
+
+def test_search_rpc_projection_and_cursor(mocker):
+    db = mocker.MagicMock()
+    db.rpc.return_value.execute.return_value.data = [
+        {"id": 3, "name": "Dr. Rao", "specialization": "Cardiology", "rank": "1.0000"},
+        {"id": 7, "name": "Dr. Rahul", "specialization": "ENT", "rank": "0.6500"},
+    ]
+    mocker.patch.object(DoctorService, "_get_db", return_value=db)
+    mocker.patch.object(DoctorService, "_search_rpc_available", True)
+
+    rows, cursor = DoctorService.get_public_doctors("ra", limit=2, cursor="1.0:1", fields="name")
+
+    assert rows == [{"id": 3, "name": "Dr. Rao"}, {"id": 7, "name": "Dr. Rahul"}]
+    assert cursor == "0.65:7"
+    params = db.rpc.call_args[0][1]
+    assert (params["p_after_rank"], params["p_after_id"], params["p_limit"]) == (1.0, 1, 2)
+
+    with pytest.raises(HTTPException):
+        DoctorService.get_public_doctors("ra", fields="mobile")
+
+
+def test_search_falls_back_to_ilike_ranking(mocker):
+    db = mocker.MagicMock()
+    db.rpc.return_value.execute.side_effect = APIError({"message": "missing", "code": "PGRST202"})
+    chain = db.table.return_value.select.return_value.eq.return_value.or_.return_value
+    chain.execute.return_value.data = [
+        {"id": 1, "name": "Dr. Mehta", "specialization": "Cardiology", "hospitals": {"name": "City Care", "city": "Pune"}},
+        {"id": 2, "name": "Cardio Clinic Doc", "specialization": None, "hospitals": None},
+        {"id": 4, "name": "Dr. Shah", "specialization": "Cardiology", "hospitals": None},
+    ]
+    mocker.patch.object(DoctorService, "_get_db", return_value=db)
+    mocker.patch.object(DoctorService, "_search_rpc_available", True)
+
+    rows, cursor = DoctorService.search_doctors("cardio", limit=2)
+    assert [r["id"] for r in rows] == [2, 1]
+    assert rows[1]["city"] == "Pune"
+    assert cursor == "0.7:1"
+
+    rows, cursor = DoctorService.search_doctors("cardio", limit=2, cursor=cursor)
+    assert [r["id"] for r in rows] == [4]
+    assert cursor is None
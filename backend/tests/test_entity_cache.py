@@ -0,0 +1,102 @@
+import fakeredis
+import pytest
+from services import entity_cache
+
+
+@pytest.fixture(params=["local", "redis"])
+def db(request, mocker):
+    entity_cache._local.clear()
+    client = fakeredis.FakeRedis(decode_responses=True) if request.param == "redis" else None
+    mocker.patch.object(entity_cache, "get_redis", return_value=client)
+    supabase = mocker.MagicMock()
+    supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [
+        {"id": 10, "name": "City Care", "status": "approved"}
+    ]
+    mocker.patch.object(entity_cache, "get_supabase", return_value=supabase)
+    return supabase
+
+
+def test_read_through_and_invalidation(db):
+    assert entity_cache.get_hospital(10)["name"] == "City Care"
+    entity_cache.get_hospital(10)["name"] = "mutated copy"
+    assert entity_cache.get_hospital(10)["name"] == "City Care"
+    assert db.table.call_count == 1
+
+    entity_cache.invalidate_hospital(10)
+    entity_cache.get_hospital(10)
+    assert db.table.call_count == 2
+
+
+def test_redis_tier_shared_across_workers(db, mocker):
+    mocker.patch.object(entity_cache, "get_redis", return_value=fakeredis.FakeRedis(decode_responses=True))
+    entity_cache.get_hospital(10)
+    entity_cache._local.clear()  # another worker with a cold local tier
+    assert entity_cache.get_hospital(10)["status"] == "approved"
+    assert db.table.call_count == 1
+
+
+def test_missing_rows_are_not_cached(db):
+    db.table.return_value.select.return_value.eq.return_value.execute.return_value.data = []
+    assert entity_cache.get_doctor(99) is None
+    assert entity_cache.get_doctor(99) is None
+    assert db.table.call_count == 2
+
+
+def test_request_identity_map_and_roundtrip_counter(db):
+    from core import request_context
+
+    token = request_context.begin_request()
+    try:
+        entity_cache.get_hospital(10)
+        entity_cache._local.clear()
+        entity_cache.get_hospital(10)  # served from the identity map
+        assert db.table.call_count == 1
+
+        request_context.count_db_roundtrip()
+        assert request_context.current_scope().db_roundtrips == 1
+    finally:
+        request_context.end_request(token)
+
+    entity_cache.invalidate_hospital(10)
+    entity_cache.get_hospital(10)
+    assert db.table.call_count == 2
+
+
+def test_secrets_are_never_cached(db):
+    db.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [
+        {"id": 10, "name": "City Care", "smtp_password": "hunter2"}
+    ]
+    assert "smtp_password" not in entity_cache.get_hospital(10)
+    entity_cache._local.clear()
+    assert "smtp_password" not in entity_cache.get_hospital(10)  # nor in the Redis tier
+
+    assert entity_cache.get_hospital_secrets(10, "smtp_password")["smtp_password"] == "hunter2"
+    db.table.return_value.select.assert_called_with("smtp_password")
+    with pytest.raises(ValueError):
+        entity_cache.get_hospital_secrets(10, "name")
+
+
+def test_doctor_deactivation_applies_to_the_next_request(db):
+    import asyncio
+    from fastapi import HTTPException
+    from core import request_context
+    from dependencies.auth import get_current_doctor
+
+    def request():
+        token = request_context.begin_request()
+        try:
+            return asyncio.run(get_current_doctor({"id": 3, "name": "Dr. Rao"}))
+        finally:
+            request_context.end_request(token)
+
+    execute = db.table.return_value.select.return_value.eq.return_value.execute
+    execute.return_value.data = [{"id": 5, "user_id": 3, "is_active": True}]
+    assert request()["id"] == 5
+    assert entity_cache.get_doctor_by_user(3)["is_active"]
+
+    # Deactivated outside the app: no invalidation call
+    execute.return_value.data = [{"id": 5, "user_id": 3, "is_active": False}]
+    with pytest.raises(HTTPException) as exc:
+        request()
+    assert exc.value.status_code == 403
+    assert not entity_cache.get_doctor_by_user(3)["is_active"]  # the cache was refreshed too
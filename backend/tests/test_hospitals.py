@@ -24,3 +24,34 @@ async def test_get_hospitals_public(async_client: AsyncClient, mock_supabase):
     assert response.status_code == 200
     assert len(response.json()) == 1
     assert response.json()[0]["name"] == "City Care"
+
+@pytest.mark.parametrize("use_redis", [False, True])
+def test_hospital_list_etag_changes_on_status_update(mocker, use_redis):
+    import fakeredis
+    from services.hospital_service import HospitalService
+
+    client = fakeredis.FakeRedis(decode_responses=True) if use_redis else None
+    mocker.patch("services.hospital_service.get_redis", return_value=client)
+    db = mocker.MagicMock()
+    db.table.return_value.update.return_value.eq.return_value.execute.return_value.data = [{"id": 1, "status": "approved"}]
+    mocker.patch.object(HospitalService, "_get_db", return_value=db)
+
+    etag = HospitalService.list_etag("approved", None, None)
+    assert etag == HospitalService.list_etag("approved", None, None)
+    assert etag != HospitalService.list_etag("approved", 10, None)
+
+    HospitalService.update_status(1, "approved")
+    assert HospitalService.list_etag("approved", None, None) != etag
+
+def test_hospital_listing_projection_and_cursor(mocker):
+    from services.hospital_service import HospitalService
+
+    db = mocker.MagicMock()
+    chain = db.table.return_value.select.return_value.eq.return_value.lt.return_value.order.return_value.limit.return_value
+    chain.execute.return_value.data = [{"id": 9}, {"id": 7}]
+    mocker.patch.object(HospitalService, "_get_db", return_value=db)
+
+    rows, cursor = HospitalService.get_public_hospitals("approved", limit=2, cursor=10)
+    assert cursor == 7
+    columns = db.table.return_value.select.call_args[0][0]
+    assert "smtp_password" not in columns and "whatsapp_reminder_template" not in columns
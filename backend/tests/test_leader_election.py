@@ -0,0 +1,45 @@
+import fakeredis
+from services import leader_election
+from services.leader_election import FileLeaderLock, RedisLeaderLock
+
+
+def test_redis_leader_lock_single_leader(mocker):
+    mocker.patch.object(leader_election, "get_redis", return_value=fakeredis.FakeRedis(decode_responses=True))
+    first, second = RedisLeaderLock("scheduler", 30), RedisLeaderLock("scheduler", 30)
+
+    assert first.acquire_or_renew() is True
+    assert second.acquire_or_renew() is False
+    assert first.acquire_or_renew() is True  # renewal
+
+    first.release()
+    assert second.acquire_or_renew() is True
+    assert first.acquire_or_renew() is False
+
+
+def test_redis_leader_lock_steps_down_without_redis(mocker):
+    mocker.patch.object(leader_election, "get_redis", return_value=None)
+    assert RedisLeaderLock("scheduler", 30).acquire_or_renew() is False
+
+
+def test_file_leader_lock(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    first, second = FileLeaderLock(path), FileLeaderLock(path)
+
+    assert first.acquire_or_renew() is True
+    assert second.acquire_or_renew() is False
+    first.release()
+    assert second.acquire_or_renew() is True
+    second.release()
+
+
+def test_leader_polls_job_store_within_misfire_grace(mocker):
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from services import scheduler_service
+
+    sched = AsyncIOScheduler(job_defaults=scheduler_service.job_defaults)
+    mocker.patch.object(scheduler_service, "scheduler", sched)
+    scheduler_service.add_scheduled_jobs()
+
+    poll = sched.get_job("poll_job_store")
+    assert poll is not None
+    assert poll.trigger.interval.total_seconds() < scheduler_service.job_defaults["misfire_grace_time"]
@@ -0,0 +1,111 @@
+import gzip
+import json
+import multiprocessing
+from datetime import datetime
+from services import message_logger
+from services.message_log_index import RECORD
+from services.message_log_query import count_logs, query_logs, stream_logs_json
+from services.message_logger import MessageLogWriter, get_message_logs
+
+
+def _entry(ts, status, n):
+    return {"timestamp": ts, "hospital_id": 7, "mobile": f"+9199988877{n:02d}", "status": status}
+
+
+def _writer(mocker, tmp_path):
+    writer = MessageLogWriter(log_dir=str(tmp_path), flush_seconds=60, compress_after_days=0)
+    mocker.patch.object(message_logger, "_writer", writer)
+    return writer
+
+
+def test_writer_indexes_lines_and_range_query_pages_across_days(mocker, tmp_path):
+    writer = _writer(mocker, tmp_path)
+    entries = [
+        _entry("2030-01-01T09:00:00", "success", 0),
+        _entry("2030-01-01T23:00:00", "failed", 1),
+        _entry("2030-01-02T08:00:00", "success", 2),
+        _entry("2030-01-03T10:30:00", "success", 3),
+        _entry("2030-01-03T18:00:00", "failed", 4),
+    ]
+    for entry in entries:
+        writer.submit(entry)
+    writer.flush()
+    assert (tmp_path / "hospital_7_2030-01-01.idx").stat().st_size == 2 * RECORD.size
+
+    start, end = datetime(2030, 1, 1, 10), datetime(2030, 1, 3, 12)
+    page, cursor = query_logs(7, start, end, limit=2)
+    assert page == entries[1:3] and cursor == "2030-01-02:1"
+    page, cursor = query_logs(7, start, end, limit=2, cursor=cursor)
+    assert page == entries[3:4] and cursor is None
+
+    assert query_logs(7, datetime(2030, 1, 1), datetime(2030, 1, 3, 23), status="failed")[0] == [entries[1], entries[4]]
+    assert count_logs(7, datetime(2030, 1, 1), datetime(2030, 1, 3, 23)) == {"success": 3, "failed": 2}
+    writer.close()
+
+
+def test_unindexed_and_gzipped_days_are_still_queryable(mocker, tmp_path):
+    writer = _writer(mocker, tmp_path)
+    legacy = [_entry("2020-01-01T09:00:00", "failed", 0), _entry("2020-01-01T10:00:00", "success", 1)]
+    old = [_entry("2019-12-31T12:00:00", "success", 2)]
+    log_path = tmp_path / "hospital_7_2020-01-01.jsonl"
+    log_path.write_text("".join(json.dumps(e) + "\n" for e in legacy))
+    with gzip.open(tmp_path / "hospital_7_2019-12-31.jsonl.gz", "wt") as f:
+        f.write(json.dumps(old[0]) + "\n")
+
+    assert get_message_logs(7, date="2020-01-01", status="failed") == legacy[:1]
+    assert (tmp_path / "hospital_7_2020-01-01.idx").exists()  # past day: index kept
+
+    # A late write appends to the index built by the read
+    late = _entry("2020-01-01T11:00:00", "success", 3)
+    writer.submit(late)
+    writer.flush()
+    assert (tmp_path / "hospital_7_2020-01-01.idx").stat().st_size == 3 * RECORD.size
+
+    body = b"".join(stream_logs_json(7, datetime(2019, 12, 31), datetime(2020, 1, 1, 23)))
+    doc = json.loads(body)
+    assert doc["logs"] == old + legacy + [late]
+    assert doc["count"] == 4 and doc["next_cursor"] is None
+
+    doc = json.loads(b"".join(stream_logs_json(7, datetime(2019, 12, 31), datetime(2020, 1, 1, 23), limit=1)))
+    assert doc["logs"] == old and doc["next_cursor"] == "2019-12-31:1"
+    writer.close()
+
+
+def _write_from_worker(log_dir, entries):
+    writer = MessageLogWriter(log_dir=log_dir, flush_seconds=60, batch_size=7, compress_after_days=0)
+    for entry in entries:
+        writer.submit(entry)
+    writer.close()
+
+
+def test_two_worker_processes_on_one_directory_keep_the_index_in_step(mocker, tmp_path):
+    # Each uvicorn worker has its own writer appending to the same files
+    writer = _writer(mocker, tmp_path)
+    entries = [_entry(f"2030-01-01T10:{n // 60:02d}:{n % 60:02d}", "failed" if n % 3 else "success", n) for n in range(2000)]
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_write_from_worker, args=(str(tmp_path), entries[i::2])) for i in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert (tmp_path / "hospital_7_2030-01-01.idx").stat().st_size == len(entries) * RECORD.size
+
+    key = lambda entry: entry["timestamp"]
+    page, cursor = query_logs(7, datetime(2030, 1, 1), datetime(2030, 1, 1, 23), limit=len(entries))
+    assert sorted(page, key=key) == entries and cursor is None
+    assert sorted(get_message_logs(7, date="2030-01-01", status="success"), key=key) == [e for e in entries if e["status"] == "success"]
+    writer.close()
+
+
+def test_index_lagging_its_log_is_caught_up_before_appending(mocker, tmp_path):
+    writer = _writer(mocker, tmp_path)
+    legacy = [_entry("2030-01-01T09:00:00", "success", 0), _entry("2030-01-01T09:30:00", "failed", 1)]
+    (tmp_path / "hospital_7_2030-01-01.jsonl").write_text("".join(json.dumps(e) + "\n" for e in legacy))
+    (tmp_path / "hospital_7_2030-01-01.idx").write_bytes(b"\0" * (RECORD.size // 2))  # torn record
+
+    late = _entry("2030-01-01T10:00:00", "success", 2)
+    writer.submit(late)
+    writer.flush()
+    assert (tmp_path / "hospital_7_2030-01-01.idx").stat().st_size == 3 * RECORD.size
+    assert query_logs(7, datetime(2030, 1, 1), datetime(2030, 1, 1, 23))[0] == legacy + [late]
+    writer.close()
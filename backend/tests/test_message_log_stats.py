@@ -0,0 +1,99 @@
+import json
+from services import message_logger
+from services.message_log_stats import combine, summarize
+from services.message_logger import MessageLogWriter, get_message_stats, get_message_stats_series, log_message
+
+
+def test_counters_are_saved_with_the_logs_and_shared_by_workers(mocker, tmp_path):
+    writer = MessageLogWriter(log_dir=str(tmp_path), flush_seconds=60, compress_after_days=0)
+    mocker.patch.object(message_logger, "_writer", writer)
+
+    log_message(7, "+919998887770", "hello", "success")
+    log_message(7, "+919998887771", "hello", "failed", error="offline", retry_count=2)
+    log_message(7, "+919998887772", "hello", "sent", retry_count=1)
+
+    counters = get_message_stats(7)  # flushes the writer first
+    assert counters == {"total": 3, "by_status": {"success": 1, "failed": 1, "sent": 1}, "retries": {"0": 1, "2": 1, "1": 1}}
+    assert summarize(counters)["successful"] == 2 and summarize(counters)["failed"] == 1
+    saved = list(tmp_path.glob("hospital_7_*.stats.json"))
+    assert len(saved) == 1 and json.loads(saved[0].read_text()) == counters
+
+    # Another worker's writer merges into the same counters rather than overwriting them
+    other = MessageLogWriter(log_dir=str(tmp_path), flush_seconds=60, compress_after_days=0)
+    other.submit({"timestamp": saved[0].name[11:21] + "T23:00:00", "hospital_id": 7, "status": "failed", "retry_count": 0})
+    other.flush()
+    assert get_message_stats(7)["total"] == 4 == other.stats.get(7, saved[0].name[11:21])["total"]
+    assert get_message_stats(7)["by_status"]["failed"] == 2
+    other.close()
+    writer.close()
+
+
+def test_dropped_entries_are_not_counted(mocker, tmp_path):
+    writer = MessageLogWriter(log_dir=str(tmp_path), flush_seconds=60, max_queue=1, compress_after_days=0)
+    mocker.patch.object(message_logger, "_writer", writer)
+    start = writer._ensure_started
+    writer._ensure_started = lambda: None  # nothing drains the queue yet
+    log_message(7, "+919998887770", "hello", "success")
+    log_message(7, "+919998887771", "hello", "success")
+    assert writer.dropped == 1
+
+    writer._ensure_started = start
+    start()
+    assert get_message_stats(7)["total"] == 1 == len(message_logger.get_message_logs(7))
+    writer.close()
+
+
+def test_series_backfills_days_logged_without_counters(mocker, tmp_path):
+    writer = MessageLogWriter(log_dir=str(tmp_path), compress_after_days=0)
+    mocker.patch.object(message_logger, "_writer", writer)
+    lines = [
+        {"timestamp": "2030-01-02T09:00:00", "hospital_id": 7, "status": "success", "retry_count": 0},
+        {"timestamp": "2030-01-02T10:00:00", "hospital_id": 7, "status": "failed", "retry_count": 3},
+    ]
+    (tmp_path / "hospital_7_2030-01-02.jsonl").write_text("".join(json.dumps(l) + "\n" for l in lines))
+    (tmp_path / "hospital_7_2030-01-03.stats.json").write_text(
+        json.dumps({"total": 4, "by_status": {"success": 4}, "retries": {"0": 4}})
+    )
+
+    series = get_message_stats_series(7, "2030-01-01", "2030-01-03")
+    assert [day["date"] for day in series] == ["2030-01-01", "2030-01-02", "2030-01-03"]
+    assert [day["total"] for day in series] == [0, 2, 4]
+    assert summarize(combine(series)) == {
+        "total": 6, "successful": 5, "failed": 1, "success_rate": 83.33,
+        "by_status": {"success": 5, "failed": 1}, "retries": {"0": 5, "3": 1},
+    }
+
+    # The backfill is kept for next time, and a late write adds to it
+    assert json.loads((tmp_path / "hospital_7_2030-01-02.stats.json").read_text())["total"] == 2
+    writer.submit({"timestamp": "2030-01-02T11:00:00", "hospital_id": 7, "status": "success", "retry_count": 0})
+    assert get_message_stats_series(7, "2030-01-02", "2030-01-02")[0]["total"] == 3
+    writer.close()
+
+
+def test_writer_backfills_counters_for_a_day_logged_without_them(mocker, tmp_path):
+    writer = MessageLogWriter(log_dir=str(tmp_path), compress_after_days=0)
+    mocker.patch.object(message_logger, "_writer", writer)
+    legacy = {"timestamp": "2030-01-02T09:00:00", "hospital_id": 7, "status": "failed", "retry_count": 1}
+    (tmp_path / "hospital_7_2030-01-02.jsonl").write_text(json.dumps(legacy) + "\n")
+
+    writer.submit({"timestamp": "2030-01-02T10:00:00", "hospital_id": 7, "status": "success", "retry_count": 0})
+    writer.flush()
+    saved = json.loads((tmp_path / "hospital_7_2030-01-02.stats.json").read_text())
+    assert saved == {"total": 2, "by_status": {"failed": 1, "success": 1}, "retries": {"1": 1, "0": 1}}
+    writer.close()
+
+
+def test_status_filter_keeps_the_day_statistics(mocker, tmp_path):
+    from routers import whatsapp_logs
+    writer = MessageLogWriter(log_dir=str(tmp_path), flush_seconds=60, compress_after_days=0)
+    mocker.patch.object(message_logger, "_writer", writer)
+    mocker.patch.object(whatsapp_logs, "_get_hospital", return_value={"id": 7, "name": "City Care"})
+    for status, retries in [("success", 0), ("sent", 1), ("failed", 2)]:
+        writer.submit({"timestamp": "2030-01-02T09:00:00", "hospital_id": 7, "status": status, "retry_count": retries})
+
+    body = whatsapp_logs.get_hospital_message_logs(
+        7, log_date="2030-01-02", status_filter="success", limit=None, cursor=None, current_admin={}
+    )
+    assert [log["status"] for log in body["logs"]] == ["success"] and body["matching_total"] == 1
+    assert body["statistics"]["successful"] == 2 and body["statistics"]["retries"] == {"0": 1, "1": 1, "2": 1}
+    writer.close()
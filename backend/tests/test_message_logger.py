@@ -0,0 +1,64 @@
+import gzip
+import json
+from services import message_logger
+from services.message_logger import MessageLogWriter, get_message_logs, log_message
+
+
+def test_log_message_is_buffered_and_readable_after_flush(mocker, tmp_path):
+    writer = MessageLogWriter(log_dir=str(tmp_path), flush_seconds=60, compress_after_days=0)
+    mocker.patch.object(message_logger, "_writer", writer)
+
+    for i in range(3):
+        log_message(7, f"+91999888777{i}", "hello", "success" if i else "failed", error=None if i else "offline")
+
+    logs = get_message_logs(7)  # flushes the writer first
+    assert [l["mobile"] for l in logs] == ["+919998887770", "+919998887771", "+919998887772"]
+    assert [l["status"] for l in get_message_logs(7, status="failed")] == ["failed"]
+    assert writer.written == 3 and len(writer._handles) == 1
+    writer.close()
+    assert not writer._handles
+
+
+def test_old_files_are_gzipped_and_still_readable(mocker, tmp_path):
+    writer = MessageLogWriter(log_dir=str(tmp_path), compress_after_days=7)
+    mocker.patch.object(message_logger, "_writer", writer)
+    entry = {"timestamp": "2030-01-01T10:00:00", "hospital_id": 7, "status": "success"}
+    (tmp_path / "hospital_7_2030-01-01.jsonl").write_text(json.dumps(entry) + "\n")
+    (tmp_path / "hospital_7_2030-01-09.jsonl").write_text(json.dumps(entry) + "\n")
+
+    assert writer.compress_old_files("2030-01-10") == 1
+
+    assert not (tmp_path / "hospital_7_2030-01-01.jsonl").exists()
+    with gzip.open(tmp_path / "hospital_7_2030-01-01.jsonl.gz", "rt") as f:
+        assert json.loads(f.readline())["hospital_id"] == 7
+    assert (tmp_path / "hospital_7_2030-01-09.jsonl").exists()
+    assert get_message_logs(7, date="2030-01-01") == [entry]
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    writer = MessageLogWriter(log_dir=str(tmp_path), max_queue=1)
+    writer._ensure_started = lambda: None  # no writer thread draining the queue
+    assert writer.submit({"timestamp": "2030-01-01T00:00:00", "hospital_id": 1})
+    assert not writer.submit({"timestamp": "2030-01-01T00:00:00", "hospital_id": 1})
+    assert writer.dropped == 1
+
+
+def test_batch_is_one_write_per_file(mocker, tmp_path):
+    writer = MessageLogWriter(log_dir=str(tmp_path), compress_after_days=0)
+    write = mocker.spy(message_logger.os, "write")
+    entries = [{"timestamp": "2030-01-01T10:00:00", "hospital_id": 7, "status": "success", "n": i} for i in range(5)]
+    writer._write(str(tmp_path / "hospital_7_2030-01-01.jsonl"), entries)
+    assert write.call_count == 2  # the lines, then their index records
+    assert [json.loads(l)["n"] for l in (tmp_path / "hospital_7_2030-01-01.jsonl").read_text().splitlines()] == list(range(5))
+    writer._close_all()
+
+
+def test_rotation_is_skipped_while_another_worker_compresses(tmp_path):
+    import fcntl
+    writer = MessageLogWriter(log_dir=str(tmp_path), compress_after_days=7)
+    (tmp_path / "hospital_7_2030-01-01.jsonl").write_text('{"hospital_id": 7}\n')
+    with open(tmp_path / message_logger._ROTATE_LOCK, "w") as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        assert writer.compress_old_files("2030-01-10") == 0
+    assert writer.compress_old_files("2030-01-10") == 1
+    assert [p.name for p in tmp_path.glob("*.tmp")] == []
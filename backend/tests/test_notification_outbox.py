@@ -0,0 +1,88 @@
+import asyncio
+from datetime import date
+from postgrest.exceptions import APIError
+from services import notification_outbox
+from services.notification_outbox import process_row, run_outbox_worker
+from services.operation_service import OperationService
+
+
+def _row(row_id, attempts=1, max_attempts=5):
+    return {
+        "id": row_id, "channel": "whatsapp", "hospital_id": 1, "recipient": "9998887776", "message": "hi",
+        "attempts": attempts, "max_attempts": max_attempts, "locked_by": "w1", "status": "processing"
+    }
+
+
+def test_failed_rows_back_off_then_go_dead(mocker):
+    finish = mocker.patch.object(notification_outbox, "_finish")
+    mocker.patch.object(notification_outbox.settings, "OUTBOX_BACKOFF_BASE_SECONDS", 10)
+
+    assert process_row(_row(1, attempts=1), delivery=lambda row: (False, "offline")) == "pending"
+    assert process_row(_row(2, attempts=5), delivery=lambda row: (False, "offline")) == "dead"
+    assert process_row(_row(3), delivery=lambda row: (True, None)) == "sent"
+
+    updates = [call.args[1] for call in finish.call_args_list]
+    assert updates[0]["status"] == "pending" and updates[0]["next_attempt_at"]
+    assert updates[1]["status"] == "dead"
+    assert updates[2]["status"] == "sent"
+    assert 8 <= notification_outbox.backoff_seconds(1) <= 12
+    assert 32 <= notification_outbox.backoff_seconds(3) <= 48
+
+
+def test_worker_drains_full_batches_without_waiting(mocker):
+    mocker.patch.object(notification_outbox.settings, "OUTBOX_BATCH_SIZE", 2)
+    mocker.patch.object(notification_outbox.settings, "OUTBOX_POLL_SECONDS", 60)
+    batches = [[_row(1), _row(2)], [_row(3), _row(4)], [_row(5)]]
+    claim = mocker.patch.object(notification_outbox, "claim", side_effect=lambda: batches.pop(0) if batches else [])
+    mocker.patch.object(notification_outbox, "_finish")
+    delivered = []
+
+    async def scenario():
+        task = asyncio.create_task(run_outbox_worker(delivery=lambda row: delivered.append(row["id"]) or (True, None)))
+        for _ in range(100):
+            if len(delivered) == 5:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert sorted(delivered) == [1, 2, 3, 4, 5]
+    assert claim.call_count == 3  # the short third batch ends the drain
+
+
+def test_missing_outbox_table_backs_off_with_one_warning(mocker):
+    mocker.patch.object(notification_outbox.settings, "OUTBOX_POLL_SECONDS", 0.001)
+    mocker.patch.object(notification_outbox.settings, "OUTBOX_BACKOFF_MAX_SECONDS", 0.008)
+    claim = mocker.patch.object(notification_outbox, "claim", side_effect=APIError({"code": "42P01", "message": "relation does not exist"}))
+    warning = mocker.patch.object(notification_outbox.logger, "warning")
+    error = mocker.patch.object(notification_outbox.logger, "error")
+
+    async def scenario():
+        task = asyncio.create_task(run_outbox_worker())
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert claim.call_count > 3 and warning.call_count == 1 and not error.called
+    assert [notification_outbox.poll_delay(n) for n in range(5)] == [0.001, 0.002, 0.004, 0.008, 0.008]
+
+
+def test_operation_booking_writes_notification_in_booking_rpc(mocker):
+    db = mocker.MagicMock()
+    db.rpc.return_value.execute.return_value = mocker.MagicMock(data={"id": 7, "status": "pending"})
+    mocker.patch.object(OperationService, "_get_db", return_value=db)
+    mocker.patch.object(OperationService, "_booking_rpc_available", True)
+    mocker.patch("services.operation_service.entity_cache.get_doctor", return_value={"id": 3, "is_active": True, "hospital_id": 1, "name": "Mehta"})
+    mocker.patch("services.operation_service.entity_cache.get_hospital", return_value={"id": 1, "status": "approved", "name": "City Care", "whatsapp_enabled": "true"})
+
+    result = OperationService.process_booking(
+        {"date": date(2099, 1, 1), "doctor_id": 3, "specialty": "ortho", "notes": None},
+        {"id": 5, "name": "Asha", "mobile": "9998887776"}
+    )
+
+    assert result["operation"]["id"] == 7
+    name, params = db.rpc.call_args.args
+    assert name == "book_operation"
+    [note] = params["p_notifications"]
+    assert (note["channel"], note["recipient"], note["hospital_id"]) == ("whatsapp", "9998887776", 1)
+    db.table.assert_not_called()
@@ -0,0 +1,33 @@
+from datetime import date
+from services import reminder_pipeline
+from services.reminder_pipeline import APPOINTMENT_REMINDER, run_reminders
+
+
+def _row(row_id, hospital_id, mobile="9998887776"):
+    return {
+        "id": row_id, "date": "2030-01-01", "time_slot": "10:00", "hospital_id": hospital_id,
+        "user_id": row_id, "users": {"name": "Asha", "mobile": mobile}, "doctors": {"name": "Mehta"}
+    }
+
+
+def test_run_reminders_pages_groups_and_bulk_audits(mocker):
+    pages = [[_row(1, 10), _row(2, 20)], [_row(3, 10, mobile=None)]]
+    db = mocker.MagicMock()
+    chain = db.table.return_value.select.return_value.eq.return_value.eq.return_value.gt.return_value.order.return_value.limit.return_value
+    chain.execute.side_effect = [mocker.MagicMock(data=p) for p in pages]
+    mocker.patch.object(reminder_pipeline, "get_supabase", return_value=db)
+    mocker.patch.object(reminder_pipeline.settings, "REMINDER_PAGE_SIZE", 2)
+    hospitals = {10: {"id": 10, "name": "City Care", "whatsapp_enabled": "true"}, 20: {"id": 20, "whatsapp_enabled": "false"}}
+    mocker.patch.object(reminder_pipeline.entity_cache, "get_hospital", side_effect=hospitals.get)
+    bulk = mocker.patch.object(reminder_pipeline, "log_audit_events_bulk", side_effect=len)
+
+    sent = []
+    metrics = run_reminders(APPOINTMENT_REMINDER, date(2030, 1, 1), sender=lambda h, m, msg: sent.append((h, m)) or True)
+
+    assert sent == [(10, "9998887776")]
+    assert (metrics.pages, metrics.fetched, metrics.hospitals) == (2, 3, 2)
+    assert (metrics.sent, metrics.failed, metrics.skipped) == (1, 0, 2)
+    assert metrics.per_hospital[20]["skipped"] == 1
+    bulk.assert_called_once()
+    assert bulk.call_args[0][0][0]["event_type"] == "message_send"
+    assert metrics.audit_rows == 1
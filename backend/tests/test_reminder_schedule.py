@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from services import reminder_schedule
+from services.reminder_schedule import TIMEZONE, compute_send_time
+
+
+def _apt(apt_id, hospital_id=1, time_slot="14:00"):
+    return {"id": apt_id, "date": "2030-01-01", "time_slot": time_slot, "hospital_id": hospital_id}
+
+
+def _local_buckets(mocker, cap):
+    mocker.patch.object(reminder_schedule, "get_redis", return_value=None)
+    mocker.patch.object(reminder_schedule, "_local_buckets", reminder_schedule.TTLCache(1000, 3600))
+    mocker.patch.object(reminder_schedule, "_local_reservations", reminder_schedule.TTLCache(1000, 3600))
+    mocker.patch.object(reminder_schedule.settings, "REMINDER_HOSPITAL_MAX_PER_MINUTE", cap)
+    mocker.patch.object(reminder_schedule.settings, "REMINDER_LEAD_HOURS", 3)
+
+
+def test_send_time_is_lead_hours_before_slot_with_bounded_jitter(mocker):
+    _local_buckets(mocker, cap=0)
+    mocker.patch.object(reminder_schedule.settings, "REMINDER_JITTER_SECONDS", 300)
+    now = datetime(2030, 1, 1, 6, 0, tzinfo=TIMEZONE)
+    slot_minus_lead = datetime(2030, 1, 1, 11, 0, tzinfo=TIMEZONE)
+
+    times = [compute_send_time(_apt(i), now=now) for i in range(1, 50)]
+
+    assert all(abs((t - slot_minus_lead).total_seconds()) <= 300 for t in times)
+    assert len(set(times)) > 1
+    assert compute_send_time(_apt(7), now=now) == times[6]  # deterministic per appointment
+    assert compute_send_time(_apt(1), now=datetime(2030, 1, 1, 13, 50, tzinfo=TIMEZONE)) is None
+
+
+def test_hospital_cap_pushes_reminders_to_later_minutes(mocker):
+    _local_buckets(mocker, cap=2)
+    mocker.patch.object(reminder_schedule.settings, "REMINDER_JITTER_SECONDS", 0)
+    now = datetime(2030, 1, 1, 6, 0, tzinfo=TIMEZONE)
+
+    times = [compute_send_time(_apt(i), now=now) for i in range(5)]
+    other_hospital = compute_send_time(_apt(99, hospital_id=2), now=now)
+
+    base = datetime(2030, 1, 1, 11, 0, tzinfo=TIMEZONE)
+    assert times == [base, base, base + timedelta(minutes=1), base + timedelta(minutes=1), base + timedelta(minutes=2)]
+    assert other_hospital == base
+
+
+def _running_scheduler(mocker):
+    from services import scheduler_service
+    mocker.patch.object(scheduler_service.scheduler, "state", 1)  # STATE_RUNNING
+    schedule = mocker.patch.object(scheduler_service, "schedule_one_time_reminder")
+    cancel = mocker.patch.object(scheduler_service, "cancel_one_time_reminder")
+    return schedule, cancel
+
+
+def test_rescheduling_and_cancelling_release_the_minute_bucket(mocker):
+    _local_buckets(mocker, cap=1)
+    mocker.patch.object(reminder_schedule.settings, "REMINDER_JITTER_SECONDS", 0)
+    schedule, _ = _running_scheduler(mocker)
+    mocker.patch.object(reminder_schedule, "datetime", mocker.Mock(wraps=datetime, now=lambda tz=None: datetime(2030, 1, 1, 6, 0, tzinfo=TIMEZONE)))
+    base = datetime(2030, 1, 1, 11, 0, tzinfo=TIMEZONE)
+
+    # Re-confirming the same appointment keeps its minute instead of taking a new one
+    assert reminder_schedule.schedule_for_appointment(_apt(1)) == base
+    assert reminder_schedule.schedule_for_appointment(_apt(1)) == base
+    assert reminder_schedule.schedule_for_appointment(_apt(2)) == base + timedelta(minutes=1)
+
+    reminder_schedule.cancel_for_appointment(1)
+    assert reminder_schedule.schedule_for_appointment(_apt(3)) == base
+    assert schedule.call_count == 4
+
+
+def test_reminder_inside_lead_window_goes_through_the_outbox(mocker):
+    from services import notification_outbox, reminder_pipeline
+    _local_buckets(mocker, cap=1)
+    schedule, cancel = _running_scheduler(mocker)
+    mocker.patch.object(reminder_pipeline, "reminder_notification", return_value={"channel": "whatsapp", "recipient": "+91999"})
+    enqueue = mocker.patch.object(notification_outbox, "enqueue", return_value=1)
+    mocker.patch.object(reminder_schedule, "datetime", mocker.Mock(wraps=datetime, now=lambda tz=None: datetime(2030, 1, 1, 12, 0, tzinfo=TIMEZONE)))
+
+    assert reminder_schedule.schedule_for_appointment(_apt(5)) is not None
+    enqueue.assert_called_once_with([{"channel": "whatsapp", "recipient": "+91999"}])
+    schedule.assert_not_called()
+    cancel.assert_called_once_with(5)
+    # Queued once: the reconcile pass will not queue it again
+    assert reminder_schedule._has_reservation(5)
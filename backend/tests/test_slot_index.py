@@ -0,0 +1,99 @@
+import fakeredis
+import pytest
+from datetime import date
+from core.schedule import DEFAULT_GRID, compile_schedule
+from services import slot_index
+from services.schedule_service import ScheduleService
+
+
+@pytest.fixture(params=["local", "redis"])
+def backend(request, mocker):
+    slot_index._local.clear()
+    client = fakeredis.FakeRedis(decode_responses=True) if request.param == "redis" else None
+    mocker.patch.object(slot_index, "get_redis", return_value=client)
+    return request.param
+
+
+def test_encode_decode_roundtrip():
+    mask = slot_index.encode(["09:30", "20:30", "not-a-slot"])
+    assert mask == 1 | 1 << (len(DEFAULT_GRID.slots) - 1)
+    assert slot_index.decode(mask) == ["09:30", "20:30"]
+    assert "09:30" not in slot_index.free_slots(mask)
+    assert len(slot_index.free_slots(mask)) == len(DEFAULT_GRID.slots) - 2
+
+
+def test_incremental_updates(backend):
+    assert slot_index.get_mask(5, "2030-01-01") is None
+
+    # Updates before the first load do not fabricate an entry
+    slot_index.mark_booked(5, "2030-01-01", "10:00")
+    if backend == "local":
+        assert slot_index.get_mask(5, "2030-01-01") is None
+
+    slot_index.load(5, "2030-01-01", ["11:00"])
+    assert slot_index.decode(slot_index.get_mask(5, "2030-01-01"))[-1] == "11:00"
+
+    slot_index.mark_booked(5, "2030-01-01", "18:00")
+    slot_index.mark_free(5, "2030-01-01", "11:00")
+    booked = slot_index.decode(slot_index.get_mask(5, "2030-01-01"))
+    assert "18:00" in booked and "11:00" not in booked
+    assert slot_index.get_mask(5, "2030-01-02") is None
+
+
+def test_default_grid_matches_legacy_slots():
+    assert DEFAULT_GRID.slots == (
+        "09:30", "10:00", "10:30", "11:00", "11:30", "12:00",
+        "12:30", "13:00", "13:30", "14:00", "14:30", "15:00", "15:30",
+        "18:00", "18:30", "19:00", "19:30", "20:00", "20:30"
+    )
+
+
+def test_custom_schedule_with_breaks_and_holidays():
+    grid = compile_schedule(
+        {"sessions": [{"start": "10:00", "end": "12:00"}], "slot_minutes": 20},
+        {"breaks": [{"start": "10:40", "end": "11:00"}], "weekdays": [0, 1, 2, 3, 4], "holidays": ["2030-01-01"]}
+    )
+    assert grid.slots == ("10:00", "10:20", "11:00", "11:20", "11:40")
+    assert grid.is_valid_slot("11:20") and not grid.is_valid_slot("10:40")
+    assert not grid.is_open(date(2030, 1, 1))  # holiday
+    assert not grid.is_open(date(2030, 1, 5))  # Saturday
+    assert grid.is_open(date(2030, 1, 2))
+    assert grid.fingerprint != DEFAULT_GRID.fingerprint
+
+
+def test_wide_grid_roundtrip_in_redis(mocker):
+    grid = compile_schedule({"sessions": [{"start": "00:00", "end": "24:00"}], "slot_minutes": 15})
+    assert len(grid.slots) == 96
+    mocker.patch.object(slot_index, "get_redis", return_value=fakeredis.FakeRedis(decode_responses=True))
+    slot_index.load(1, "2030-01-01", ["00:00", "15:45", "23:45"], grid)
+    assert slot_index.decode(slot_index.get_mask(1, "2030-01-01", grid), grid) == ["00:00", "15:45", "23:45"]
+
+
+def test_redis_ttl_is_not_extended_by_writes(mocker):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    mocker.patch.object(slot_index, "get_redis", return_value=client)
+    slot_index.load(5, "2030-01-01", ["11:00"])
+    key = next(iter(client.scan_iter("slot_bitmap:*")))
+    client.expire(key, 10)  # as if the bitmap was created long ago
+    slot_index.mark_booked(5, "2030-01-01", "18:00")
+    slot_index.mark_free(5, "2030-01-01", "11:00")
+    assert client.ttl(key) <= 10
+
+
+def test_schedule_read_error_is_cached_briefly(mocker):
+    ScheduleService.invalidate()
+    db = mocker.MagicMock()
+    execute = db.table.return_value.select.return_value.eq.return_value.execute
+    execute.side_effect = ConnectionError("timeout")
+    mocker.patch.object(ScheduleService, "_get_db", return_value=db)
+    assert ScheduleService.get_grid(9) is DEFAULT_GRID
+    assert ScheduleService.get_grid(9) is DEFAULT_GRID
+    assert execute.call_count == 1
+
+    # Once the short error TTL has passed the schedule is read again
+    ScheduleService._grids.set(9, DEFAULT_GRID, ttl_seconds=0)
+    execute.side_effect = None
+    execute.return_value.data = [{"schedule": {"slot_minutes": 60}, "hospitals": None}]
+    assert ScheduleService.get_grid(9).slots[:2] == ("09:30", "10:30")
+    assert execute.call_count == 2
+    ScheduleService.invalidate()
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+from services import token_revocation
+from services.token_revocation import BloomFilter, token_fingerprint
+
+
+def test_bloom_filter_membership():
+    bloom = BloomFilter(capacity=100)
+    keys = [token_fingerprint(f"token-{i}") for i in range(100)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(token_fingerprint(f"other-{i}") in bloom for i in range(1000))
+    assert false_positives < 20
+
+
+def test_unrevoked_token_skips_network(mocker):
+    mocker.patch.object(token_revocation, "_loaded", True)
+    mocker.patch.object(token_revocation, "_bloom", BloomFilter(capacity=10))
+    get_redis = mocker.patch.object(token_revocation, "get_redis")
+    get_db = mocker.patch.object(token_revocation, "get_supabase")
+
+    assert token_revocation.is_revoked("valid-token") is False
+    get_redis.assert_not_called()
+    get_db.assert_not_called()
+
+
+def test_revoked_token_confirmed_in_redis(mocker):
+    mocker.patch.object(token_revocation, "_loaded", True)
+    mocker.patch.object(token_revocation, "_bloom", BloomFilter(capacity=10))
+    mocker.patch.object(token_revocation, "_local_revocations", {})
+    redis_client = mocker.MagicMock()
+    redis_client.exists.return_value = 1
+    mocker.patch.object(token_revocation, "get_redis", return_value=redis_client)
+
+    token_revocation.revoke("bad-token", datetime.utcnow() + timedelta(hours=1))
+
+    assert token_revocation.is_revoked("bad-token") is True
+    key, _ = redis_client.set.call_args[0]
+    assert key == token_revocation.REDIS_KEY_PREFIX + token_fingerprint("bad-token")
+    assert 3500 < redis_client.set.call_args[1]["ex"] <= 3600
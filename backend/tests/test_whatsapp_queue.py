@@ -0,0 +1,56 @@
+import threading
+import time
+import pytest
+from services.whatsapp_queue import WhatsAppQueueFull, WhatsAppSendQueue
+
+
+def test_sends_are_serialized_per_hospital_and_parallel_across_hospitals():
+    active = {}
+    overlap = []
+    lock = threading.Lock()
+
+    def sender(hospital_id, mobile, message):
+        with lock:
+            active[hospital_id] = active.get(hospital_id, 0) + 1
+            overlap.append(dict(active))
+        time.sleep(0.02)
+        with lock:
+            active[hospital_id] -= 1
+        return mobile != "bad"
+
+    q = WhatsAppSendQueue(sender=sender, max_depth=10, idle_seconds=0.1)
+    futures = [q.submit(h, m, "hi") for h in (1, 2) for m in ("a", "b", "bad")]
+
+    assert [f.result(timeout=2) for f in futures] == [True, True, False, True, True, False]
+    assert all(counts.get(h, 0) <= 1 for counts in overlap for h in (1, 2))
+    assert any(counts.get(1) and counts.get(2) for counts in overlap)
+    stats = q.stats()[1]
+    assert (stats["enqueued"], stats["sent"], stats["failed"]) == (3, 2, 1)
+    assert stats["max_wait_seconds"] >= 0.02
+
+
+def test_full_queue_rejects_and_queued_timeouts_are_withdrawn():
+    release = threading.Event()
+    sent = []
+
+    def sender(hospital_id, mobile, message):
+        release.wait(2)
+        sent.append(mobile)
+        return True
+
+    q = WhatsAppSendQueue(sender=sender, max_depth=1, idle_seconds=0.1)
+    first = q.submit(1, "first", "hi")
+    while q.depth(1):  # wait for the worker to pick it up
+        time.sleep(0.005)
+
+    with pytest.raises(TimeoutError):
+        q.send(1, "queued", "hi", timeout=0.05)
+    with pytest.raises(WhatsAppQueueFull):
+        q.submit(1, "overflow", "hi")  # the withdrawn message holds its slot until skipped
+
+    release.set()
+    assert first.result(timeout=2)
+    assert q.send(1, "later", "hi", timeout=2)
+    assert sent == ["first", "later"]
+    assert q.stats()[1]["rejected"] == 1
+    assert q.stats()[1]["cancelled"] == 1
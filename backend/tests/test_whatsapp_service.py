@@ -0,0 +1,38 @@
+from unittest.mock import MagicMock
+from services import whatsapp_service
+from services.whatsapp_service import INVALID_NUMBER_XPATH, send_whatsapp_message
+
+
+def _driver(invalid=False):
+    driver = MagicMock()
+    driver.find_elements.side_effect = lambda by, xpath: [MagicMock()] if invalid and xpath == INVALID_NUMBER_XPATH else []
+    driver.find_element.return_value.is_displayed.return_value = True
+    return driver
+
+
+def test_send_waits_on_conditions_and_retries_iteratively_with_backoff(mocker):
+    sleeps = mocker.patch.object(whatsapp_service.time, "sleep")
+    log = mocker.patch.object(whatsapp_service, "log_message")
+    mocker.patch.object(whatsapp_service.settings, "WHATSAPP_RETRY_BACKOFF_SECONDS", 2)
+    driver = _driver()
+    driver.get.side_effect = [Exception("net::ERR"), Exception("net::ERR"), None]
+
+    assert send_whatsapp_message(driver, "+919998887776", "hi", hospital_id=1, max_retries=3)
+
+    assert [c.args[0] for c in sleeps.call_args_list] == [2, 4]
+    driver.find_element.return_value.click.assert_called_once()
+    assert [c.args[3] for c in log.call_args_list] == ["failed", "failed", "success"]
+    assert log.call_args.kwargs["retry_count"] == 2
+    stats = whatsapp_service.get_send_timing_stats()
+    assert {"navigate", "wait_chat", "click_send", "wait_sent"} <= set(stats)
+
+
+def test_invalid_number_is_not_retried(mocker):
+    sleeps = mocker.patch.object(whatsapp_service.time, "sleep")
+    mocker.patch.object(whatsapp_service, "log_message")
+    driver = _driver(invalid=True)
+
+    assert not send_whatsapp_message(driver, "+910000000000", "hi", hospital_id=1, max_retries=3)
+
+    driver.get.assert_called_once()
+    sleeps.assert_not_called()
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock, PropertyMock
+from services.whatsapp_sessions import WhatsAppSessionPool
+
+
+def _pool(max_sessions):
+    launched = {}
+
+    def factory(hospital_id):
+        driver = MagicMock(name=f"driver-{hospital_id}")
+        launched.setdefault(hospital_id, []).append(driver)
+        return driver
+
+    return WhatsAppSessionPool(factory, max_sessions), launched
+
+
+def test_least_recently_used_session_is_closed_past_the_limit():
+    pool, launched = _pool(max_sessions=2)
+    pool.get(1)
+    pool.get(2)
+    pool.get(1)  # 2 is now least recently used
+    pool.get(3)
+
+    launched[2][0].quit.assert_called_once()
+    launched[1][0].quit.assert_not_called()
+    assert set(pool.stats()["sessions"]) == {1, 3}
+    assert pool.stats()["evictions"] == 1
+
+    pool.get(2)  # relaunched on its saved profile
+    assert len(launched[2]) == 2
+    launched[1][0].quit.assert_called_once()
+
+
+def test_leased_sessions_are_never_evicted_and_dead_ones_relaunch():
+    pool, launched = _pool(max_sessions=1)
+    with pool.lease(1) as busy:
+        pool.get(2)
+        pool.get(3)
+        busy.quit.assert_not_called()
+        launched[2][0].quit.assert_called_once()
+        assert pool.stats()["live"] == 2  # over the limit while 1 is busy
+    pool.get(4)
+    assert set(pool.stats()["sessions"]) == {4}
+
+    type(launched[4][0]).current_url = PropertyMock(side_effect=Exception("browser crashed"))
+    assert not pool.is_alive(4)
+    with pool.lease(4) as driver:
+        assert driver is launched[4][1]
@@ -0,0 +1,52 @@
+import pytest
+from services import whatsapp_transports
+from services.whatsapp_transports import get_transport
+from services.whatsapp_transports.stub import StubCloudApiServer, StubTransport
+
+
+@pytest.fixture
+def stub_server():
+    server = StubCloudApiServer(fail_every=3).start()
+    yield server
+    server.stop()
+
+
+def test_stub_transport_sends_batches_concurrently_over_http(mocker, stub_server):
+    mocker.patch("services.whatsapp_transports.cloud_api.entity_cache.get_hospital", return_value={"id": 1})
+    log = mocker.patch("services.whatsapp_transports.cloud_api.log_message")
+    transport = StubTransport(base_url=stub_server.url, concurrency=4)
+
+    results = transport.send_batch(1, [(f"99988877{i:02d}", f"hello {i}") for i in range(6)])
+
+    assert results.count(True) == 4 and results.count(False) == 2  # every third request fails
+    assert len(stub_server.messages) == 4
+    sent = stub_server.messages[0]
+    assert sent["messaging_product"] == "whatsapp" and sent["to"].startswith("91999888")
+    assert sorted(c.args[3] for c in log.call_args_list) == ["failed"] * 2 + ["success"] * 4
+
+
+def test_transport_is_chosen_per_hospital(mocker):
+    mocker.patch.object(whatsapp_transports.settings, "WHATSAPP_TRANSPORT", "selenium")
+    assert get_transport({"id": 1}).name == "selenium"
+    assert get_transport({"id": 2, "whatsapp_transport": "cloud_api"}).name == "cloud_api"
+    assert get_transport({"id": 3, "whatsapp_transport": "stub"}).name == "stub"
+    assert get_transport({"id": 4, "whatsapp_transport": "bogus"}).name == "selenium"
+    assert get_transport({"id": 5}) is get_transport({"id": 1})
+
+    send = mocker.patch("services.whatsapp_queue.send_via_queue", return_value=True)
+    mocker.patch.object(whatsapp_transports.entity_cache, "get_hospital", return_value={"id": 1})
+    assert whatsapp_transports.send_message(1, "9998887776", "hi")
+    send.assert_called_once_with(1, "9998887776", "hi")
+
+
+def test_hospital_token_is_read_directly_not_from_the_cached_row(mocker, stub_server):
+    mocker.patch("services.whatsapp_transports.cloud_api.entity_cache.get_hospital",
+                 return_value={"id": 1, "whatsapp_phone_number_id": "own-number"})
+    secrets = mocker.patch("services.whatsapp_transports.cloud_api.entity_cache.get_hospital_secrets",
+                           return_value={"whatsapp_access_token": "own-token"})
+    mocker.patch("services.whatsapp_transports.cloud_api.log_message")
+    transport = StubTransport(base_url=stub_server.url)
+
+    assert transport._credentials(1) == ("own-number", "own-token")
+    assert transport._credentials(1) == ("own-number", "own-token")
+    secrets.assert_called_once_with(1, "whatsapp_access_token")